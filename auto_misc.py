@@ -198,7 +198,7 @@ while True:
   sleep(0.5)
   device_action.flush_screenshot_cache()
   screenshot = device_action.screenshot()
-  matches = device_action.multi_match_templates(templates, screenshot=screenshot)
+  matches = device_action.multi_match_templates(templates, screenshot=screenshot, pyramid_factor=device_action.PYRAMID_FACTOR)
 
   if non_match_count > 20:
     info("Career lobby stuck, quitting.")
@@ -267,7 +267,7 @@ while True:
 
   if args.cm:
     device_action.flush_screenshot_cache()
-    cm_matches = device_action.multi_match_templates(cm_templates, screenshot=screenshot)
+    cm_matches = device_action.multi_match_templates(cm_templates, screenshot=screenshot, pyramid_factor=device_action.PYRAMID_FACTOR)
     if not cm_missions_collected and click_match(cm_matches.get("cm_special_missions"), "cm_special_missions"):
       non_match_count=0
       continue
@@ -288,7 +288,7 @@ while True:
       continue
 
     device_action.flush_screenshot_cache()
-    tt_matches = device_action.multi_match_templates(tt_templates, screenshot=screenshot)
+    tt_matches = device_action.multi_match_templates(tt_templates, screenshot=screenshot, pyramid_factor=device_action.PYRAMID_FACTOR)
     if (
         click_match(tt_matches.get("tt_team_race"), "tt_team_race") or
         click_match(tt_matches.get("tt_see_all"), "tt_see_all") or
@@ -321,7 +321,7 @@ while True:
       non_match_count=0
       continue
     device_action.flush_screenshot_cache()
-    lr_matches = device_action.multi_match_templates(lr_templates, screenshot=screenshot)
+    lr_matches = device_action.multi_match_templates(lr_templates, screenshot=screenshot, pyramid_factor=device_action.PYRAMID_FACTOR)
     info(f"Legend race matches: {lr_matches}")
     if click_match(lr_matches.get("lr_view_results"), "lr_view_results"):
       close_btn = device_action.locate("assets/buttons/close_btn.png", min_search_time=get_secs(1))
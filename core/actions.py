@@ -58,7 +58,7 @@ def do_training(options):
   if not device_action.locate_and_click("assets/buttons/training_btn.png", region_ltrb=constants.SCREEN_BOTTOM_BBOX, min_search_time=get_secs(2)):
     error(f"Couldn't find training button.")
     return False
-  sleep(0.75)
+  device_action.wait_for_settle(timeout=get_secs(0.75))
   device_action.click(target=mouse_pos, clicks=2, interval=0.15)
   return True
 
@@ -91,7 +91,7 @@ def do_recreation(options=None):
 
   if recreation_btn:
     device_action.click(target=recreation_btn, duration=0.15)
-    sleep(1)
+    device_action.wait_for_settle(timeout=get_secs(1))
     screenshot = device_action.screenshot()
     matches = CleanDefaultDict()
     for name, path in event_templates.items():
@@ -181,20 +181,20 @@ def race_day(options=None):
     device_action.locate_and_click("assets/ura/ura_race_btn.png", min_search_time=get_secs(10), region_ltrb=constants.SCREEN_BOTTOM_BBOX)
   else:
     device_action.locate_and_click("assets/buttons/race_day_btn.png", min_search_time=get_secs(10), region_ltrb=constants.SCREEN_BOTTOM_BBOX)
-  sleep(0.5)
+  device_action.wait_for_settle(timeout=get_secs(0.5))
   device_action.locate_and_click("assets/buttons/ok_btn.png")
-  sleep(0.5)
+  device_action.wait_for_settle(timeout=get_secs(0.5))
   for i in range(2):
     if not device_action.locate_and_click("assets/buttons/race_btn.png", min_search_time=get_secs(2)):
       device_action.locate_and_click("assets/buttons/bluestacks/race_btn.png", min_search_time=get_secs(2))
-    sleep(0.5)
+    device_action.wait_for_settle(timeout=get_secs(0.5))
 
 def go_to_racebox_top():
   for i in range(10):
     screenshot1 = device_action.screenshot(region_ltrb=constants.RACE_LIST_BOX_BBOX)
     device_action.swipe(constants.RACE_SCROLL_TOP_MOUSE_POS, constants.RACE_SCROLL_BOTTOM_MOUSE_POS)
     device_action.click(constants.RACE_SCROLL_BOTTOM_MOUSE_POS)
-    sleep(0.25)
+    device_action.wait_for_settle(region_ltrb=constants.RACE_LIST_BOX_BBOX, timeout=get_secs(0.25))
     screenshot2 = device_action.screenshot(region_ltrb=constants.RACE_LIST_BOX_BBOX)
     if are_screenshots_same(screenshot1, screenshot2, diff_threshold=15):
       return True
@@ -216,7 +216,7 @@ def enter_race(race_name="any", race_image_path="", options=None):
       return False
 
   debug(f"race_name: {race_name}, race_image_path: {race_image_path}")
-  sleep(1)
+  device_action.wait_for_settle(timeout=get_secs(1))
   consecutive_cancel_btn = device_action.locate("assets/buttons/cancel_btn.png", min_search_time=get_secs(1))
   if config.CANCEL_CONSECUTIVE_RACE and consecutive_cancel_btn:
     device_action.locate_and_click("assets/buttons/cancel_btn.png", min_search_time=get_secs(1), text="[INFO] Already raced 3+ times consecutively. Cancelling race and doing training.")
@@ -226,7 +226,7 @@ def enter_race(race_name="any", race_image_path="", options=None):
 
   if race_name == "any" or race_image_path == "":
     race_image_path = "assets/ui/match_track.png"
-  sleep(1)
+  device_action.wait_for_settle(timeout=get_secs(1))
 
   go_to_racebox_top()
   while True:
@@ -238,13 +238,13 @@ def enter_race(race_name="any", race_image_path="", options=None):
         screenshot_region = (mission_icon[0], mission_icon[1], mission_icon[0] + 400, mission_icon[1] + 110)
         if device_action.locate_and_click(race_image_path, min_search_time=get_secs(1), region_ltrb=screenshot_region):
           break
-    elif device_action.locate_and_click(race_image_path, min_search_time=get_secs(1), region_ltrb=constants.RACE_LIST_BOX_BBOX):
+    elif device_action.locate_and_click(race_image_path, min_search_time=get_secs(1), region_ltrb=constants.RACE_LIST_BOX_BBOX, pyramid_factor=device_action.PYRAMID_FACTOR):
       break
     sleep(0.5)
     debug(f"Scrolling races...")
     device_action.swipe(constants.RACE_SCROLL_BOTTOM_MOUSE_POS, constants.RACE_SCROLL_TOP_MOUSE_POS)
     device_action.click(constants.RACE_SCROLL_TOP_MOUSE_POS, duration=0)
-    sleep(0.25)
+    device_action.wait_for_settle(region_ltrb=constants.RACE_LIST_BOX_BBOX, timeout=get_secs(0.25))
     screenshot2 = device_action.screenshot(region_ltrb=constants.RACE_LIST_BOX_BBOX)
     if are_screenshots_same(screenshot1, screenshot2, diff_threshold=15):
       info(f"Couldn't find race image")
@@ -254,14 +254,14 @@ def enter_race(race_name="any", race_image_path="", options=None):
   for i in range(2):
     if not device_action.locate_and_click("assets/buttons/race_btn.png", min_search_time=get_secs(2)):
       device_action.locate_and_click("assets/buttons/bluestacks/race_btn.png", min_search_time=get_secs(2))
-    sleep(0.5)
+    device_action.wait_for_settle(timeout=get_secs(0.5))
   return True
 
 # support functions for actions
 def start_race():
   if config.POSITION_SELECTION_ENABLED:
     select_position()
-    sleep(0.5)
+    device_action.wait_for_settle(timeout=get_secs(0.5))
   device_action.locate_and_click("assets/buttons/view_results.png", min_search_time=get_secs(10), region_ltrb=constants.SCREEN_BOTTOM_BBOX)
   sleep(0.5)
 
@@ -354,7 +354,7 @@ def select_position():
   if config.ENABLE_POSITIONS_BY_RACE:
     debug(f"Selecting position based on race type: {config.ENABLE_POSITIONS_BY_RACE}")
     device_action.locate_and_click("assets/buttons/info_btn.png", min_search_time=get_secs(5), region_ltrb=constants.SCREEN_TOP_BBOX)
-    sleep(0.5)
+    device_action.wait_for_settle(timeout=get_secs(0.5))
     #find race text, get part inside parentheses using regex, strip whitespaces and make it lowercase for our usage
     race_info_text = get_race_type().lower()
     race_type = None
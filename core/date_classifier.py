@@ -0,0 +1,107 @@
+# the date label only ever shows one of the TIMELINE entries, so it's read by comparing the crop against
+# reference crops of entries that OCR already read successfully. OCR only runs for dates the bank hasn't seen.
+import cv2
+import numpy as np
+
+import utils.constants as constants
+from utils.prototype_bank import PrototypeBank
+
+# every crop is compared at this size, so small capture size differences don't matter
+CROP_WIDTH = 192
+CROP_HEIGHT = 32
+# anywhere in the timeline, the match has to be near perfect since some entries differ by one letter
+MIN_SCORE = 0.97
+# the same or the next entry are expected, those need less
+MIN_EXPECTED_SCORE = 0.93
+MIN_MARGIN = 0.02
+# a new reference is only stored if it differs from the ones the entry already has
+NOVELTY_SCORE = 0.99
+MAX_REFERENCES_PER_ENTRY = 3
+SAVE_EVERY = 5
+
+def _confusable_entries(entry):
+  # entries that only differ from this one in a letter or two ("Early Jan" / "Early Jun", "Junior" / "Senior"),
+  # rendered they score above MIN_SCORE against each other
+  return [other for other in constants.TIMELINE if other != entry and len(other) == len(entry) and sum(a != b for a, b in zip(entry, other)) <= 2]
+
+CONFUSABLE_ENTRIES = {entry: _confusable_entries(entry) for entry in constants.TIMELINE}
+
+bank = PrototypeBank("date_bank.npz", "date bank", novelty_score=NOVELTY_SCORE, max_prototypes_per_label=MAX_REFERENCES_PER_ENTRY,
+                     save_every=SAVE_EVERY, valid_label=lambda entry: entry in constants.TIMELINE)
+# last date read per kind, the next read is most likely the same or the following entry
+last_dates = {}
+
+def save():
+  bank.save()
+
+def reset():
+  # a new career starts over from Pre-Debut, the last read dates don't apply to it
+  last_dates.clear()
+
+def _normalize(image):
+  gray = np.asarray(image)
+  if gray.ndim == 3:
+    gray = cv2.cvtColor(gray, cv2.COLOR_RGB2GRAY)
+  vector = cv2.resize(gray, (CROP_WIDTH, CROP_HEIGHT), interpolation=cv2.INTER_AREA).astype(np.float32).ravel()
+  vector -= vector.mean()
+  norm = np.linalg.norm(vector)
+  if norm == 0:
+    return None
+  return vector / norm
+
+def _best(scores, entries, candidates):
+  # best score among the candidate entries and the best score of any other entry
+  in_candidates = np.isin(entries, candidates)
+  if not in_candidates.any():
+    return None, 0.0, 0.0
+  candidate_scores = np.where(in_candidates, scores, -1)
+  best = int(np.argmax(candidate_scores))
+  other = entries != entries[best]
+  runner_up = scores[other].max() if other.any() else -1.0
+  return entries[best], float(scores[best]), float(runner_up)
+
+def classify(image, kind="default"):
+  """
+  Returns the TIMELINE entry the date crop shows, or None if the bank has no confident match.
+  The same and the next entry after the last read date are tried first with a lower bar.
+  Any other entry is only accepted once the entries it could be confused with are in the bank too,
+  otherwise the margin can't tell it apart from one of them that wasn't learned yet.
+  """
+  bank.reads += 1
+  matrix = bank.matrix(kind)
+  if matrix is None:
+    return None
+  vector = _normalize(image)
+  if vector is None:
+    return None
+  references, entries = matrix
+  scores = references @ vector
+
+  last_date = last_dates.get(kind)
+  if last_date in constants.TIMELINE:
+    index = constants.TIMELINE.index(last_date)
+    expected = constants.TIMELINE[index:index + 2]
+    entry, score, runner_up = _best(scores, entries, expected)
+    if entry is not None and score >= MIN_EXPECTED_SCORE and score - runner_up >= MIN_MARGIN:
+      bank.hits += 1
+      last_dates[kind] = entry
+      return entry
+
+  entry, score, runner_up = _best(scores, entries, constants.TIMELINE)
+  if entry is None or any(other not in entries for other in CONFUSABLE_ENTRIES[entry]):
+    return None
+  if score >= MIN_SCORE and score - runner_up >= MIN_MARGIN:
+    bank.hits += 1
+    last_dates[kind] = entry
+    return entry
+  return None
+
+def learn(image, entry, kind="default"):
+  # stores the crop as a reference for a date OCR read successfully
+  if entry not in constants.TIMELINE:
+    return
+  last_dates[kind] = entry
+  bank.learn(kind, [(entry, _normalize(image))])
+
+def stats():
+  return bank.stats()
@@ -0,0 +1,126 @@
+# digit reader for the fixed game font. Glyphs are segmented with connected components and compared
+# against an atlas of glyphs that easyocr already read with high confidence, so numbers the bot has
+# seen before skip the neural network entirely.
+import cv2
+import numpy as np
+
+from utils.prototype_bank import PrototypeBank
+
+GLYPH_WIDTH = 20
+GLYPH_HEIGHT = 28
+# components shorter than this share of the tallest one are noise, not glyphs
+MIN_GLYPH_HEIGHT_RATIO = 0.4
+# a glyph read counts only if every glyph clears the score and beats the runner-up label by the margin
+MIN_SCORE = 0.85
+MIN_MARGIN = 0.05
+# easyocr reads at least this confident are used to teach the atlas
+LEARN_MIN_CONFIDENCE = 0.9
+# new prototypes are only kept if they differ from the ones the label already has
+NOVELTY_SCORE = 0.97
+MAX_PROTOTYPES_PER_LABEL = 6
+SAVE_EVERY = 20
+
+# {kind: {label: [normalized glyph vectors]}}
+bank = PrototypeBank("glyph_atlas.npz", "glyph atlas", novelty_score=NOVELTY_SCORE, max_prototypes_per_label=MAX_PROTOTYPES_PER_LABEL,
+                     save_every=SAVE_EVERY)
+
+def save():
+  bank.save()
+
+def _foreground_mask(image : np.ndarray) -> np.ndarray:
+  # binary mask with the text as 255, whichever polarity the crop has
+  gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) if image.ndim == 3 else image
+  if gray.dtype != np.uint8:
+    gray = cv2.normalize(gray, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+  _, mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+  # the background is whatever covers most of the border
+  border = np.concatenate([mask[0], mask[-1], mask[:, 0], mask[:, -1]])
+  if np.count_nonzero(border) > border.size // 2:
+    mask = cv2.bitwise_not(mask)
+  return mask
+
+def segment(image : np.ndarray) -> list[np.ndarray]:
+  """
+  Splits a crop into glyph masks, left to right. Components that overlap horizontally
+  are merged, components much shorter than the tallest one are dropped as noise.
+  """
+  image = np.asarray(image)
+  if image.size == 0:
+    return []
+  mask = _foreground_mask(image)
+  count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+  if count <= 1:
+    return []
+  components = stats[1:count]
+  max_height = components[:, cv2.CC_STAT_HEIGHT].max()
+  components = components[components[:, cv2.CC_STAT_HEIGHT] >= max_height * MIN_GLYPH_HEIGHT_RATIO]
+  components = components[np.argsort(components[:, cv2.CC_STAT_LEFT], kind="stable")]
+
+  spans = []
+  for left, top, width, height, _ in components:
+    right, bottom = left + width, top + height
+    if spans and left < spans[-1][2]:
+      span = spans[-1]
+      spans[-1] = [span[0], min(span[1], top), max(span[2], right), max(span[3], bottom)]
+    else:
+      spans.append([left, top, right, bottom])
+  return [mask[top:bottom, left:right] for left, top, right, bottom in spans]
+
+def _normalize(glyph : np.ndarray):
+  # fits the glyph into a fixed box keeping its aspect ratio, returns a zero mean unit length vector
+  h, w = glyph.shape
+  scale = min(GLYPH_WIDTH / w, GLYPH_HEIGHT / h)
+  resized = cv2.resize(glyph, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+  canvas = np.zeros((GLYPH_HEIGHT, GLYPH_WIDTH), dtype=np.float32)
+  top = (GLYPH_HEIGHT - resized.shape[0]) // 2
+  left = (GLYPH_WIDTH - resized.shape[1]) // 2
+  canvas[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+  vector = canvas.ravel()
+  vector -= vector.mean()
+  norm = np.linalg.norm(vector)
+  if norm == 0:
+    return None
+  return vector / norm
+
+def read(image : np.ndarray, kind : str, allowlist="0123456789"):
+  """
+  Reads the glyphs of a crop using the atlas learned for this kind of crop.
+  Returns the text, or None if any glyph isn't confidently known.
+  """
+  bank.reads += 1
+  matrix = bank.matrix(kind)
+  if matrix is None:
+    return None
+  prototypes, labels = matrix
+  glyphs = segment(image)
+  if not glyphs:
+    return None
+  text = ""
+  for glyph in glyphs:
+    vector = _normalize(glyph)
+    if vector is None:
+      return None
+    scores = prototypes @ vector
+    best = int(np.argmax(scores))
+    label = labels[best]
+    if scores[best] < MIN_SCORE or label not in allowlist:
+      return None
+    other_labels = labels != label
+    if other_labels.any() and scores[best] - scores[other_labels].max() < MIN_MARGIN:
+      return None
+    text += label
+  bank.hits += 1
+  return text
+
+def learn(image : np.ndarray, kind : str, text : str, confidence : float):
+  # teaches the atlas the glyphs of a crop easyocr read as text
+  text = text.replace(" ", "")
+  if confidence < LEARN_MIN_CONFIDENCE or not text:
+    return
+  glyphs = segment(image)
+  if len(glyphs) != len(text):
+    return
+  bank.learn(kind, [(label, _normalize(glyph)) for glyph, label in zip(glyphs, text)])
+
+def stats():
+  return bank.stats()
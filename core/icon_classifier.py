@@ -0,0 +1,75 @@
+# nearest neighbour classifier for fixed size icon crops like the aptitude letters and the mood badge.
+# Crops are compared against prototypes of crops template matching already classified, on a downsampled
+# grayscale image plus a color histogram. Template matching only runs for crops the bank isn't sure about.
+import cv2
+import numpy as np
+
+from utils.prototype_bank import PrototypeBank
+
+FEATURE_WIDTH = 32
+FEATURE_HEIGHT = 16
+HISTOGRAM_BINS = 4
+# share of the similarity that comes from the grayscale shape, the rest from the colors
+SHAPE_WEIGHT = 0.7
+# a crop is classified only if the best prototype clears the score and beats the other labels by the margin
+MIN_SCORE = 0.95
+MIN_MARGIN = 0.03
+
+# crops at least novelty_score similar to a prototype of their label aren't stored again
+bank = PrototypeBank("icon_bank.npz", "icon bank", novelty_score=0.99, max_prototypes_per_label=4, save_every=10)
+
+def save():
+  bank.save()
+
+def _features(image):
+  # unit length vector, the dot product of two is SHAPE_WEIGHT * shape similarity + the rest * color similarity
+  image = np.asarray(image)
+  if image.size == 0:
+    return None
+  rgb = cv2.cvtColor(image, cv2.COLOR_GRAY2RGB) if image.ndim == 2 else np.ascontiguousarray(image[:, :, :3])
+  gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+  shape = cv2.resize(gray, (FEATURE_WIDTH, FEATURE_HEIGHT), interpolation=cv2.INTER_AREA).astype(np.float32).ravel()
+  shape -= shape.mean()
+  shape_norm = np.linalg.norm(shape)
+  if shape_norm == 0:
+    return None
+  histogram = cv2.calcHist([rgb], [0, 1, 2], None, [HISTOGRAM_BINS] * 3, [0, 256] * 3).ravel()
+  histogram /= np.linalg.norm(histogram)
+  return np.concatenate([shape / shape_norm * np.sqrt(SHAPE_WEIGHT), histogram * np.sqrt(1 - SHAPE_WEIGHT)])
+
+def classify(images, kind):
+  """
+  Classifies all crops with one distance computation. Returns [(label, confidence)] in the same order,
+  label is None when the bank isn't sure and the caller should fall back to template matching.
+  """
+  bank.reads += len(images)
+  results = [(None, 0.0)] * len(images)
+  matrix = bank.matrix(kind)
+  if matrix is None:
+    return results
+  prototypes, labels = matrix
+  features = [_features(image) for image in images]
+  indexes = [i for i, vector in enumerate(features) if vector is not None]
+  if not indexes:
+    return results
+  scores = np.stack([features[i] for i in indexes]) @ prototypes.T
+  best = scores.argmax(axis=1)
+  for row, i in enumerate(indexes):
+    label = labels[best[row]]
+    score = float(scores[row, best[row]])
+    other_labels = labels != label
+    runner_up = float(scores[row, other_labels].max()) if other_labels.any() else -1.0
+    confidence = min(score, 1.0)
+    if score >= MIN_SCORE and score - runner_up >= MIN_MARGIN:
+      bank.hits += 1
+      results[i] = (str(label), confidence)
+    else:
+      results[i] = (None, confidence)
+  return results
+
+def learn(image, label, kind):
+  # stores a crop template matching classified as a prototype of its label
+  bank.learn(kind, [(label, _features(image))])
+
+def stats():
+  return bank.stats()
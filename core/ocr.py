@@ -1,45 +1,255 @@
-import easyocr
 from PIL import Image
 import numpy as np
 import re
-from utils.log import debug
+import threading
+import time
+from utils.log import info, debug, warning
+import core.glyph_ocr as glyph_ocr
+import core.ocr_cache as ocr_cache
 
-reader = easyocr.Reader(["en"], gpu=False)
+# easyocr imports torch and loads the model weights, so the reader is only built when first needed
+reader = None
+_reader_lock = threading.Lock()
+_warm_up_thread = None
 
-def extract_text(pil_img: Image.Image, use_recognize=False, allowlist=None, threshold=None) -> str:
-  img_np = np.array(pil_img)
+def _resident_memory_mb():
+  try:
+    import psutil
+    return psutil.Process().memory_info().rss / 1024 / 1024
+  except ImportError:
+    pass
+  try:
+    import resource
+    import sys
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macos
+    return max_rss / 1024 / 1024 if sys.platform == "darwin" else max_rss / 1024
+  except ImportError:
+    return None
+
+def get_reader():
+  global reader
+  if reader is not None:
+    return reader
+  with _reader_lock:
+    if reader is None:
+      time_start = time.time()
+      import easyocr
+      reader = easyocr.Reader(["en"], gpu=False)
+      memory = _resident_memory_mb()
+      memory_text = f", resident memory {memory:.0f} MB" if memory is not None else ""
+      info(f"OCR reader loaded in {time.time() - time_start:.2f} seconds{memory_text}")
+  return reader
+
+def _warm_up():
+  try:
+    time_start = time.time()
+    # the first inference pays for torch's lazy initialization, do it before the bot needs it
+    get_reader().readtext(np.zeros((32, 96, 3), dtype=np.uint8))
+    debug(f"OCR warm-up finished in {time.time() - time_start:.2f} seconds")
+  except Exception as e:
+    warning(f"OCR warm-up failed: {e}")
+
+def start_warm_up():
+  # loads the reader on a background thread, get_reader() waits for it if it's still loading
+  global _warm_up_thread
+  if reader is not None or _warm_up_thread is not None:
+    return
+  _warm_up_thread = threading.Thread(target=_warm_up, name="ocr_warm_up", daemon=True)
+  _warm_up_thread.start()
+
+# recognition results below this confidence fall back to the full readtext pass
+RECOGNIZE_MIN_CONFIDENCE = 0.5
+
+def recognize_line(img_np: np.ndarray, allowlist=None):
+  """
+  Runs only the recognizer on the whole image as a single line box, skipping the text detector.
+  Meant for tightly cropped regions that hold one line of text.
+  Returns results in the readtext format, empty if nothing confident was recognized.
+  """
+  h, w = img_np.shape[:2]
+  result = get_reader().recognize(img_np, horizontal_list=[[0, w, 0, h]], free_list=[], allowlist=allowlist)
+  return [item for item in result if item[1].strip() and item[2] >= RECOGNIZE_MIN_CONFIDENCE]
+
+# height the easyocr recognizer expects its line images to be resized to
+RECOGNIZE_HEIGHT = 64
+
+def recognize_lines(images, allowlist=None):
+  """
+  Batch version of recognize_line: every image is one line box, all of them are padded to the
+  widest one and go through the recognizer as a single batch.
+  Returns one result list per image, in order.
+  """
+  if not images:
+    return []
+  from easyocr.utils import get_image_list, reformat_input
+  from easyocr.recognition import get_text
+  reader = get_reader()
+  image_list = []
+  # (image index, box) of every entry in image_list, images too small to resize have no entry
+  entries = []
+  max_width = 0
+  for index, image in enumerate(images):
+    _, grey = reformat_input(np.asarray(image))
+    h, w = grey.shape[:2]
+    crops, width = get_image_list([[0, w, 0, h]], [], grey, model_height=RECOGNIZE_HEIGHT)
+    if not crops:
+      continue
+    image_list += crops
+    entries.append((index, [[0, 0], [w, 0], [w, h], [0, h]]))
+    max_width = max(max_width, width)
+  results = [[] for _ in images]
+  if not image_list:
+    return results
+  if allowlist:
+    ignore_char = "".join(set(reader.character) - set(allowlist))
+  else:
+    ignore_char = "".join(set(reader.character) - set(reader.lang_char))
+  # reader.recognize() runs its boxes one at a time on the cpu, so the batch goes to get_text directly.
+  # It's not public API, the keywords below are the easyocr 1.7.2 signature pinned in requirements.txt
+  # and the values are the defaults recognize() passes.
+  result = get_text(reader.character, RECOGNIZE_HEIGHT, int(max_width), reader.recognizer, reader.converter, image_list,
+                    ignore_char=ignore_char, decoder="greedy", beamWidth=5, batch_size=len(image_list),
+                    contrast_ths=0.1, adjust_contrast=0.5, filter_ths=0.003, workers=0, device=reader.device)
+  for (index, box), (_, text, confidence) in zip(entries, result):
+    if text.strip() and confidence >= RECOGNIZE_MIN_CONFIDENCE:
+      results[index] = [(box, text, confidence)]
+  return results
+
+def extract_text_batch(pil_imgs, allowlist=None, glyph_kind=None, is_valid=None, retry_transform=None) -> list[str]:
+  """
+  Reads many single line crops with one recognizer batch, results come back in order.
+  Crops whose text is empty or fails is_valid are transformed with retry_transform and read again
+  as a second, smaller batch. Crops that still fail come back as "", the caller decides on a fallback.
+  """
+  if allowlist is None:
+    allowlist = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-!.,'#? "
+  texts = [""] * len(pil_imgs)
+  pending = list(range(len(pil_imgs)))
+  crops = [np.array(pil_img) for pil_img in pil_imgs]
+  for attempt in range(2 if retry_transform else 1):
+    if attempt > 0:
+      for index in pending:
+        crops[index] = np.array(retry_transform(crops[index]))
+    to_recognize = []
+    for index in pending:
+      key = ocr_cache.make_key("extract_text_batch", crops[index], allowlist, glyph_kind)
+      found, text = ocr_cache.get(key)
+      if not found and glyph_kind is not None:
+        text = glyph_ocr.read(crops[index], glyph_kind, allowlist)
+        found = text is not None
+        if found:
+          ocr_cache.put(key, text)
+      if found:
+        texts[index] = text
+      else:
+        to_recognize.append((index, key))
+    if to_recognize:
+      results = recognize_lines([crops[index] for index, _ in to_recognize], allowlist=allowlist)
+      for (index, key), result in zip(to_recognize, results):
+        text = sort_ocr_result(result)
+        _learn_glyphs(crops[index], glyph_kind, result, text)
+        ocr_cache.put(key, text)
+        texts[index] = text
+    pending = [index for index in pending if texts[index] == "" or (is_valid is not None and not is_valid(texts[index]))]
+    if not pending:
+      break
+  for index in pending:
+    texts[index] = ""
+  return texts
+
+def _learn_glyphs(img_np, glyph_kind, result, text):
+  if glyph_kind is None or not result:
+    return
+  glyph_ocr.learn(img_np, glyph_kind, text, min(item[2] for item in result))
+
+def _cached(function, function_name, img_np, *params):
+  # identical pixels with identical parameters give the same result, skip the model for them
+  key = ocr_cache.make_key(function_name, img_np, *params)
+  found, value = ocr_cache.get(key)
+  if found:
+    return value
+  value = function(img_np, *params)
+  ocr_cache.put(key, value)
+  return value
+
+def _recognized_valid(text, valid_pattern):
+  # a glyph atlas or recognizer read that doesn't look like the field could be a misread, readtext gets a go at it
+  return valid_pattern is None or re.fullmatch(valid_pattern, text) is not None
+
+def extract_text(pil_img: Image.Image, use_recognize=False, allowlist=None, threshold=None, glyph_kind=None, valid_pattern=None) -> str:
+  # use_recognize skips text detection for single line crops, falls back to readtext if nothing was recognized
+  # valid_pattern has to fully match glyph atlas and recognizer reads, otherwise they fall through to readtext
+  # glyph_kind reads the crop with the glyph atlas of that kind first, and teaches it from easyocr otherwise
+  return _cached(_extract_text, "extract_text", np.array(pil_img), use_recognize, allowlist, threshold, glyph_kind, valid_pattern)
+
+def _extract_text(img_np, use_recognize, allowlist, threshold, glyph_kind, valid_pattern):
   if allowlist is None:
     allowlist = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-!.,'#? "
+  if glyph_kind is not None:
+    text = glyph_ocr.read(img_np, glyph_kind, allowlist)
+    if text is not None and _recognized_valid(text, valid_pattern):
+      return text
   if use_recognize:
-    if threshold is not None:
-      result = reader.recognize(img_np, allowlist=allowlist, text_threshold=threshold)
-    else:
-      result = reader.recognize(img_np, allowlist=allowlist)
+    result = recognize_line(img_np, allowlist=allowlist)
+    texts = sort_ocr_result(result)
+    if result and _recognized_valid(texts, valid_pattern):
+      _learn_glyphs(img_np, glyph_kind, result, texts)
+      return texts
+  if threshold is not None:
+    result = get_reader().readtext(img_np, allowlist=allowlist, text_threshold=threshold)
   else:
-    if threshold is not None:
-      result = reader.readtext(img_np, allowlist=allowlist, text_threshold=threshold)
-    else:
-      result = reader.readtext(img_np, allowlist=allowlist)
+    result = get_reader().readtext(img_np, allowlist=allowlist)
   texts = sort_ocr_result(result)
+  _learn_glyphs(img_np, glyph_kind, result, texts)
   return texts
 
-def extract_number(pil_img: Image.Image, allowlist="0123456789", threshold=0.8) -> int:
-  img_np = np.array(pil_img)
-  result = reader.readtext(img_np, allowlist=allowlist, text_threshold=threshold)
+def extract_number(pil_img: Image.Image, allowlist="0123456789", threshold=0.8, use_recognize=False, glyph_kind=None, valid_pattern=None) -> int:
+  # valid_pattern is matched against the recognized digits
+  return _cached(_extract_number, "extract_number", np.array(pil_img), allowlist, threshold, use_recognize, glyph_kind, valid_pattern)
+
+def _extract_number(img_np, allowlist, threshold, use_recognize, glyph_kind, valid_pattern):
+  if glyph_kind is not None:
+    digits = re.sub(r"[^\d]", "", glyph_ocr.read(img_np, glyph_kind, allowlist) or "")
+    if digits and _recognized_valid(digits, valid_pattern):
+      return int(digits)
+  if use_recognize:
+    result = recognize_line(img_np, allowlist=allowlist)
+    joined_text = "".join(item[1] for item in result)
+    digits = re.sub(r"[^\d]", "", joined_text)
+    if digits and _recognized_valid(digits, valid_pattern):
+      _learn_glyphs(img_np, glyph_kind, result, joined_text)
+      return int(digits)
+  result = get_reader().readtext(img_np, allowlist=allowlist, text_threshold=threshold)
   texts = [item[1] for item in sorted(result, key=lambda x: x[0][0][0])]
   joined_text = "".join(texts)
 
   digits = re.sub(r"[^\d]", "", joined_text)
 
   if digits:
+    _learn_glyphs(img_np, glyph_kind, result, joined_text)
     return int(digits)
   return -1
 
-def extract_allowed_text(pil_img: Image.Image, allowlist="0123456789") -> int:
-  img_np = np.array(pil_img)
-  result = reader.readtext(img_np, allowlist=allowlist)
+def extract_allowed_text(pil_img: Image.Image, allowlist="0123456789", use_recognize=False, glyph_kind=None, valid_pattern=None) -> int:
+  return _cached(_extract_allowed_text, "extract_allowed_text", np.array(pil_img), allowlist, use_recognize, glyph_kind, valid_pattern)
+
+def _extract_allowed_text(img_np, allowlist, use_recognize, glyph_kind, valid_pattern):
+  if glyph_kind is not None:
+    text = glyph_ocr.read(img_np, glyph_kind, allowlist)
+    if text is not None and _recognized_valid(text, valid_pattern):
+      return text
+  if use_recognize:
+    result = recognize_line(img_np, allowlist=allowlist)
+    text = " ".join(item[1] for item in result)
+    if result and _recognized_valid(text, valid_pattern):
+      _learn_glyphs(img_np, glyph_kind, result, text)
+      return text
+  result = get_reader().readtext(img_np, allowlist=allowlist)
   texts = [item[1] for item in sorted(result, key=lambda x: x[0][0][0])]
-  return " ".join(texts)
+  text = " ".join(texts)
+  _learn_glyphs(img_np, glyph_kind, result, text)
+  return text
 
 def sort_ocr_result(results):
   sorted_results = sorted(results, key=lambda x: x[0][0][1])
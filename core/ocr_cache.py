@@ -0,0 +1,95 @@
+# LRU cache of OCR results keyed on the exact pixels of the crop and the OCR parameters,
+# the same labels get read every turn and the model gives the same answer for the same pixels.
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import utils.log as log
+from utils.log import debug, warning, args
+
+FILE_NAME = "ocr_cache.json"
+MAX_ENTRIES = 1024
+
+_lock = threading.Lock()
+_entries = OrderedDict()
+_loaded = False
+# OCR worker processes turn this off, only the main process writes the cache file
+save_enabled = True
+
+hits = 0
+misses = 0
+
+def make_key(function_name : str, img_np : np.ndarray, *params):
+  digest = hashlib.blake2b(digest_size=16)
+  digest.update(repr((function_name, img_np.shape, str(img_np.dtype), params)).encode())
+  digest.update(np.ascontiguousarray(img_np).data)
+  return digest.hexdigest()
+
+def load():
+  global _loaded
+  _loaded = True
+  if not args.persist_ocr_cache:
+    return
+  path = log.data_path(FILE_NAME)
+  if not os.path.exists(path):
+    return
+  try:
+    with open(path, "r", encoding="utf-8") as f:
+      entries = json.load(f)
+    with _lock:
+      for key, value in entries[-MAX_ENTRIES:]:
+        _entries[key] = value
+    debug(f"Loaded {len(entries)} OCR cache entries from {path}")
+  except Exception as e:
+    warning(f"Couldn't load OCR cache from {path}: {e}")
+
+def save():
+  if not args.persist_ocr_cache or not save_enabled:
+    return
+  path = log.data_path(FILE_NAME)
+  try:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _lock:
+      # oldest first, so loading keeps the recency order
+      data = json.dumps(list(_entries.items()))
+    with open(path, "w", encoding="utf-8") as f:
+      f.write(data)
+  except Exception as e:
+    warning(f"Couldn't save OCR cache to {path}: {e}")
+
+def get(key):
+  # returns (found, value)
+  global hits, misses
+  if not _loaded:
+    load()
+  with _lock:
+    if key in _entries:
+      _entries.move_to_end(key)
+      hits += 1
+      return True, _entries[key]
+    misses += 1
+  return False, None
+
+def put(key, value):
+  with _lock:
+    _entries[key] = value
+    _entries.move_to_end(key)
+    while len(_entries) > MAX_ENTRIES:
+      _entries.popitem(last=False)
+
+def clear():
+  with _lock:
+    _entries.clear()
+
+def stats():
+  lookups = hits + misses
+  return {
+    "entries": len(_entries),
+    "hits": hits,
+    "misses": misses,
+    "hit_rate": hits / lookups if lookups else 0.0,
+  }
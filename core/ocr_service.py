@@ -0,0 +1,170 @@
+# optional pool of OCR worker processes, each with its own easyocr reader, so OCR doesn't compete with
+# the bot thread, the web server and OpenCV for the same interpreter. Crops go through shared memory,
+# results come back over a pipe and are handed out as futures.
+import itertools
+import multiprocessing
+import threading
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import core.glyph_ocr as glyph_ocr
+import core.ocr as ocr
+import core.ocr_cache as ocr_cache
+import utils.log as log
+from utils.log import info, debug, warning
+
+FUNCTIONS = ("extract_text", "extract_number", "extract_allowed_text")
+
+def _worker_main(connection, torch_threads, log_dir):
+  # spawned workers start with a fresh utils.log, load the glyph atlas and OCR cache from the run's directory.
+  # Saving them is left to the main process, several workers writing the same file could corrupt it.
+  log.log_dir = log_dir
+  glyph_ocr.bank.save_enabled = False
+  ocr_cache.save_enabled = False
+  import torch
+  torch.set_num_threads(torch_threads)
+  ocr.get_reader()
+  while True:
+    try:
+      message = connection.recv()
+    except EOFError:
+      break
+    if message is None:
+      break
+    request_id, shm_name, shape, dtype, function_name, kwargs = message
+    try:
+      # spawned workers share the parent's resource tracker, the parent unlinks the block once the result is back
+      shm = shared_memory.SharedMemory(name=shm_name)
+      try:
+        image = np.ndarray(shape, dtype=dtype, buffer=shm.buf).copy()
+      finally:
+        shm.close()
+      connection.send((request_id, True, getattr(ocr, function_name)(image, **kwargs)))
+    except Exception as e:
+      connection.send((request_id, False, f"{type(e).__name__}: {e}"))
+
+class _Worker:
+  def __init__(self, process, connection):
+    self.process = process
+    self.connection = connection
+    self.send_lock = threading.Lock()
+    # {request_id: (future, shared memory block)}
+    self.pending = {}
+
+class OcrService:
+  def __init__(self, workers=2, torch_threads=1):
+    context = multiprocessing.get_context("spawn")
+    self.request_ids = itertools.count()
+    self.workers = []
+    for i in range(workers):
+      parent_connection, child_connection = context.Pipe()
+      process = context.Process(target=_worker_main, args=(child_connection, torch_threads, log.log_dir), name=f"ocr_worker_{i}", daemon=True)
+      process.start()
+      child_connection.close()
+      worker = _Worker(process, parent_connection)
+      threading.Thread(target=self._collect, args=(worker,), name=f"ocr_collector_{i}", daemon=True).start()
+      self.workers.append(worker)
+    info(f"Started {workers} OCR workers with {torch_threads} torch threads each.")
+
+  def _collect(self, worker):
+    while True:
+      try:
+        request_id, ok, value = worker.connection.recv()
+      except (EOFError, OSError):
+        break
+      future, shm = worker.pending.pop(request_id, (None, None))
+      if shm is not None:
+        shm.close()
+        shm.unlink()
+      if future is None:
+        continue
+      if ok:
+        future.set_result(value)
+      else:
+        future.set_exception(RuntimeError(f"OCR worker failed: {value}"))
+    # the worker is gone, nothing pending on it will ever finish
+    for request_id in list(worker.pending):
+      future, shm = worker.pending.pop(request_id)
+      shm.close()
+      shm.unlink()
+      future.set_exception(RuntimeError("OCR worker exited"))
+
+  def submit(self, function_name, image, **kwargs) -> Future:
+    if function_name not in FUNCTIONS:
+      raise ValueError(f"Unknown OCR function: {function_name}")
+    image = np.ascontiguousarray(np.array(image))
+    worker = min(self.workers, key=lambda worker: len(worker.pending))
+    shm = shared_memory.SharedMemory(create=True, size=max(1, image.nbytes))
+    np.ndarray(image.shape, dtype=image.dtype, buffer=shm.buf)[:] = image
+    future = Future()
+    request_id = next(self.request_ids)
+    worker.pending[request_id] = (future, shm)
+    try:
+      with worker.send_lock:
+        worker.connection.send((request_id, shm.name, image.shape, image.dtype.str, function_name, kwargs))
+    except Exception:
+      worker.pending.pop(request_id, None)
+      shm.close()
+      shm.unlink()
+      raise
+    return future
+
+  def stop(self):
+    for worker in self.workers:
+      try:
+        with worker.send_lock:
+          worker.connection.send(None)
+      except Exception:
+        pass
+    for worker in self.workers:
+      worker.process.join(timeout=5)
+      if worker.process.is_alive():
+        worker.process.terminate()
+      worker.connection.close()
+    self.workers = []
+
+service = None
+
+def start(workers, torch_threads=1):
+  global service
+  if service is not None or workers <= 0:
+    return
+  service = OcrService(workers, torch_threads)
+
+def stop():
+  global service
+  if service is None:
+    return
+  service.stop()
+  service = None
+  debug(f"OCR workers stopped.")
+
+def submit(function_name, image, **kwargs) -> Future:
+  """
+  Reads image with the core.ocr function of that name, returns a future with its result.
+  Without running workers the read happens right away on the calling thread.
+  """
+  if service is not None:
+    try:
+      return service.submit(function_name, image, **kwargs)
+    except Exception as e:
+      warning(f"Couldn't submit OCR to the workers, reading in process: {e}")
+  future = Future()
+  try:
+    future.set_result(getattr(ocr, function_name)(image, **kwargs))
+  except Exception as e:
+    future.set_exception(e)
+  return future
+
+# blocking versions of the core.ocr readers with the same signatures. Callers that need the text right away,
+# like the state readers on their thread pool, still leave the model work to the workers when they run.
+def extract_text(image, **kwargs):
+  return submit("extract_text", image, **kwargs).result()
+
+def extract_number(image, **kwargs):
+  return submit("extract_number", image, **kwargs).result()
+
+def extract_allowed_text(image, **kwargs):
+  return submit("extract_allowed_text", image, **kwargs).result()
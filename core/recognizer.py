@@ -4,6 +4,8 @@ from PIL import ImageGrab, ImageStat, Image
 
 from utils.log import info, warning, error, debug
 import utils.device_action_wrapper as device_action
+import utils.template_registry as template_registry
+import utils.nms as nms
 from utils.log import debug_window
 
 '''def match_template(template_path, region=None, threshold=0.85):
@@ -50,13 +52,7 @@ def multi_match_templates(templates, screen=None, threshold=0.85):
   return results
 '''
 def deduplicate_boxes(boxes, min_dist=5):
-  filtered = []
-  for x, y, w, h in boxes:
-    cx, cy = x + w // 2, y + h // 2
-    if all(abs(cx - (fx + fw // 2)) > min_dist or abs(cy - (fy + fh // 2)) > min_dist
-        for fx, fy, fw, fh in filtered):
-      filtered.append((x, y, w, h))
-  return filtered
+  return nms.deduplicate_boxes(boxes, min_dist=min_dist)
 
 def is_btn_active(region, treshold = 150):
   screenshot = device_action.screenshot(region_xywh=region)
@@ -67,11 +63,11 @@ def is_btn_active(region, treshold = 150):
   # Treshold btn
   return avg_brightness > treshold
 
-def count_pixels_of_color(color_rgb=[117,117,117], region=None, tolerance=2):
+def count_pixels_of_color(color_rgb=[117,117,117], region=None, tolerance=2, snapshot=None):
   # [117,117,117] is gray for missing energy, we go 2 below and 2 above so that it's more stable in recognition
   screenshot = None
   if region:
-    screenshot = device_action.screenshot(region_ltrb=region)
+    screenshot = device_action.screenshot(region_ltrb=region, snapshot=snapshot)
   else:
     return -1
 
@@ -86,29 +82,38 @@ def count_pixels_of_color(color_rgb=[117,117,117], region=None, tolerance=2):
   debug(f"Pixel count: {pixel_count}")
   return pixel_count
 
-def find_color_of_pixel(region=None):
+def find_color_of_pixel(region=None, snapshot=None):
   if region:
     #we can only return one pixel's color here, so we take the x, y and add 1 to them
     region = (region[0], region[1], region[0]+1, region[1]+1)
-    screenshot = device_action.screenshot(region_ltrb=region)
+    screenshot = device_action.screenshot(region_ltrb=region, snapshot=snapshot)
     return screenshot[0]
   else:
     return -1
 
+# {palette items: (names, colors as an int32 matrix)}, built once per color dict
+_palettes = {}
+
+def _get_palette(color_dict):
+  key = tuple((name, tuple(col)) for name, col in color_dict.items())
+  palette = _palettes.get(key)
+  if palette is None:
+    palette = (list(color_dict.keys()), np.array([col for col in color_dict.values()], dtype=np.int32))
+    _palettes[key] = palette
+  return palette
+
+def closest_colors(color_dict, target_colors):
+  # name of the closest color (Euclidean) for every row of target_colors, ties go to the first color like closest_color
+  names, colors = _get_palette(color_dict)
+  target_colors = np.asarray(target_colors, dtype=np.int32).reshape(-1, 3)
+  distances = ((target_colors[:, None, :] - colors[None, :, :]) ** 2).sum(axis=2)
+  return [names[index] for index in distances.argmin(axis=1)]
+
 def closest_color(color_dict, target_color):
-  closest_name = None
-  min_dist = float('inf')
-  target_color = np.array(target_color)
-  for name, col in color_dict.items():
-    col = np.array(col)
-    dist = np.linalg.norm(target_color - col)  # Euclidean distance
-    if dist < min_dist:
-      min_dist = dist
-      closest_name = name
-  return closest_name
+  return closest_colors(color_dict, [target_color])[0]
 
 def compare_brightness(template_path: str, other: np.ndarray, brightness_diff_threshold=0.025):
-  reference_img = cv2.imread(template_path, cv2.IMREAD_GRAYSCALE)
+  reference_img = template_registry.get_template(template_path, grayscale=True)
   reference_brightness = np.mean(reference_img)
   other_gray = cv2.cvtColor(other, cv2.COLOR_BGR2GRAY)
   region_brightness = np.mean(other_gray)
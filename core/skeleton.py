@@ -1,9 +1,8 @@
 import pyautogui
 import os
-import cv2
 
 from utils.tools import sleep, get_secs, click
-from core.state import collect_main_state, collect_training_state, clear_aptitudes_cache
+from core.state import collect_main_state, collect_training_state, clear_aptitudes_cache, extraction_stats
 from utils.shared import CleanDefaultDict
 import core.config as config
 from PIL import ImageGrab
@@ -20,22 +19,18 @@ import core.bot as bot
 from utils.log import info, warning, error, debug, log_encoded, args, record_turn, VERSION
 from utils.device_action_wrapper import BotStopException
 import utils.device_action_wrapper as device_action
+import utils.template_registry as template_registry
+import utils.location_priors as location_priors
+from utils.multi_template_detector import MultiTemplateDetector
+import core.glyph_ocr as glyph_ocr
+import core.ocr_cache as ocr_cache
+import core.date_classifier as date_classifier
+import core.icon_classifier as icon_classifier
+import core.ocr_service as ocr_service
 
 from core.strategies import Strategy
 from utils.adb_actions import init_adb
 
-def cache_templates(templates):
-  cache={}
-  image_read_color = cv2.IMREAD_COLOR
-  for name, path in templates.items():
-    img = cv2.imread(path, image_read_color)
-    img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
-    if img is None:
-      warning(f"Image doesn't exist: {img}")
-      continue
-    cache[name] = img
-  return cache
-
 templates = {
   "next": "assets/buttons/next_btn.png",
   "next2": "assets/buttons/next2_btn.png",
@@ -49,7 +44,6 @@ templates = {
   "ok_2_btn": "assets/buttons/ok_2_btn.png"
 }
 
-cached_templates = cache_templates(templates)
 
 unity_templates = {
   "close_btn": "assets/buttons/close_btn.png",
@@ -57,20 +51,25 @@ unity_templates = {
   "unity_banner_mid_screen": "assets/unity/unity_banner_mid_screen.png"
 }
 
-cached_unity_templates = cache_templates(unity_templates)
+# everything the lobby loop looks for, matched in one pass per iteration
+lobby_detector = MultiTemplateDetector(
+  {**templates, "clock_icon": "assets/icons/clock_icon.png", **unity_templates},
+  threshold=0.9,
+  thresholds={name: 0.85 for name in unity_templates},
+)
 
 def detect_scenario():
   screenshot = device_action.screenshot()
   if not device_action.locate_and_click("assets/buttons/details_btn.png", confidence=0.75, min_search_time=get_secs(2), region_ltrb=constants.SCREEN_TOP_BBOX):
     error("Details button not found.")
     raise ValueError("Details button not found.")
-  sleep(0.5)
+  device_action.wait_for_settle(timeout=get_secs(0.5))
   screenshot = device_action.screenshot()
   # find files in assets/scenario_banner make them the same as templates
   scenario_banners = {f.split(".")[0]: f"assets/scenario_banner/{f}" for f in os.listdir("assets/scenario_banner") if f.endswith(".png")}
   matches = device_action.multi_match_templates(scenario_banners, screenshot=screenshot, stop_after_first_match=True)
   device_action.locate_and_click("assets/buttons/close_btn.png", min_search_time=get_secs(1))
-  sleep(0.5)
+  device_action.wait_for_settle(timeout=get_secs(0.5))
   for name, match in matches.items():
     if match:
       return name
@@ -92,9 +91,14 @@ def career_lobby(dry_run_turn=False):
   bot.PREFERRED_POSITION_SET = False
   constants.SCENARIO_NAME = ""
   clear_aptitudes_cache()
+  date_classifier.reset()
   strategy = Strategy()
   init_adb()
   init_skill_py()
+  template_registry.preload()
+  if args.frame_grabber:
+    device_action.start_frame_grabber()
+  ocr_service.start(args.ocr_workers, torch_threads=args.ocr_torch_threads)
   try:
     while bot.is_bot_running:
       sleep(1)
@@ -112,7 +116,16 @@ def career_lobby(dry_run_turn=False):
           unity_cup_function()
           continue
 
-      matches = device_action.match_cached_templates(cached_templates, region_ltrb=constants.GAME_WINDOW_BBOX, threshold=0.9, stop_after_first_match=True)
+      detect_names = [*templates, "clock_icon"]
+      if constants.SCENARIO_NAME == "unity":
+        detect_names += unity_templates
+      detections = lobby_detector.detect(screenshot, offset=constants.GAME_WINDOW_BBOX[:2], names=detect_names)
+      # only the templates up to the first match count, same as stopping after the first match
+      matches = {}
+      for name in templates:
+        matches[name] = detections.get(name, [])
+        if len(matches[name]) > 0:
+          break
       def click_match(matches):
         if matches and len(matches) > 0:
           x, y, w, h = matches[0]
@@ -138,7 +151,7 @@ def career_lobby(dry_run_turn=False):
         non_match_count = 0
         continue
       if matches.get("cancel", False):
-        clock_icon = device_action.match_template("assets/icons/clock_icon.png", screenshot=screenshot, threshold=0.9)
+        clock_icon = detections.get("clock_icon")
         if clock_icon:
           info("Lost race, wait for input.")
           non_match_count += 1
@@ -169,7 +182,7 @@ def career_lobby(dry_run_turn=False):
         continue
 
       if constants.SCENARIO_NAME == "unity":
-        unity_matches = device_action.match_cached_templates(cached_unity_templates, region_ltrb=constants.GAME_WINDOW_BBOX)
+        unity_matches = detections
         if click_match(unity_matches.get("unity_cup_btn")):
           info("Pressed unity cup.")
           unity_cup_function()
@@ -197,6 +210,7 @@ def career_lobby(dry_run_turn=False):
         non_match_count = 0
       device_action.flush_screenshot_cache()
       info(f"Bot version: {VERSION}")
+      debug(f"Template registry: {template_registry.stats()}")
 
       action = Action()
       state_obj = collect_main_state()
@@ -335,6 +349,20 @@ def career_lobby(dry_run_turn=False):
   except BotStopException:
     info("Bot stopped by user.")
     return
+  finally:
+    device_action.stop_frame_grabber()
+    ocr_service.stop()
+    location_priors.save()
+    debug(f"Location prior hit rates: {location_priors.stats()}")
+    glyph_ocr.save()
+    debug(f"Glyph OCR: {glyph_ocr.stats()}")
+    ocr_cache.save()
+    debug(f"OCR cache: {ocr_cache.stats()}")
+    date_classifier.save()
+    debug(f"Date bank: {date_classifier.stats()}")
+    icon_classifier.save()
+    debug(f"Icon bank: {icon_classifier.stats()}")
+    debug(f"State extractor timings: {extraction_stats()}")
 
 def record_and_finalize_turn(state_obj, action):
   global last_state, action_count
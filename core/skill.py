@@ -6,7 +6,7 @@ import utils.constants as constants
 
 from utils.log import info, warning, error, debug
 from utils.screenshot import enhanced_screenshot, are_screenshots_same
-from core.ocr import extract_text
+from core.ocr import extract_text, extract_text_batch
 from core.recognizer import is_btn_active, compare_brightness
 import utils.device_action_wrapper as device_action
 
@@ -43,13 +43,14 @@ def buy_skill(state, action_count, race_check=False):
     x1, y1, x2, y2 = constants.SCROLLING_SKILL_SCREEN_BBOX
 
     if buy_skill_icons:
-      for x, y, w, h in buy_skill_icons:
-        # mutate local coordinates to world coordinates
-        x = x + x1
-        y = y + y1
-        region = (x - 420, y - 40, w + 275, h + 5)
-        screenshot = enhanced_screenshot(region)
-        text = extract_text(screenshot)
+      # mutate local coordinates to world coordinates
+      buy_skill_icons = [(x + x1, y + y1, w, h) for x, y, w, h in buy_skill_icons]
+      # read every visible skill name in one recognizer batch before clicking anything
+      skill_screenshots = [enhanced_screenshot((x - 420, y - 40, w + 275, h + 5)) for x, y, w, h in buy_skill_icons]
+      skill_texts = extract_text_batch(skill_screenshots)
+      for (x, y, w, h), screenshot, text in zip(buy_skill_icons, skill_screenshots, skill_texts):
+        if text == "":
+          text = extract_text(screenshot)
         debug(f"Extracted skill text: {text}")
         if is_skill_match(text, config.SKILL_LIST):
           button_region = (x, y, w, h)
@@ -2,17 +2,25 @@ import numpy as np
 import operator
 import re
 import cv2
+import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 from utils.log import info, warning, error, debug, debug_window, args
 
-from utils.screenshot import enhanced_screenshot, enhance_image_for_ocr, binarize_between_colors, crop_after_plus_component, clean_noise, custom_grabcut
-from core.ocr import extract_text, extract_number, extract_allowed_text
-from core.recognizer import count_pixels_of_color, find_color_of_pixel, closest_color
+from utils.screenshot import enhanced_screenshot, enhance_image_for_ocr, binarize_between_colors, crop_after_plus_component, clean_noise, custom_grabcut, color_foreground
+from core.ocr import extract_text_batch
+# single crop reads go to the OCR workers when they run, the batch reader takes callables that can't be sent there
+from core.ocr_service import extract_text, extract_number, extract_allowed_text
+import core.date_classifier as date_classifier
+import core.icon_classifier as icon_classifier
+from core.recognizer import count_pixels_of_color, find_color_of_pixel, closest_colors
 from utils.tools import click, sleep, get_secs, check_race_suitability, get_aptitude_index
 import utils.device_action_wrapper as device_action
 
 from utils.shared import CleanDefaultDict
+from core.turn_state import TurnState, TrainingObservation
 import core.config as config
 import utils.constants as constants
 from collections import defaultdict
@@ -23,40 +31,104 @@ def clear_aptitudes_cache():
   global aptitudes_cache
   aptitudes_cache = {}
 
+# the main state readers only share the captured frame, so they run side by side on this pool
+EXTRACTOR_WORKERS = min(6, os.cpu_count() or 1)
+_extractor_executor = None
+_timings_lock = threading.Lock()
+# {extractor name: [calls, total seconds, slowest seconds]}
+extractor_timings = {}
+
+def _get_extractor_executor():
+  global _extractor_executor
+  if _extractor_executor is None:
+    _extractor_executor = ThreadPoolExecutor(max_workers=EXTRACTOR_WORKERS, thread_name_prefix="state_extractor")
+  return _extractor_executor
+
+def _extract_fields(snapshot, turn):
+  """
+  Reads the main state fields from the snapshot on the extractor pool.
+  Returns ({field: value}, {extractor name: seconds}). Readers on the pool only use the snapshot, a mood or
+  year that couldn't be read from it comes back as None or outside the TIMELINE and the caller retries it live.
+  """
+  executor = _get_extractor_executor()
+  timings = {}
+  def timed(name, function, *args, **kwargs):
+    start = time.time()
+    try:
+      return function(*args, **kwargs)
+    finally:
+      timings[name] = time.time() - start
+
+  futures = {}
+  futures["current_stats"] = executor.submit(timed, "current_stats", get_current_stats, turn, snapshot=snapshot)
+  futures["current_mood"] = executor.submit(timed, "mood", get_mood, snapshot=snapshot, retry=False)
+  futures["year"] = executor.submit(timed, "year", get_current_year, snapshot=snapshot, retry=False)
+  futures["criteria"] = executor.submit(timed, "criteria", get_criteria, snapshot=snapshot)
+  futures["energy"] = executor.submit(timed, "energy", get_energy_level, snapshot=snapshot)
+  futures["date_event_available"] = executor.submit(timed, "date_event", device_action.locate, "assets/ui/recreation_with.png", snapshot=snapshot)
+  if config.DO_MISSION_RACES_IF_POSSIBLE:
+    futures["race_mission_available"] = executor.submit(timed, "race_mission", device_action.locate, "assets/icons/race_mission_icon.png", region_ltrb=constants.SCREEN_BOTTOM_BBOX, snapshot=snapshot)
+
+  fields = {name: future.result() for name, future in futures.items()}
+  with _timings_lock:
+    for name, seconds in timings.items():
+      calls, total, slowest = extractor_timings.get(name, (0, 0.0, 0.0))
+      extractor_timings[name] = [calls + 1, total + seconds, max(slowest, seconds)]
+  return fields, timings
+
+def extraction_stats():
+  with _timings_lock:
+    return {name: {"calls": calls, "mean": total / calls, "max": slowest} for name, (calls, total, slowest) in extractor_timings.items()}
+
 def collect_main_state():
   global aptitudes_cache
   debug("Start state collection. Collecting stats.")
   #??? minimum_mood_junior_year = constants.MOOD_LIST.index(config.MINIMUM_MOOD_JUNIOR_YEAR)
 
-  state_object = CleanDefaultDict()
-  state_object["current_mood"] = get_mood()
-  debug("Mood collection done.")
+  state_object = TurnState()
+  # every field is read from this one frame, readers only re-capture when they know the screen changed
+  snapshot = device_action.FrameSnapshot()
+  start = time.time()
+  # the turn reader can wait out the unity cup banner and refresh the snapshot, so it runs before the others
+  # get the frame. The stats region depends on the turn anyway.
+  turn = get_turn(snapshot=snapshot)
+  turn_seconds = time.time() - start
+  fields, timings = _extract_fields(snapshot, turn)
+  fields["turn"] = turn
+  timings["turn"] = turn_seconds
+  # retries need live frames, the cache is flushed here rather than while the other readers use it
+  if fields["current_mood"] is None:
+    fields["current_mood"] = get_mood(attempts=1)
+  if fields["year"] not in constants.TIMELINE:
+    device_action.flush_screenshot_cache()
+    fields["year"] = get_current_year()
+  elapsed = time.time() - start
+  slowest = max(timings, key=timings.get)
+  debug(f"State fields read in {elapsed:.2f}s, slowest: {slowest} {timings[slowest]:.2f}s. " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items()))
+
+  state_object["current_mood"] = fields["current_mood"]
   mood_index = constants.MOOD_LIST.index(state_object["current_mood"])
   minimum_mood_index = constants.MOOD_LIST.index(config.MINIMUM_MOOD)
   minimum_mood_junior_year_index = constants.MOOD_LIST.index(config.MINIMUM_MOOD_JUNIOR_YEAR)
   state_object["mood_difference"] = mood_index - minimum_mood_index
   state_object["mood_difference_junior_year"] = mood_index - minimum_mood_junior_year_index
-  debug("Before turn collection.")
-  state_object["turn"] = get_turn()
-  debug("Before year collection.")
-  state_object["year"] = get_current_year()
-  debug("Before criteria collection.")
-  state_object["criteria"] = get_criteria()
-  debug("Before current stats collection.")
-  state_object["current_stats"] = get_current_stats(state_object["turn"])
-  energy_level, max_energy = get_energy_level()
+  state_object["turn"] = fields["turn"]
+  state_object["year"] = fields["year"]
+  state_object["current_stats"] = fields["current_stats"]
+  state_object["criteria"] = fields["criteria"]
+  debug(f"Criteria text: {state_object['criteria']}")
+  energy_level, max_energy = fields["energy"]
   state_object["energy_level"] = energy_level
   state_object["max_energy"] = max_energy
 
   #find a better way to do this
-  if device_action.locate("assets/ui/recreation_with.png"):
+  if fields["date_event_available"]:
     state_object["date_event_available"] = True
   else:
     state_object["date_event_available"] = False
 
-  if config.DO_MISSION_RACES_IF_POSSIBLE:
-    if device_action.locate("assets/icons/race_mission_icon.png", region_ltrb=constants.SCREEN_BOTTOM_BBOX):
-      state_object["race_mission_available"] = True
+  if fields.get("race_mission_available"):
+    state_object["race_mission_available"] = True
   # first init or inspiration.
   if aptitudes_cache and "Early Apr" not in state_object["year"]:
     state_object["aptitudes"] = aptitudes_cache
@@ -80,7 +152,13 @@ def collect_training_state(state_object, training_function_name):
   if device_action.locate_and_click("assets/buttons/training_btn.png", min_search_time=get_secs(5), region_ltrb=constants.SCREEN_BOTTOM_BBOX):
     training_results = CleanDefaultDict()
     sleep(0.25)
+    # the device side only swipes and captures, the captured frames are analyzed on the extractor pool meanwhile
+    executor = _get_extractor_executor()
+    analyses = {}
+    sweep_start = time.time()
+    capture_time = 0.0
     for name, mouse_pos in constants.TRAINING_BUTTON_POSITIONS.items():
+      capture_start = time.time()
       # swipe up to avoid clicking on the training button again.
       device_action.swipe(mouse_pos, (mouse_pos[0], mouse_pos[1] + 150), duration=0.1)
       sleep(0.15)
@@ -95,9 +173,25 @@ def collect_training_state(state_object, training_function_name):
         if not equal:
           debug("Training samples diverged")
           debug(info)
-      training_results[name].update(get_training_data(year=state_object["year"], check_stat_gains=check_stat_gains))
-      training_results[name].update(get_support_card_data())
-
+      snapshot = device_action.FrameSnapshot()
+      capture_time += time.time() - capture_start
+      analyses[name] = executor.submit(_analyze_training, snapshot, state_object["year"], check_stat_gains)
+
+    analysis_time = 0.0
+    for name, analysis in analyses.items():
+      try:
+        training_data, support_card_data, seconds = analysis.result()
+      except SnapshotReadError as e:
+        # select the training again and read it live, the screen shows whichever training was captured last
+        debug(f"{e}, reading {name} training again.")
+        mouse_pos = constants.TRAINING_BUTTON_POSITIONS[name]
+        device_action.swipe(mouse_pos, (mouse_pos[0], mouse_pos[1] + 150), duration=0.1)
+        sleep(0.15)
+        device_action.flush_screenshot_cache()
+        training_data, support_card_data, seconds = _analyze_training(None, state_object["year"], check_stat_gains)
+      training_results[name] = TrainingObservation.from_dict({**training_data, **support_card_data})
+      analysis_time += seconds
+    debug(f"Training sweep took {time.time() - sweep_start:.2f}s, capturing {capture_time:.2f}s, analyzing {analysis_time:.2f}s.")
     debug(f"Training results: {training_results}")
     
     training_results = filter_training_lock(training_results)
@@ -107,6 +201,17 @@ def collect_training_state(state_object, training_function_name):
   debug(f"State object: {state_object}")
   return state_object
 
+class SnapshotReadError(Exception):
+  # a field couldn't be read from a captured frame and needs a new capture of the same screen
+  pass
+
+def _analyze_training(snapshot, year, check_stat_gains):
+  # everything read from one training's frame, returns (training data, support card data, seconds taken)
+  start = time.time()
+  training_data = get_training_data(year=year, check_stat_gains=check_stat_gains, snapshot=snapshot)
+  support_card_data = get_support_card_data(snapshot=snapshot)
+  return training_data, support_card_data, time.time() - start
+
 def filter_training_lock(training_results):
   values = list(training_results.values())
   fingerprints = [training_fingerprint(v) for v in values]
@@ -178,83 +283,91 @@ def is_valid_training(name, training):
 
   return training_keys == valid_keys
 
-def get_support_card_data(threshold=0.8):
+def get_support_card_data(threshold=0.8, snapshot=None):
   count_result = CleanDefaultDict()
   if constants.SCENARIO_NAME == "unity":
     region_xywh = constants.UNITY_SUPPORT_CARD_ICON_REGION
   else:
     region_xywh = constants.SUPPORT_CARD_ICON_REGION
-  screenshot = device_action.screenshot(region_xywh=region_xywh)
+  screenshot = device_action.screenshot(region_xywh=region_xywh, snapshot=snapshot)
 
   if constants.SCENARIO_NAME == "unity":
     unity_training_matches = device_action.match_template("assets/unity/unity_training.png", screenshot, threshold)
     unity_gauge_matches = device_action.match_template("assets/unity/unity_gauge_unfilled.png", screenshot, threshold)
     unity_spirit_exp_matches = device_action.match_template("assets/unity/unity_spirit_explosion.png", screenshot, threshold)
 
-    for training_match in unity_training_matches:
-      count_result["unity_trainings"] += 1
-      for gauge_match in unity_gauge_matches:
-        dist = gauge_match[1] - training_match[1]
-        if dist < 100 and dist > 0:
-          count_result["unity_gauge_fills"] += 1
-          # each unity training can only be matched to one gauge fill, so break
-          break
+    if len(unity_training_matches) > 0:
+      count_result["unity_trainings"] += len(unity_training_matches)
+      # each unity training can only be matched to one gauge fill, a gauge 0-100 pixels below it
+      if len(unity_gauge_matches) > 0:
+        dist = np.array(unity_gauge_matches)[None, :, 1] - np.array(unity_training_matches)[:, None, 1]
+        gauge_fills = int(((dist > 0) & (dist < 100)).any(axis=1).sum())
+        if gauge_fills:
+          count_result["unity_gauge_fills"] += gauge_fills
 
-    for spirit_exp_match in unity_spirit_exp_matches:
-      count_result["unity_spirit_explosions"] += 1
+    if len(unity_spirit_exp_matches) > 0:
+      count_result["unity_spirit_explosions"] += len(unity_spirit_exp_matches)
 
   hint_matches = device_action.match_template("assets/icons/support_hint.png", screenshot, threshold)
+  hint_ys = np.array([hint_match[1] for hint_match in hint_matches], dtype=np.int32)
 
+  icon_matches = []
   for key, icon_path in constants.SUPPORT_ICONS.items():
-    matches = device_action.match_template(icon_path, screenshot, threshold)
-
-    for match in matches:
-      # auto-created entries if not yet present
+    for match in device_action.match_template(icon_path, screenshot, threshold):
       debug(f"{key} match: {match}")
-      count_result[key]["supports"] += 1
-      count_result["total_supports"] += 1
-
-      # get friend level
-      x, y, w, h = match
-      icon_to_friend_bar_distance = 66
-      bbox_left = region_xywh[0] + x + w // 2
-      bbox_top = region_xywh[1] + y + h // 2 + icon_to_friend_bar_distance
-      wanted_pixel = (bbox_left, bbox_top, bbox_left + 1, bbox_top + 1)
-
-      friendship_level_color = find_color_of_pixel(wanted_pixel)
-      friend_level = closest_color(constants.SUPPORT_FRIEND_LEVELS, friendship_level_color)
-
-      count_result[key]["friendship_levels"][friend_level] += 1
-      count_result["total_friendship_levels"][friend_level] += 1
-
-      for hint_match in hint_matches:
-        if abs(hint_match[1] - match[1]) < 45:
-          count_result[key]["hints"] += 1
-          count_result["total_hints"] += 1
-          count_result["hints_per_friend_level"][friend_level] += 1
+      icon_matches.append((key, match))
+  if not icon_matches:
+    return count_result
+
+  # the friendship bar sits under the icon's center, all bar pixels are read from the region screenshot at once
+  boxes = np.array([match for _, match in icon_matches], dtype=np.int32)
+  icon_to_friend_bar_distance = 66
+  bar_xs = boxes[:, 0] + boxes[:, 2] // 2
+  bar_ys = boxes[:, 1] + boxes[:, 3] // 2 + icon_to_friend_bar_distance
+  inside = (bar_xs < screenshot.shape[1]) & (bar_ys < screenshot.shape[0])
+  bar_colors = np.zeros((len(icon_matches), 3), dtype=np.int32)
+  bar_colors[inside] = screenshot[bar_ys[inside], bar_xs[inside], :3]
+  for i in np.flatnonzero(~inside):
+    # the region doesn't reach the bar, read the pixel on its own
+    bbox_left, bbox_top = region_xywh[0] + bar_xs[i], region_xywh[1] + bar_ys[i]
+    bar_colors[i] = find_color_of_pixel((bbox_left, bbox_top, bbox_left + 1, bbox_top + 1), snapshot=snapshot)[:3]
+  friend_levels = closest_colors(constants.SUPPORT_FRIEND_LEVELS, bar_colors)
+
+  # a hint belongs to every icon less than 45 pixels above or below it
+  hint_counts = (np.abs(hint_ys[None, :] - boxes[:, 1:2]) < 45).sum(axis=1)
+
+  for (key, match), friend_level, hints in zip(icon_matches, friend_levels, hint_counts):
+    count_result[key]["supports"] += 1
+    count_result["total_supports"] += 1
+    count_result[key]["friendship_levels"][friend_level] += 1
+    count_result["total_friendship_levels"][friend_level] += 1
+    if hints:
+      count_result[key]["hints"] += int(hints)
+      count_result["total_hints"] += int(hints)
+      count_result["hints_per_friend_level"][friend_level] += int(hints)
 
   return count_result
 
-def get_training_data(year=None, check_stat_gains = False):
+def get_training_data(year=None, check_stat_gains = False, snapshot=None):
   results = {}
 
   if constants.SCENARIO_NAME == "unity":
-    results["failure"] = get_failure_chance(region_xywh=constants.UNITY_FAILURE_REGION)
+    results["failure"] = get_failure_chance(region_xywh=constants.UNITY_FAILURE_REGION, snapshot=snapshot)
     if check_stat_gains:
-      stat_gains = get_stat_gains(year=year, region_xywh=constants.UNITY_STAT_GAINS_REGION, scale_factor=1.5)
-      stat_gains2 = get_stat_gains(year=year, region_xywh=constants.UNITY_STAT_GAINS_2_REGION, scale_factor=1.5, secondary_stat_gains=True)
+      stat_gains = get_stat_gains(year=year, region_xywh=constants.UNITY_STAT_GAINS_REGION, scale_factor=1.5, snapshot=snapshot)
+      stat_gains2 = get_stat_gains(year=year, region_xywh=constants.UNITY_STAT_GAINS_2_REGION, scale_factor=1.5, secondary_stat_gains=True, snapshot=snapshot)
       for key, value in stat_gains.items():
         if key in stat_gains2:
           stat_gains[key] += stat_gains2[key]
       results["stat_gains"] = stat_gains
   else:
-    results["failure"] = get_failure_chance(region_xywh=constants.FAILURE_REGION)
+    results["failure"] = get_failure_chance(region_xywh=constants.FAILURE_REGION, snapshot=snapshot)
     if check_stat_gains:
-      results["stat_gains"] = get_stat_gains(year=year, region_xywh=constants.URA_STAT_GAINS_REGION)
+      results["stat_gains"] = get_stat_gains(year=year, region_xywh=constants.URA_STAT_GAINS_REGION, snapshot=snapshot)
 
   return results
 
-def get_stat_gains(year=1, attempts=0, enable_debug=True, show_screenshot=False, region_xywh=None, scale_factor=1, secondary_stat_gains=False):
+def get_stat_gains(year=1, attempts=0, enable_debug=True, show_screenshot=False, region_xywh=None, scale_factor=1, secondary_stat_gains=False, snapshot=None):
   if region_xywh is None:
     raise ValueError("region_xywh is required")
   
@@ -271,12 +384,17 @@ def get_stat_gains(year=1, attempts=0, enable_debug=True, show_screenshot=False,
   for i in range(1):
     if i > 0:
       device_action.flush_screenshot_cache()
-    stat_screenshot = device_action.screenshot(region_xywh=region_xywh)
+    stat_screenshot = device_action.screenshot(region_xywh=region_xywh, snapshot=snapshot)
     if secondary_stat_gains:
       mask_area=1
     else:
       mask_area=2
-    stat_screenshot = custom_grabcut(stat_screenshot, mask_area=mask_area)
+    segmented, valid = color_foreground(stat_screenshot, lower_yellow, upper_yellow)
+    if valid:
+      stat_screenshot = segmented
+    else:
+      debug("Stat gain text didn't separate by color, falling back to grabcut.")
+      stat_screenshot = custom_grabcut(stat_screenshot, mask_area=mask_area)
     if enable_debug:
       debug_window(stat_screenshot, save_name="grabcut")
     if scale_factor != 1:
@@ -292,7 +410,9 @@ def get_stat_gains(year=1, attempts=0, enable_debug=True, show_screenshot=False,
     stat_screenshots.append(stat_screenshot)
     if enable_debug:
       debug_window(stat_screenshot, save_name=f"stat_screenshot_{i}_{year}", show_on_screen=show_screenshot)
-    sleep(0.15)
+    # spaces out live samples, a snapshot won't change
+    if snapshot is None:
+      sleep(0.15)
   
   # find black pixels that do not change between the three screenshots
   diff = stat_screenshots[0]
@@ -313,6 +433,7 @@ def get_stat_gains(year=1, attempts=0, enable_debug=True, show_screenshot=False,
 
   h, w = stat_screenshot.shape
   stat_gains={}
+  crops = {}
   for key, (xr, yr, wr, hr) in boxes.items():
     x, y, ww, hh = int(xr*w), int(yr*h), int(wr*w), int(hr*h)
     cropped_image = np.array(stat_screenshot[y:y+hh, x:x+ww])
@@ -329,7 +450,15 @@ def get_stat_gains(year=1, attempts=0, enable_debug=True, show_screenshot=False,
     cropped_image = clean_noise(cropped_image)
     if enable_debug:
       debug_window(cropped_image, save_name=f"stat_{key}_cleaned_{year}", show_on_screen=show_screenshot)
-    text = extract_number(cropped_image)
+    crops[key] = cropped_image
+
+  texts = extract_text_batch(list(crops.values()), allowlist="0123456789", glyph_kind="stat_gain", is_valid=lambda text: re.sub(r"[^\d]", "", text) != "")
+  for (key, cropped_image), text in zip(crops.items(), texts):
+    digits = re.sub(r"[^\d]", "", text)
+    if digits:
+      text = int(digits)
+    else:
+      text = extract_number(cropped_image, glyph_kind="stat_gain")
 
     if text != -1:
       if enable_debug:
@@ -341,17 +470,20 @@ def get_stat_gains(year=1, attempts=0, enable_debug=True, show_screenshot=False,
       debug(f"[STAT_GAINS] {year} Extraction failed. Gains: {stat_gains}")
     return stat_gains
   elif any(value > 100 for value in stat_gains.values()):
+    if snapshot is not None:
+      # the same frame reads the same every time, the training has to be captured again
+      raise SnapshotReadError(f"[STAT_GAINS] {year} Too high on the captured frame. Gains: {stat_gains}")
     if enable_debug:
       debug(f"[STAT_GAINS] {year} Too high, retrying. Gains: {stat_gains}")
-    return get_stat_gains(year=year, attempts=attempts + 1, enable_debug=enable_debug, show_screenshot=show_screenshot, region_xywh=region_xywh)
+    return get_stat_gains(year=year, attempts=attempts + 1, enable_debug=enable_debug, show_screenshot=show_screenshot, region_xywh=region_xywh, scale_factor=scale_factor, secondary_stat_gains=secondary_stat_gains)
   debug(f"[STAT_GAINS] {year} Gains: {stat_gains}")
   return stat_gains
 
 
-def get_failure_chance(region_xywh=None):
+def get_failure_chance(region_xywh=None, snapshot=None):
   if region_xywh is None:
     raise ValueError("region_xywh is required")
-  screenshot = device_action.screenshot(region_xywh=region_xywh)
+  screenshot = device_action.screenshot(region_xywh=region_xywh, snapshot=snapshot)
   match = device_action.match_template("assets/ui/fail_percent_symbol.png", screenshot, grayscale=True, threshold=0.75)
   if not match:
     error("Failed to match percent symbol, cannot produce failure percentage result.")
@@ -360,51 +492,58 @@ def get_failure_chance(region_xywh=None):
     x, y, w, h = match[0]
     x = x + region_xywh[0]
     y = y + region_xywh[1]
-  failure_cropped = device_action.screenshot(region_ltrb=(x - 40, y - 3, x, y + h + 3))
+  failure_cropped = device_action.screenshot(region_ltrb=(x - 40, y - 3, x, y + h + 3), snapshot=snapshot)
   enhanced = enhance_image_for_ocr(failure_cropped, resize_factor=4, binarize_threshold=None)
 
   threshold=0.7
-  failure_text = extract_number(enhanced, threshold=threshold)
+  failure_text = extract_number(enhanced, threshold=threshold, use_recognize=True, glyph_kind="failure", valid_pattern=r"100|\d{1,2}")
   while failure_text == -1 and threshold > 0.2:
     threshold=threshold-0.1
     failure_text = extract_number(enhanced, threshold=threshold)
 
   return failure_text
 
-def get_mood(attempts=0):
+def get_mood(attempts=0, snapshot=None, retry=True):
   if attempts >= 10:
     debug("Mood determination failed after 10 attempts, returning GREAT for compatibility reasons")
     return "GREAT"
 
-  mood_screenshot = device_action.screenshot(region_xywh=constants.MOOD_REGION) 
+  mood_screenshot = device_action.screenshot(region_xywh=constants.MOOD_REGION, snapshot=snapshot)
+  name, confidence = icon_classifier.classify([mood_screenshot], "mood")[0]
+  if name is not None:
+    debug(f"Mood: {name}, confidence: {confidence:.3f}")
+    return name
   matches = device_action.multi_match_templates(constants.MOOD_IMAGES, mood_screenshot, stop_after_first_match=True)
   for name, match in matches.items():
     if match:
       debug(f"Mood: {name}")
+      icon_classifier.learn(mood_screenshot, name, "mood")
       return name
 
+  if not retry:
+    return None
   debug(f"Mood couldn't be determined, retrying (attempt {attempts + 1}/10)")
   return get_mood(attempts + 1)
 
 # Check turn
-def get_turn():
-  if device_action.locate("assets/buttons/race_day_btn.png", region_ltrb=constants.SCREEN_BOTTOM_BBOX):
+def get_turn(snapshot=None):
+  if device_action.locate("assets/buttons/race_day_btn.png", region_ltrb=constants.SCREEN_BOTTOM_BBOX, snapshot=snapshot):
     return "Race Day"
-  elif device_action.locate("assets/ura/ura_race_btn.png", region_ltrb=constants.SCREEN_BOTTOM_BBOX):
+  elif device_action.locate("assets/ura/ura_race_btn.png", region_ltrb=constants.SCREEN_BOTTOM_BBOX, snapshot=snapshot):
     return "Race Day"
   if constants.SCENARIO_NAME == "unity":
     region_xywh = constants.UNITY_TURN_REGION
   else:
     region_xywh = constants.TURN_REGION
-  turn = device_action.screenshot(region_xywh=region_xywh)
+  turn = device_action.screenshot(region_xywh=region_xywh, snapshot=snapshot)
   turn = enhance_image_for_ocr(turn, resize_factor=2)
-  turn_text = extract_allowed_text(turn, allowlist="0123456789")
+  turn_text = extract_allowed_text(turn, allowlist="0123456789", use_recognize=True, glyph_kind="turn", valid_pattern=r"\d{1,2}")
   debug(f"Turn text: {turn_text}")
 
   if constants.SCENARIO_NAME == "unity":
-    race_turns = device_action.screenshot(region_xywh=constants.UNITY_RACE_TURNS_REGION)
+    race_turns = device_action.screenshot(region_xywh=constants.UNITY_RACE_TURNS_REGION, snapshot=snapshot)
     race_turns = enhance_image_for_ocr(race_turns, resize_factor=4, binarize_threshold=None)
-    race_turns_text = extract_allowed_text(race_turns, allowlist="0123456789")
+    race_turns_text = extract_allowed_text(race_turns, allowlist="0123456789", use_recognize=True, glyph_kind="race_turns", valid_pattern=r"\d{1,2}")
     digits_only = re.sub(r"[^\d]", "", race_turns_text)
     if digits_only:
       digits_only = int(digits_only)
@@ -412,6 +551,9 @@ def get_turn():
       if digits_only in [5, 10]:
         info(f"Race turns left until unity cup: {digits_only}, waiting for 3 seconds to allow banner to pass.")
         sleep(3)
+        # the banner is in the snapshot, the fields read after this need the screen without it
+        if snapshot is not None:
+          snapshot.refresh()
 
   digits_only = re.sub(r"[^\d]", "", turn_text)
 
@@ -421,30 +563,43 @@ def get_turn():
   return -1
 
 # Check year
-def get_current_year():
+def get_current_year(snapshot=None, retry=True):
   if constants.SCENARIO_NAME == "unity":
     region_xywh = constants.UNITY_YEAR_REGION
+    date_kind = "unity"
   else:
     region_xywh = constants.YEAR_REGION
-  for i in range(10):
-    year = enhanced_screenshot(region_xywh)
-    text = extract_text(year, allowlist=constants.OCR_DATE_RECOGNITION_SET)
+    date_kind = "default"
+  for i in range(10 if retry else 1):
+    if i > 0:
+      # retries need new frames
+      device_action.flush_screenshot_cache()
+      snapshot = None
+    year = enhanced_screenshot(region_xywh, snapshot=snapshot)
+    text = date_classifier.classify(year, kind=date_kind)
+    if text is not None:
+      debug(f"Year from date bank: {text}")
+      break
+    text = extract_text(year, allowlist=constants.OCR_DATE_RECOGNITION_SET, use_recognize=True)
     text = text.replace("Pre Debut", "Pre-Debut")
+    if text not in constants.TIMELINE:
+      # the recognizer can merge or split words differently than readtext, check with the detector too
+      text = extract_text(year, allowlist=constants.OCR_DATE_RECOGNITION_SET)
+      text = text.replace("Pre Debut", "Pre-Debut")
     debug(f"Year text: {text}")
     if text in constants.TIMELINE:
+      date_classifier.learn(year, text, kind=date_kind)
       break
-    else:
-      device_action.flush_screenshot_cache()
 
   return text
 
 # Check criteria
-def get_criteria():
+def get_criteria(snapshot=None):
   if constants.SCENARIO_NAME == "unity":
     region_xywh = constants.UNITY_CRITERIA_REGION
   else:
     region_xywh = constants.CRITERIA_REGION
-  img = enhanced_screenshot(region_xywh)
+  img = enhanced_screenshot(region_xywh, snapshot=snapshot)
   text = extract_text(img)
   debug(f"Criteria text: {text}")
   return text
@@ -456,11 +611,11 @@ def is_number(text):
   except ValueError:
     return False
 
-def get_current_stats(turn, enable_debug=True):
+def get_current_stats(turn, enable_debug=True, snapshot=None):
   stats_region = constants.CURRENT_STATS_REGION
   if turn == "Race Day":
     stats_region = (stats_region[0], stats_region[1] + 55, stats_region[2], stats_region[3])
-  image = device_action.screenshot(region_xywh=stats_region)
+  image = device_action.screenshot(region_xywh=stats_region, snapshot=snapshot)
 
   # Arcane numbers that divide the screen into boxes with ratios. Left, top, width, height
   boxes = {
@@ -473,15 +628,26 @@ def get_current_stats(turn, enable_debug=True):
   }
 
   h, w = image.shape[:2]
-  current_stats={}
+  crops = {}
   for key, (xr, yr, wr, hr) in boxes.items():
     x, y, ww, hh = int(xr*w), int(yr*h), int(wr*w), int(hr*h)
-    cropped_image = np.array(image[y:y+hh, x:x+ww])
-    final_stat_value = -1
+    crops[key] = np.array(image[y:y+hh, x:x+ww])
     if enable_debug:
-      debug_window(cropped_image, save_name=f"stat_{key}_cropped")
-    final_stat_value = extract_text(cropped_image, allowlist="0123456789MAX")
+      debug_window(crops[key], save_name=f"stat_{key}_cropped")
+  # all six boxes go through the recognizer together, unreadable ones are retried enhanced
+  texts = extract_text_batch(
+    list(crops.values()),
+    allowlist="0123456789MAX",
+    glyph_kind="stat",
+    is_valid=lambda text: text == "MAX" or is_number(text),
+    retry_transform=lambda crop: enhance_image_for_ocr(crop, binarize_threshold=None),
+  )
+
+  current_stats={}
+  for (key, cropped_image), final_stat_value in zip(crops.items(), texts):
     debug(f"Initial stat value: {final_stat_value}")
+    if final_stat_value == "":
+      final_stat_value = extract_text(cropped_image, allowlist="0123456789MAX")
     if final_stat_value == "":
       cropped_image = enhance_image_for_ocr(cropped_image, binarize_threshold=None)
       final_stat_value = extract_text(cropped_image, allowlist="0123456789MAX")
@@ -526,25 +692,34 @@ def get_aptitudes():
   }
 
   h, w = image.shape[:2]
+  crops = {}
   for key, (xr, yr, wr, hr) in boxes.items():
     x, y, ww, hh = int(xr*w), int(yr*h), int(wr*w), int(hr*h)
-    cropped_image = np.array(image[y:y+hh, x:x+ww])
+    crops[key] = np.array(image[y:y+hh, x:x+ww])
+  # all boxes against the icon bank at once, template matching only for the ones it isn't sure about
+  classified = icon_classifier.classify(list(crops.values()), "aptitude")
+  for (key, cropped_image), (name, confidence) in zip(crops.items(), classified):
+    if name is not None:
+      debug(f"Aptitude {key}: {name}, confidence: {confidence:.3f}")
+      aptitudes[key] = name
+      continue
     matches = device_action.multi_match_templates(constants.APTITUDE_IMAGES, cropped_image, stop_after_first_match=True)
     for name, match in matches.items():
       if match:
         aptitudes[key] = name
+        icon_classifier.learn(cropped_image, name, "aptitude")
         #debug_window(cropped_image)
 
   info(f"Parsed aptitude values: {aptitudes}. If these values are wrong, please stop and start the bot again with the hotkey.")
   return aptitudes
 
-def get_energy_level(threshold=0.85):
+def get_energy_level(threshold=0.85, snapshot=None):
   # find where the right side of the bar is on screen
   if constants.SCENARIO_NAME == "unity":
     region_xywh = constants.UNITY_ENERGY_REGION
   else:
     region_xywh = constants.ENERGY_REGION
-  screenshot = device_action.screenshot(region_xywh=region_xywh)
+  screenshot = device_action.screenshot(region_xywh=region_xywh, snapshot=snapshot)
 
   right_bar_match = device_action.match_template("assets/ui/energy_bar_right_end_part.png", screenshot, threshold)
   # longer energy bars get more round at the end
@@ -560,10 +735,10 @@ def get_energy_level(threshold=0.85):
     top_bottom_middle_pixel = int(y + h // 2)
     debug(f"Top bottom middle pixel: {top_bottom_middle_pixel}")
     MAX_ENERGY_REGION = (x, top_bottom_middle_pixel, x + energy_bar_length, top_bottom_middle_pixel+1)
-    debug_window(device_action.screenshot(region_ltrb=MAX_ENERGY_REGION), save_name="MAX_ENERGY_REGION")
+    debug_window(device_action.screenshot(region_ltrb=MAX_ENERGY_REGION, snapshot=snapshot), save_name="MAX_ENERGY_REGION")
     debug(f"MAX_ENERGY_REGION: {MAX_ENERGY_REGION}")
     #[117,117,117] is gray for missing energy, region templating for this one is a problem, so we do this
-    empty_energy_pixel_count = count_pixels_of_color([115,115,115], MAX_ENERGY_REGION, tolerance=5)
+    empty_energy_pixel_count = count_pixels_of_color([115,115,115], MAX_ENERGY_REGION, tolerance=5, snapshot=snapshot)
 
     #use the energy_bar_length (a few extra pixels from the outside are remaining so we subtract that)
     total_energy_length = energy_bar_length - 1
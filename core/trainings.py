@@ -1,8 +1,11 @@
 # core/trainings.py
+import numpy as np
+
 from utils.log import error, info, warning, debug
 from core.actions import Action
 import core.config as config
 from utils.shared import CleanDefaultDict
+from core.turn_state import TrainingObservation, STATS, SUPPORT_TYPE_INDEX, FRIEND_LEVELS, FRIEND_LEVEL_INDEX, UNITY_COUNTERS
 import utils.constants as constants
 
 # Training function names:
@@ -14,28 +17,28 @@ def create_training_score_entry(training_name, training_data, score_tuple):
 
   Args:
     training_name: Name of the training
-    training_data: Training data dictionary
+    training_data: TrainingObservation of the training
     score_tuple: Calculated score tuple
 
   Returns:
     Dictionary with standardized training score data
   """
-  total_rainbow_friends = training_data[training_name]["friendship_levels"]["yellow"] + training_data[training_name]["friendship_levels"]["max"]
-  total_friendship_increases = training_data[training_name]["friendship_levels"]["gray"] + training_data[training_name]["friendship_levels"]["blue"] + training_data[training_name]["friendship_levels"]["green"]
+  total_rainbow_friends = training_data.rainbow_friends(training_name)
+  total_friendship_increases = training_data.friendship_increases(training_name)
 
   entry = {
     "score_tuple": score_tuple,
     "failure": training_data["failure"],
-    "total_supports": training_data["total_supports"],
+    "total_supports": training_data.total_supports,
     "stat_gains": training_data["stat_gains"],
     "friendship_levels": training_data["total_friendship_levels"],
     "total_rainbow_friends": total_rainbow_friends,
     "total_friendship_increases": total_friendship_increases
   }
   if constants.SCENARIO_NAME == "unity":
-    entry["unity_gauge_fills"] = training_data["unity_gauge_fills"]
-    entry["unity_trainings"] = training_data["unity_trainings"]
-    entry["unity_spirit_explosions"] = training_data["unity_spirit_explosions"]
+    entry["unity_gauge_fills"] = training_data.unity_gauge_fills
+    entry["unity_trainings"] = training_data.unity_trainings
+    entry["unity_spirit_explosions"] = training_data.unity_spirit_explosions
 
   return entry
 
@@ -55,47 +58,32 @@ def fill_trainings_for_action(action, training_scores):
   action["available_trainings"] = training_score_dict  # Store all available trainings with scores
   return action
 
-def rainbow_training(state, training_template, action):
-  filtered_results = filter_safe_trainings(state, training_template, use_risk_taking=True, check_stat_caps=True)
-  if not filtered_results:
-    info("No safe training found for rainbow training.")
-    return action
-  
+def _strategy_scores(state, training_template, action, function_name, filtered_results):
+  # score entries of the filtered trainings and the best score, the scores of all trainings come from the engine at once
+  engine = get_scoring_engine(state, training_template)
+  scores = engine.strategy_scores(function_name)
   training_scores = {}
   best_score = -1
-
-  def _calculate_score(x):
-    # main score
-    score_tuple = rainbow_training_score(x)
-    score_tuple = add_scenario_gimmick_score(x, score_tuple, state)
-    # supporting score
-    non_max_support_score = max_out_friendships_score(x)
-    non_max_support_score = (non_max_support_score[0] * config.NON_MAX_SUPPORT_WEIGHT, non_max_support_score[1])
-    score_tuple = (score_tuple[0] + non_max_support_score[0], score_tuple[1])
-    debug(f"Total training score: {score_tuple[0]}")
-    return score_tuple
-
   for training_name, training_data in filtered_results.items():
-    score_tuple = _calculate_score((training_name, training_data))
-    training_scores[training_name] = create_training_score_entry(
-      training_name, training_data, score_tuple
-    )
-  
+    score_tuple = scores[training_name]
+    training_scores[training_name] = create_training_score_entry(training_name, training_data, score_tuple)
     if score_tuple[0] > best_score:
       best_score = score_tuple[0]
+  debug(f"{function_name} scores of all trainings: {scores}")
+  minimum_score = engine.minimum_score(function_name)
+  if minimum_score is not None:
+    if not action.get("min_scores"):
+      action["min_scores"] = CleanDefaultDict()
+    action["min_scores"][function_name] = minimum_score
+  return training_scores, best_score, minimum_score
 
-  minimum_acceptable_data = (
-    'training_name',
-    CleanDefaultDict({
-      'training_name': {'supports': 1, 'friendship_levels': {'max': 1}},
-      'unity_spirit_explosions': 1,
-    })
-  )
-
-  minimum_score = _calculate_score(minimum_acceptable_data)
-  if not action.get("min_scores"):
-    action["min_scores"] = CleanDefaultDict()
-  action["min_scores"]["rainbow_training"] = minimum_score
+def rainbow_training(state, training_template, action):
+  filtered_results = filter_safe_trainings(state, training_template, use_risk_taking=True, check_stat_caps=True)
+  if not filtered_results:
+    info("No safe training found for rainbow training.")
+    return action
+
+  training_scores, best_score, minimum_score = _strategy_scores(state, training_template, action, "rainbow_training", filtered_results)
   info(f"rainbow_training scores: {training_scores}")
 
   if best_score < minimum_score[0]:
@@ -113,41 +101,7 @@ def max_out_friendships(state, training_template, action):
     info("No safe training found for friendship maximization.")
     return action
 
-  # Calculate scores for all available trainings once
-  training_scores = {}
-  best_score = -1
-  def _calculate_score(x):
-    # main score
-    max_friendships_score_tuple = max_out_friendships_score(x)
-    score_tuple = add_scenario_gimmick_score(x, max_friendships_score_tuple, state)
-    # supporting score
-    rainbow_score = rainbow_training_score(x)
-
-    score_tuple = (score_tuple[0] + rainbow_score[0] * 0.25 * config.RAINBOW_SUPPORT_WEIGHT_ADDITION, score_tuple[1])
-    debug(f"Total training score: {score_tuple[0]}")
-
-    return score_tuple
-
-  for training_name, training_data in filtered_results.items():
-    score_tuple = _calculate_score((training_name, training_data))
-    training_scores[training_name] = create_training_score_entry(
-      training_name, training_data, score_tuple
-    )
-
-    if score_tuple[0] > best_score:
-      best_score = score_tuple[0]
-
-  minimum_acceptable_data = (
-    "training_name",
-    CleanDefaultDict({
-      "total_friendship_levels":{"green": 2},
-      "unity_gauge_fills": 1
-    })
-  )
-  minimum_score = _calculate_score(minimum_acceptable_data)
-  if not action.get("min_scores"):
-    action["min_scores"] = CleanDefaultDict()
-  action["min_scores"]["max_out_friendships"] = minimum_score
+  training_scores, best_score, minimum_score = _strategy_scores(state, training_template, action, "max_out_friendships", filtered_results)
   info(f"max_out_friendships scores: {training_scores}")
 
   if best_score < minimum_score[0]:
@@ -165,43 +119,8 @@ def most_support_cards(state, training_template, action):
     info("No safe training found. All failure chances are too high or stats are capped.")
     return action
 
-  # Calculate scores for all available trainings once
-  training_scores = {}
-  best_score = -1
-
-  def _calculate_score(x):
-    # main score
-    most_support_score_tuple = most_support_score(x)
-    most_support_score_tuple = add_scenario_gimmick_score(x, most_support_score_tuple, state)
-    # supporting score
-    non_max_support_score = max_out_friendships_score(x)
-    score_tuple = (non_max_support_score[0] * config.NON_MAX_SUPPORT_WEIGHT + most_support_score_tuple[0],
-                             non_max_support_score[1] + most_support_score_tuple[1])
-    debug(f"Total training score: {score_tuple[0]}")
-    return score_tuple
-
-  for training_name, training_data in filtered_results.items():
-    score_tuple = _calculate_score((training_name, training_data))
-    training_scores[training_name] = create_training_score_entry(
-      training_name, training_data, score_tuple
-    )
-    debug(f"{training_name} -> score_tuple={score_tuple}, best_score={best_score}")
-    
-    if score_tuple[0] > best_score:
-      best_score = score_tuple[0]
+  training_scores, best_score, minimum_score = _strategy_scores(state, training_template, action, "most_support_cards", filtered_results)
   info(f"most_support_card scores: {training_scores}")
-  minimum_acceptable_data = (
-    'minimum',
-    CleanDefaultDict({
-      'total_supports': 1,
-      'total_friendship_levels': {'green': 1},
-      'unity_gauge_fills': 1
-    })
-  )
-  minimum_score = _calculate_score(minimum_acceptable_data)
-  if not action.get("min_scores"):
-    action["min_scores"] = CleanDefaultDict()
-  action["min_scores"]["most_support_cards"] = minimum_score
   debug(f"Best score: {best_score} vs threshold: {minimum_score[0]}")
   if best_score < minimum_score[0]:
     info("Support score is too low. No good training. If bot keeps looping, please report this with your config.json attached.")
@@ -217,14 +136,7 @@ def most_stat_gain(state, training_template, action):
     info("No safe training found. All failure chances are too high.")
     return action
 
-  # Calculate scores for all available trainings once
-  training_scores = {}
-  for training_name, training_data in filtered_results.items():
-    score_tuple = most_stat_score((training_name, training_data), state, training_template)
-    training_scores[training_name] = create_training_score_entry(
-      training_name, training_data, score_tuple
-    )
-    debug(f"{training_name} -> score_tuple={score_tuple}")
+  training_scores, _, _ = _strategy_scores(state, training_template, action, "most_stat_gain", filtered_results)
   
   action = fill_trainings_for_action(action, training_scores)
 
@@ -236,33 +148,7 @@ def meta_training(state, training_template, action):
     info("No safe training found. All failure chances are too high.")
     return action
 
-  training_scores = {}
-  best_score = -1
-  score_dict = {}
-  # generate scores for all trainings
-  for training_name, training_data in filtered_results.items():
-    stat_gain_score = most_stat_score((training_name, training_data), state, training_template)
-    non_max_support_score = max_out_friendships_score((training_name, training_data))
-    rainbow_score = rainbow_training_score((training_name, training_data))
-    rainbow_score = add_scenario_gimmick_score((training_name, training_data), rainbow_score, state)
-
-    score_dict[training_name] = {
-      "stat_gain_score": stat_gain_score,
-      "non_max_support_score": non_max_support_score,
-      "rainbow_score": rainbow_score
-    }
-
-  # normalize stat gain score
-  for training_name, scores in score_dict.items():
-    score_dict[training_name] = (
-      (scores["stat_gain_score"][0] / 10) + (scores["non_max_support_score"][0] + scores["rainbow_score"][0]),
-      scores["stat_gain_score"][1]
-      )
-  
-  for training_name, training_data in filtered_results.items():
-    training_scores[training_name] = create_training_score_entry(
-      training_name, training_data, score_dict[training_name]
-    )
+  training_scores, _, _ = _strategy_scores(state, training_template, action, "meta_training", filtered_results)
   info(f"Meta training scores: {training_scores}")
   action = fill_trainings_for_action(action, training_scores)
   return action
@@ -281,13 +167,11 @@ def find_min_and_max_score(score_dict, score_name):
   return min_score, max_score
 
 def calculate_risk_increase(training_name, training_data, risk_taking_set):
-  total_friendship_levels = training_data[training_name]['friendship_levels']
-
   # Count rainbow friends (yellow + max levels)
-  rainbow_count = total_friendship_levels['yellow'] + total_friendship_levels['max']
+  rainbow_count = training_data.rainbow_friends(training_name)
 
   # Count total supports
-  total_supports = training_data['total_supports']
+  total_supports = training_data.total_supports
 
   # First support doesn't count at all
   if total_supports <= 1:
@@ -368,174 +252,252 @@ def get_priority_index(x):
     priority_index = 0
   return priority_index
 
-def most_support_score(x):
-  global PRIORITY_WEIGHTS_LIST
-  priority_weight = PRIORITY_WEIGHTS_LIST[config.PRIORITY_WEIGHT]
-  base = x[1]["total_supports"]
-  if x[1]["total_hints"] > 0:
-      base += 0.5
-
-  priority_index = get_priority_index(x)
-  priority_effect = config.PRIORITY_EFFECTS_LIST[priority_index]
-  priority_adjustment = priority_effect * priority_weight
-
-  if priority_adjustment >= 0:
-    total = base * (1 + priority_adjustment)
-  else:
-    total = base / (1 + abs(priority_adjustment))
-
-  debug(f"{x[0]} -> base={base}, priority={priority_effect}, adjustment={priority_adjustment}, total={total}")
-
-  return (total, -priority_index)
-
-
-def most_stat_score(x, state, training_template):
-  training_name, training_data = x
-  stat_gains = training_data['stat_gains']
-  total_value = 0
-
-  # Sum up weighted stat gains, excluding capped stats
-  for stat, gain in stat_gains.items():
-    if stat != "sp":
-      stat_cap = config.STAT_CAPS[stat]
-    else:
-      stat_cap = 9999
-    current_stat = state['current_stats'][stat]
-
-    # Skip this stat's contribution if at cap
-    if current_stat >= stat_cap:
-      continue
-
-    weight = training_template["stat_weight_set"][stat]
+def rainbow_increase_formula(n, multiplier):
+  # works on single counts and on arrays of them
+  return np.where(n < 1, n, n + multiplier * n * (n - 1))
+
+# the data a training has to beat for the training function to pick it, scored as extra rows of the feature matrix
+MINIMUM_ACCEPTABLE_DATA = {
+  "rainbow_training": ('training_name', {
+    'training_name': {'supports': 1, 'friendship_levels': {'max': 1}},
+    'unity_spirit_explosions': 1,
+  }),
+  "max_out_friendships": ("training_name", {
+    "total_friendship_levels": {"green": 2},
+    "unity_gauge_fills": 1
+  }),
+  "most_support_cards": ('minimum', {
+    'total_supports': 1,
+    'total_friendship_levels': {'green': 1},
+    'unity_gauge_fills': 1
+  }),
+}
 
-    # Handle negative weights like most_support_score handles negative priorities
-    if weight >= 0:
-      total_value += gain * (1 + weight)
+# columns of the feature matrix, one row per training
+FEATURES = (
+  ("total_supports", "total_hints", "rainbow_friends", "priority_index", "lowest_hint_bonus", "hint_hunting_bonus")
+  + tuple(f"friends_{level}" for level in FRIEND_LEVELS)
+  + UNITY_COUNTERS
+  + tuple(f"gain_{stat}" for stat in STATS)
+)
+FEATURE_INDEX = {feature: i for i, feature in enumerate(FEATURES)}
+# hints on a friend are worth more the lower its friendship level, only the lowest level with hints counts
+HINT_LEVEL_VALUES = {"gray": 0.612, "blue": 0.606, "green": 0.6, "max": 0.1, "yellow": 0.1}
+
+class ScoringEngine:
+  """
+  Scores the trainings of one turn for every training function at once. The features of all trainings, followed by
+  the minimum acceptable data of each training function, are one matrix and every score is a vector over its rows,
+  so the thresholds and the scores a fallback to another training function needs are already there.
+  """
+  def __init__(self, state, training_template):
+    self.state = state
+    self.training_template = training_template
+    self.training_results = state["training_results"]
+    row_names = list(self.training_results)
+    observations = list(self.training_results.values())
+    self.rows = {name: i for i, name in enumerate(row_names)}
+    self.minimum_rows = {}
+    for function_name, (name, observation) in _get_minimum_observations().items():
+      self.minimum_rows[function_name] = len(row_names)
+      row_names.append(name)
+      observations.append(observation)
+    self.row_names = row_names
+    self.features = self._build_features(row_names, observations)
+    self._scores = {}
+    self._strategy_scores = {}
+
+  def _build_features(self, row_names, observations):
+    features = np.zeros((len(observations), len(FEATURES)), dtype=np.float64)
+    column = FEATURE_INDEX
+    features[:, column["total_supports"]] = [observation.total_supports for observation in observations]
+    features[:, column["total_hints"]] = [observation.total_hints for observation in observations]
+    features[:, column["rainbow_friends"]] = [observation.rainbow_friends(name) for name, observation in zip(row_names, observations)]
+    features[:, column["priority_index"]] = [get_priority_index((name, None)) for name in row_names]
+    levels_start = column[f"friends_{FRIEND_LEVELS[0]}"]
+    features[:, levels_start:levels_start + len(FRIEND_LEVELS)] = np.array([observation.total_friendship_levels for observation in observations])
+    unity_start = column[UNITY_COUNTERS[0]]
+    features[:, unity_start:unity_start + len(UNITY_COUNTERS)] = np.array([observation.unity for observation in observations])
+    gains_start = column[f"gain_{STATS[0]}"]
+    features[:, gains_start:gains_start + len(STATS)] = np.array([observation.stat_gains for observation in observations]) * np.array([observation.stat_gain_mask for observation in observations])
+
+    # bonus of the lowest friendship level that has hints
+    hint_levels = list(HINT_LEVEL_VALUES)
+    hints_per_level = np.array([observation.hints_per_friend_level for observation in observations])[:, [FRIEND_LEVEL_INDEX[level] for level in hint_levels]]
+    features[:, column["lowest_hint_bonus"]] = self._first_positive_value(hints_per_level, list(HINT_LEVEL_VALUES.values()))
+    if config.HINT_HUNTING_ENABLED:
+      # weight of the highest weighted support type that has hints
+      hint_hunting_weights = sorted(config.HINT_HUNTING_WEIGHTS.items(), key=lambda x: x[1], reverse=True)
+      hint_hunting_weights = [(support_type, weight) for support_type, weight in hint_hunting_weights if support_type in SUPPORT_TYPE_INDEX]
+      support_hints = np.array([observation.hints[:len(SUPPORT_TYPE_INDEX)] for observation in observations])[:, [SUPPORT_TYPE_INDEX[support_type] for support_type, _ in hint_hunting_weights]]
+      features[:, column["hint_hunting_bonus"]] = self._first_positive_value(support_hints, [weight for _, weight in hint_hunting_weights])
+    return features
+
+  @staticmethod
+  def _first_positive_value(counts, values):
+    # for every row, the value of the first column with a count above zero, 0 if there is none
+    if counts.shape[1] == 0:
+      return 0
+    positive = counts > 0
+    first = positive.argmax(axis=1)
+    return np.where(positive.any(axis=1), np.asarray(values, dtype=np.float64)[first], 0)
+
+  def column(self, feature):
+    return self.features[:, FEATURE_INDEX[feature]]
+
+  def _priority_adjustment(self):
+    # priority effect of every row's training times the configured weight
+    priority_weight = PRIORITY_WEIGHTS_LIST[config.PRIORITY_WEIGHT]
+    priority_effects = np.array([config.PRIORITY_EFFECTS_LIST[int(index)] for index in self.column("priority_index")], dtype=np.float64)
+    return priority_effects * priority_weight
+
+  @staticmethod
+  def _apply_adjustment(values, adjustment):
+    return np.where(adjustment >= 0, values * (1 + adjustment), values / (1 + np.abs(adjustment)))
+
+  def score(self, score_name):
+    # (score vector, tiebreaker vector) of one of the training scores, computed once per turn
+    if score_name not in self._scores:
+      self._scores[score_name] = getattr(self, f"_{score_name}_score")()
+    return self._scores[score_name]
+
+  def _most_support_score(self):
+    base = self.column("total_supports") + np.where(self.column("total_hints") > 0, 0.5, 0)
+    return self._apply_adjustment(base, self._priority_adjustment()), -self.column("priority_index")
+
+  def _most_stat_score(self):
+    # weighted stat gains, stats at their cap don't count
+    current_stats = self.state["current_stats"]
+    total_value = np.zeros(len(self.row_names))
+    for stat in STATS:
+      stat_cap = config.STAT_CAPS[stat] if stat != "sp" else 9999
+      if float(current_stats[stat]) >= stat_cap:
+        continue
+      weight = self.training_template["stat_weight_set"][stat]
+      gain = self.column(f"gain_{stat}")
+      # Handle negative weights like most_support_score handles negative priorities
+      if weight >= 0:
+        total_value = total_value + gain * (1 + weight)
+      else:
+        total_value = total_value + gain / (1 + abs(weight))
+    return total_value, -self.column("priority_index")
+
+  def _max_out_friendships_score(self):
+    # Calculate possible friendship progression potential
+    # Gray friends (0-14): most valuable (1.1x multiplier)
+    # Blue friends (15-39): valuable (1.05x multiplier)
+    # Green friends (40-79): base value (1.0x multiplier)
+    possible_friendship = (
+      self.column("friends_green") +
+      self.column("friends_blue") * 1.05 +
+      self.column("friends_gray") * 1.1 +
+      self.column("friends_max") * 0.2 +
+      self.column("friends_yellow") * 0.2
+    )
+    # Hints provide additional progression potential
+    possible_friendship = possible_friendship + np.where(self.column("total_hints") > 0, self.column("lowest_hint_bonus"), 0)
+    priority_index = self.column("priority_index")
+    # adjust by priority index, 5 stats, higher priority = lower index = more value to the training
+    possible_friendship = possible_friendship * (1 + (5 - priority_index) * 0.025)
+    return possible_friendship, -priority_index
+
+  def _rainbow_training_score(self):
+    total_rainbow_friends = rainbow_increase_formula(self.column("rainbow_friends"), 0.15)
+    #adding total rainbow friends on top of total supports for two times value nudging the formula towards more rainbows
+    rainbow_points = total_rainbow_friends * config.RAINBOW_SUPPORT_WEIGHT_ADDITION + self.column("total_supports") * 0.20
+    rainbow_points = rainbow_points + np.where(total_rainbow_friends > 0, 0.5, 0)
+    rainbow_points = rainbow_points + np.where(self.column("total_hints") > 0, 0.5, 0)
+    if config.HINT_HUNTING_ENABLED:
+      rainbow_points = rainbow_points + self.column("hint_hunting_bonus")
+    rainbow_points = self._apply_adjustment(rainbow_points, self._priority_adjustment())
+    for name, row in self.rows.items():
+      self.training_results[name]["rainbow_points"] = float(rainbow_points[row])
+      self.training_results[name]["total_rainbow_friends"] = float(total_rainbow_friends[row])
+    return rainbow_points, -self.column("priority_index")
+
+  def _scenario_gimmick_score(self):
+    score = np.zeros(len(self.row_names))
+    if constants.SCENARIO_NAME == "unity":
+      score = self._unity_training_score(self.state["year"].split()[0]) * config.SCENARIO_GIMMICK_WEIGHT
+    return score, np.zeros(len(self.row_names))
+
+  def _unity_training_score(self, year):
+    # spirit explosions are more important later years.
+    if year == "Junior":
+      year_adjustment = -0.35
+    elif year == "Classic":
+      year_adjustment = 0
+    elif year == "Senior" or year == "Finale":
+      year_adjustment = 0.35
     else:
-      total_value += gain / (1 + abs(weight))
-
-  # Use negative priority index as tiebreaker (higher priority = lower index number = higher tiebreaker)
-  priority_index = get_priority_index(x)
-  tiebreaker = -priority_index
-
-  debug(f"Most stat score: {training_name} -> total_value={total_value}, gains={stat_gains}")
-
-  return (total_value, tiebreaker)
-
-
-def max_out_friendships_score(x):
-  training_name, training_data = x
-  # Calculate possible friendship progression potential
-  # Gray friends (0-14): most valuable (1.02x multiplier)
-  # Blue friends (15-39): valuable (1.01x multiplier)
-  # Green friends (40-79): base value (1.0x multiplier)
-  friendship_levels = training_data['total_friendship_levels']
-  possible_friendship = (
-    friendship_levels['green'] +
-    friendship_levels['blue'] * 1.05 +
-    friendship_levels['gray'] * 1.1 +
-    friendship_levels['max'] * 0.2 +
-    friendship_levels['yellow'] * 0.2
-  )
-  
-  hint_bonus = 0
-  # Hints provide additional progression potential
-  if training_data['total_hints'] > 0:
-    hint_values = {"gray": 0.612, "blue": 0.606, "green": 0.6, "max": 0.1, "yellow": 0.1}
-    hints_per_level = training_data['hints_per_friend_level']
-    for level, bonus in hint_values.items():
-      if hints_per_level[level] > 0:
-        possible_friendship += bonus
-        hint_bonus = bonus
-        break  # Only apply bonus for the lowest level with hints
-
-  priority_index = get_priority_index(x)
-  tiebreaker = -priority_index
-  # adjust by priority index, 5 stats, higher priority = lower index = more value to the training
-  possible_friendship = possible_friendship * (1 + (5 - priority_index) * 0.025)
-
-  debug(f"Max out friendships score: {training_name} -> {possible_friendship:.3f} -> {friendship_levels['gray']} + {friendship_levels['blue']} + {friendship_levels['green']} + {friendship_levels['max']} + {friendship_levels['yellow']} + {hint_bonus}")
-
-  return (possible_friendship, tiebreaker)
-
-def rainbow_increase_formula(n: int, multiplier: float) -> float:
-  if n < 1:
-    return n
-  return n + multiplier * n * (n - 1)
-
-def rainbow_training_score(x):
-  global PRIORITY_WEIGHTS_LIST
-  priority_weight = PRIORITY_WEIGHTS_LIST[config.PRIORITY_WEIGHT]
-  training_name, training_data = x
-
-  priority_index = get_priority_index(x)
-  priority_effect = config.PRIORITY_EFFECTS_LIST[priority_index]
-  priority_adjustment = priority_effect * priority_weight
-
-  debug(f"Total supports: {training_data}")
-  total_rainbow_friends = training_data[training_name]["friendship_levels"]["yellow"] + training_data[training_name]["friendship_levels"]["max"]
-  debug(f"Total rainbow friends: {total_rainbow_friends}")
-  total_rainbow_friends = rainbow_increase_formula(total_rainbow_friends, 0.15)
-  debug(f"Total rainbow friends after formula: {total_rainbow_friends}")
-  #adding total rainbow friends on top of total supports for two times value nudging the formula towards more rainbows
-  rainbow_points = total_rainbow_friends * config.RAINBOW_SUPPORT_WEIGHT_ADDITION + training_data["total_supports"] * 0.20
-  debug(f"Rainbow points after unity training score: {rainbow_points}")
-  if total_rainbow_friends > 0:
-    rainbow_points = rainbow_points + 0.5
-  if training_data['total_hints'] > 0:
-    rainbow_points += 0.5
-  if config.HINT_HUNTING_ENABLED:
-    hint_hunting_weights = sorted(config.HINT_HUNTING_WEIGHTS.items(), key=lambda x: x[1], reverse=True)
-    for support_type, weight in hint_hunting_weights:
-      if training_data[support_type]["hints"] > 0:
-        rainbow_points += weight
-        break
-
-  debug(f"Rainbow points before priority adjustment: {rainbow_points}")
-  if priority_adjustment >= 0:
-    rainbow_points = rainbow_points * (1 + priority_adjustment)
-  else:
-    rainbow_points = rainbow_points / (1 + abs(priority_adjustment))
-  training_data["rainbow_points"] = rainbow_points
-  training_data["total_rainbow_friends"] = total_rainbow_friends
-  debug(f"Rainbow training score: {training_name} -> {rainbow_points} -> {total_rainbow_friends}")
-  return (rainbow_points, -priority_index)
-
-def add_scenario_gimmick_score(training_dict, score_tuple, state):
-  score = 0
-  if constants.SCENARIO_NAME == "unity":
-    score = unity_training_score(training_dict, state["year"].split()[0]) * config.SCENARIO_GIMMICK_WEIGHT
-  debug(f"Scenario gimmick score: {score}")
-
-  score_tuple = (score_tuple[0] + score, score_tuple[1])
-  return score_tuple
-
-def unity_training_score(x, year):
-  training_name, training_data = x
-  priority_index = get_priority_index(x)
-  priority_effect = config.PRIORITY_EFFECTS_LIST[priority_index]
-  priority_weight = PRIORITY_WEIGHTS_LIST[config.PRIORITY_WEIGHT]
-  priority_adjustment = priority_effect * priority_weight
-
-  # spirit explosions are more important later years.
-  if year == "Junior":
-    year_adjustment = -0.35
-  elif year == "Classic":
-    year_adjustment = 0
-  elif year == "Senior" or year == "Finale":
-    year_adjustment = 0.35
-  else:
-    warning("Didn't get year value, this should not happen.")
-    year_adjustment = 0
-
-  score = 0
-  # unity gauges fills are more important during earlier years and spirit explosions are more important later years.
-  score += training_data["unity_gauge_fills"] * (1 - year_adjustment)
-  score += (training_data["unity_trainings"] - training_data["unity_gauge_fills"]) * 0.1
-  if priority_adjustment >= 0:
-    score += training_data["unity_spirit_explosions"] * (1 + year_adjustment) * (1 + priority_adjustment)
-  else:
-    score += training_data["unity_spirit_explosions"] * (1 + year_adjustment) / (1 + abs(priority_adjustment))
-
-  debug(f"Unity training score: {training_name} -> {score}")
-  return score
+      warning("Didn't get year value, this should not happen.")
+      year_adjustment = 0
+
+    gauge_fills = self.column("unity_gauge_fills")
+    # unity gauges fills are more important during earlier years and spirit explosions are more important later years.
+    score = gauge_fills * (1 - year_adjustment)
+    score = score + (self.column("unity_trainings") - gauge_fills) * 0.1
+    score = score + self._apply_adjustment(self.column("unity_spirit_explosions") * (1 + year_adjustment), self._priority_adjustment())
+    return score
+
+  def _combined_score(self, function_name):
+    # (score vector, tiebreaker vector) a training function ranks the trainings by
+    gimmick = self.score("scenario_gimmick")[0]
+    if function_name == "rainbow_training":
+      rainbow, tiebreaker = self.score("rainbow_training")
+      non_max_support = self.score("max_out_friendships")[0]
+      return (rainbow + gimmick) + non_max_support * config.NON_MAX_SUPPORT_WEIGHT, tiebreaker
+    if function_name == "max_out_friendships":
+      friendship, tiebreaker = self.score("max_out_friendships")
+      rainbow = self.score("rainbow_training")[0]
+      return (friendship + gimmick) + rainbow * 0.25 * config.RAINBOW_SUPPORT_WEIGHT_ADDITION, tiebreaker
+    if function_name == "most_support_cards":
+      most_support, most_support_tiebreaker = self.score("most_support")
+      non_max_support, non_max_support_tiebreaker = self.score("max_out_friendships")
+      return non_max_support * config.NON_MAX_SUPPORT_WEIGHT + (most_support + gimmick), non_max_support_tiebreaker + most_support_tiebreaker
+    if function_name == "most_stat_gain":
+      return self.score("most_stat")
+    if function_name == "meta_training":
+      # stat gains are normalized to the scale of the friendship scores
+      stat_gain, tiebreaker = self.score("most_stat")
+      non_max_support = self.score("max_out_friendships")[0]
+      rainbow = self.score("rainbow_training")[0] + gimmick
+      return (stat_gain / 10) + (non_max_support + rainbow), tiebreaker
+    raise ValueError(f"Unknown training function: {function_name}")
+
+  def strategy_scores(self, function_name):
+    # {training name: (score, tiebreaker)} of every training for a training function
+    if function_name not in self._strategy_scores:
+      scores, tiebreakers = self._combined_score(function_name)
+      scores = scores.tolist()
+      tiebreakers = [int(tiebreaker) for tiebreaker in tiebreakers.tolist()]
+      self._strategy_scores[function_name] = (scores, tiebreakers)
+    scores, tiebreakers = self._strategy_scores[function_name]
+    return {name: (scores[row], tiebreakers[row]) for name, row in self.rows.items()}
+
+  def minimum_score(self, function_name):
+    # score of the minimum acceptable data, None for training functions without a threshold
+    if function_name not in self.minimum_rows:
+      return None
+    self.strategy_scores(function_name)
+    scores, tiebreakers = self._strategy_scores[function_name]
+    row = self.minimum_rows[function_name]
+    return (scores[row], tiebreakers[row])
+
+_minimum_observations = None
+
+def _get_minimum_observations():
+  # {training function: (name, observation)} of the minimum acceptable data, it never changes
+  global _minimum_observations
+  if _minimum_observations is None:
+    _minimum_observations = {function_name: (name, TrainingObservation.from_dict(data)) for function_name, (name, data) in MINIMUM_ACCEPTABLE_DATA.items()}
+  return _minimum_observations
+
+_engine = None
+
+def get_scoring_engine(state, training_template):
+  # one engine per turn, the training functions a turn falls back to reuse it
+  global _engine
+  if _engine is None or _engine.state is not state or _engine.training_template is not training_template or _engine.training_results is not state["training_results"]:
+    _engine = ScoringEngine(state, training_template)
+  return _engine
@@ -0,0 +1,327 @@
+# compact per turn state. The fields the strategy reads every turn live in fixed slots and the training
+# observations in small numpy arrays instead of nested CleanDefaultDicts that create a dict on every missing key.
+# Both still answer dict style access (state["year"], training["total_friendship_levels"]["green"]) with the same
+# values the old dicts had, so logging and the code that isn't on the hot path keep working unchanged.
+import numpy as np
+
+from utils.shared import CleanDefaultDict
+import utils.constants as constants
+
+STATS = ("spd", "sta", "pwr", "guts", "wit", "sp")
+SUPPORT_TYPES = tuple(constants.SUPPORT_ICONS)
+FRIEND_LEVELS = tuple(constants.SUPPORT_FRIEND_LEVELS)
+UNITY_COUNTERS = ("unity_trainings", "unity_gauge_fills", "unity_spirit_explosions")
+
+STAT_INDEX = {stat: i for i, stat in enumerate(STATS)}
+SUPPORT_TYPE_INDEX = {support_type: i for i, support_type in enumerate(SUPPORT_TYPES)}
+FRIEND_LEVEL_INDEX = {level: i for i, level in enumerate(FRIEND_LEVELS)}
+UNITY_INDEX = {counter: i for i, counter in enumerate(UNITY_COUNTERS)}
+SUPPORT_FIELDS = ("supports", "friendship_levels", "hints")
+
+def _level_dict(counts, cls=CleanDefaultDict):
+  # the old {level: count} dicts only had the levels that were counted
+  return cls({level: count for level, count in zip(FRIEND_LEVELS, counts.tolist()) if count})
+
+def _level_array(levels):
+  counts = np.zeros(len(FRIEND_LEVELS), dtype=np.int32)
+  for level, count in levels.items():
+    counts[FRIEND_LEVEL_INDEX[level]] = int(count)
+  return counts
+
+class TrainingObservation:
+  """
+  Everything read from one training's screen. Counts per support type are rows of the arrays, in SUPPORT_TYPES
+  order. Totals are kept on their own like in the old dicts, the minimum score data sets them without any supports.
+  Keys that aren't part of the observation (scores and flags added while scoring) go to extras.
+  """
+  __slots__ = ("failure", "has_stat_gains", "stat_gains", "stat_gain_mask", "types", "type_index", "supports",
+               "friendship_levels", "hints", "total_supports", "total_friendship_levels", "total_hints",
+               "hints_per_friend_level", "unity", "extras")
+
+  def __init__(self, types=SUPPORT_TYPES):
+    self.failure = None
+    self.has_stat_gains = False
+    self.stat_gains = np.zeros(len(STATS), dtype=np.int32)
+    self.stat_gain_mask = np.zeros(len(STATS), dtype=bool)
+    self.types = types
+    self.type_index = SUPPORT_TYPE_INDEX if types is SUPPORT_TYPES else {support_type: i for i, support_type in enumerate(types)}
+    self.supports = np.zeros(len(types), dtype=np.int32)
+    self.friendship_levels = np.zeros((len(types), len(FRIEND_LEVELS)), dtype=np.int32)
+    self.hints = np.zeros(len(types), dtype=np.int32)
+    self.total_supports = 0
+    self.total_friendship_levels = np.zeros(len(FRIEND_LEVELS), dtype=np.int32)
+    self.total_hints = 0
+    self.hints_per_friend_level = np.zeros(len(FRIEND_LEVELS), dtype=np.int32)
+    self.unity = np.zeros(len(UNITY_COUNTERS), dtype=np.int32)
+    self.extras = {}
+
+  @classmethod
+  def from_dict(cls, data):
+    """
+    Builds an observation from the dict layout get_training_data and get_support_card_data return.
+    Support entries under keys that aren't support types, like the placeholder name of the minimum score data, get their own row.
+    """
+    types = SUPPORT_TYPES
+    extra_types = tuple(key for key, value in data.items() if key not in SUPPORT_TYPE_INDEX and isinstance(value, dict) and any(field in value for field in SUPPORT_FIELDS))
+    if extra_types:
+      types = SUPPORT_TYPES + extra_types
+    observation = cls(types)
+    for key, value in data.items():
+      if key == "failure":
+        observation.failure = value
+      elif key == "stat_gains":
+        observation.has_stat_gains = True
+        for stat, gain in value.items():
+          observation.stat_gains[STAT_INDEX[stat]] = int(gain)
+          observation.stat_gain_mask[STAT_INDEX[stat]] = True
+      elif key in observation.type_index:
+        row = observation.type_index[key]
+        observation.supports[row] = int(value.get("supports", 0))
+        observation.friendship_levels[row] = _level_array(value.get("friendship_levels", {}))
+        observation.hints[row] = int(value.get("hints", 0))
+      elif key == "total_supports":
+        observation.total_supports = int(value)
+      elif key == "total_friendship_levels":
+        observation.total_friendship_levels = _level_array(value)
+      elif key == "total_hints":
+        observation.total_hints = int(value)
+      elif key == "hints_per_friend_level":
+        observation.hints_per_friend_level = _level_array(value)
+      elif key in UNITY_INDEX:
+        observation.unity[UNITY_INDEX[key]] = int(value)
+      else:
+        observation.extras[key] = value
+    return observation
+
+  # --- fast accessors for the scoring functions ---
+
+  @property
+  def unity_trainings(self):
+    return int(self.unity[0])
+
+  @property
+  def unity_gauge_fills(self):
+    return int(self.unity[1])
+
+  @property
+  def unity_spirit_explosions(self):
+    return int(self.unity[2])
+
+  def friendship_level_counts(self, support_type=None):
+    # {level: count} for every level, of one support type or the totals
+    if support_type is None:
+      counts = self.total_friendship_levels
+    else:
+      row = self.type_index.get(support_type)
+      if row is None:
+        return dict.fromkeys(FRIEND_LEVELS, 0)
+      counts = self.friendship_levels[row]
+    return dict(zip(FRIEND_LEVELS, counts.tolist()))
+
+  def hint_level_counts(self):
+    return dict(zip(FRIEND_LEVELS, self.hints_per_friend_level.tolist()))
+
+  def rainbow_friends(self, support_type):
+    # yellow and max friendship supports of the training's own type
+    row = self.type_index.get(support_type)
+    if row is None:
+      return 0
+    levels = self.friendship_levels[row]
+    return int(levels[FRIEND_LEVEL_INDEX["yellow"]] + levels[FRIEND_LEVEL_INDEX["max"]])
+
+  def friendship_increases(self, support_type):
+    row = self.type_index.get(support_type)
+    if row is None:
+      return 0
+    levels = self.friendship_levels[row]
+    return int(levels[FRIEND_LEVEL_INDEX["gray"]] + levels[FRIEND_LEVEL_INDEX["blue"]] + levels[FRIEND_LEVEL_INDEX["green"]])
+
+  def support_hints(self, support_type):
+    row = self.type_index.get(support_type)
+    if row is None:
+      return 0
+    return int(self.hints[row])
+
+  def stat_gain_items(self):
+    # (stat, gain) for the stats that showed a gain, in screen order
+    return [(stat, gain) for stat, gain, shown in zip(STATS, self.stat_gains.tolist(), self.stat_gain_mask.tolist()) if shown]
+
+  # --- dict compatible access ---
+
+  def _support_entry(self, row, cls=CleanDefaultDict):
+    entry = cls()
+    if self.supports[row]:
+      entry["supports"] = int(self.supports[row])
+    levels = _level_dict(self.friendship_levels[row], cls)
+    if levels:
+      entry["friendship_levels"] = levels
+    if self.hints[row]:
+      entry["hints"] = int(self.hints[row])
+    return entry
+
+  def keys(self):
+    # same keys the merged dicts had, counters only exist once something was counted
+    keys = []
+    if self.failure is not None:
+      keys.append("failure")
+    if self.has_stat_gains:
+      keys.append("stat_gains")
+    keys += [counter for counter, count in zip(UNITY_COUNTERS, self.unity.tolist()) if count]
+    counted = self.supports + self.hints + self.friendship_levels.sum(axis=1)
+    keys += [support_type for support_type, count in zip(self.types, counted.tolist()) if count]
+    if self.total_supports:
+      keys.append("total_supports")
+    if max(self.total_friendship_levels.tolist()):
+      keys.append("total_friendship_levels")
+    if self.total_hints:
+      keys.append("total_hints")
+    if max(self.hints_per_friend_level.tolist()):
+      keys.append("hints_per_friend_level")
+    return keys + list(self.extras)
+
+  def __getitem__(self, key):
+    # missing keys read as an empty CleanDefaultDict like before, but aren't stored
+    if key == "failure":
+      return self.failure if self.failure is not None else CleanDefaultDict()
+    if key == "stat_gains":
+      return CleanDefaultDict(self.stat_gain_items())
+    if key in self.type_index:
+      return self._support_entry(self.type_index[key])
+    if key == "total_supports":
+      return self.total_supports
+    if key == "total_friendship_levels":
+      return _level_dict(self.total_friendship_levels)
+    if key == "total_hints":
+      return self.total_hints
+    if key == "hints_per_friend_level":
+      return _level_dict(self.hints_per_friend_level)
+    if key in UNITY_INDEX:
+      return int(self.unity[UNITY_INDEX[key]])
+    if key in self.extras:
+      return self.extras[key]
+    return CleanDefaultDict()
+
+  def __setitem__(self, key, value):
+    if key == "failure":
+      self.failure = value
+    else:
+      self.extras[key] = value
+
+  def __contains__(self, key):
+    if key in self.extras:
+      return True
+    return key in self.keys()
+
+  def __iter__(self):
+    return iter(self.keys())
+
+  def __len__(self):
+    return len(self.keys())
+
+  def get(self, key, default=None):
+    return self[key] if key in self else default
+
+  def items(self):
+    return [(key, self[key]) for key in self.keys()]
+
+  def values(self):
+    return [self[key] for key in self.keys()]
+
+  def to_dict(self):
+    return CleanDefaultDict(self.items())
+
+  def __eq__(self, other):
+    if isinstance(other, TrainingObservation):
+      other = other.to_dict()
+    if isinstance(other, dict):
+      return self.to_dict() == other
+    return NotImplemented
+
+  __hash__ = None
+
+  def __repr__(self):
+    # plain dicts, the CleanDefaultDict conversions aren't needed to print it
+    data = {}
+    for key in self.keys():
+      if key in self.type_index:
+        data[key] = self._support_entry(self.type_index[key], dict)
+      elif key == "stat_gains":
+        data[key] = dict(self.stat_gain_items())
+      elif key == "total_friendship_levels" or key == "hints_per_friend_level":
+        data[key] = _level_dict(getattr(self, key), dict)
+      else:
+        data[key] = self[key]
+    return repr(data)
+
+class TurnState:
+  """
+  The state collected at the start of a turn. Known fields are slots, anything else set on it goes to extras.
+  Fields that were never set read as an empty CleanDefaultDict, the same as a missing key of the old state dict.
+  """
+  __slots__ = ("current_mood", "mood_difference", "mood_difference_junior_year", "turn", "year", "current_stats",
+               "criteria", "energy_level", "max_energy", "date_event_available", "race_mission_available", "aptitudes",
+               "training_results", "extras")
+  FIELDS = __slots__[:-1]
+  _FIELD_SET = frozenset(FIELDS)
+
+  def __init__(self, *args, **kwargs):
+    self.extras = {}
+    for key, value in dict(*args, **kwargs).items():
+      self[key] = value
+
+  def keys(self):
+    return [field for field in self.FIELDS if hasattr(self, field)] + list(self.extras)
+
+  def __getitem__(self, key):
+    if key in self._FIELD_SET:
+      try:
+        return getattr(self, key)
+      except AttributeError:
+        return CleanDefaultDict()
+    try:
+      return self.extras[key]
+    except KeyError:
+      return CleanDefaultDict()
+
+  def __setitem__(self, key, value):
+    if key in self._FIELD_SET:
+      if isinstance(value, dict) and not isinstance(value, CleanDefaultDict):
+        value = CleanDefaultDict(value)
+      setattr(self, key, value)
+    else:
+      self.extras[key] = value
+
+  def __contains__(self, key):
+    if key in self._FIELD_SET:
+      return hasattr(self, key)
+    return key in self.extras
+
+  def __iter__(self):
+    return iter(self.keys())
+
+  def __len__(self):
+    return len(self.keys())
+
+  def get(self, key, default=None):
+    return self[key] if key in self else default
+
+  def items(self):
+    return [(key, self[key]) for key in self.keys()]
+
+  def values(self):
+    return [self[key] for key in self.keys()]
+
+  def to_dict(self):
+    return dict(self.items())
+
+  def __eq__(self, other):
+    if isinstance(other, TurnState):
+      other = other.to_dict()
+    if isinstance(other, dict):
+      return self.to_dict() == other
+    return NotImplemented
+
+  __hash__ = None
+
+  def __repr__(self):
+    return repr(self.to_dict())
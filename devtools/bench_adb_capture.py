@@ -0,0 +1,63 @@
+# Compares the raw framebuffer and PNG capture backends of utils/adb_actions against a local fake device.
+# The fake device PNG-encodes the frame for every device.screenshot() call, like screencap -p does on the device.
+# Run from the repository root: py devtools/bench_adb_capture.py [frame.png] [iterations]
+import io
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.adb_actions as adb_actions
+
+class FakeDevice:
+  def __init__(self, frame_rgb : np.ndarray):
+    height, width = frame_rgb.shape[:2]
+    rgba = np.dstack([frame_rgb, np.full((height, width), 255, np.uint8)])
+    # Android 9+ header: width, height, format, colorspace
+    self.raw = struct.pack("<IIII", width, height, adb_actions.RGBA_8888, 1) + rgba.tobytes()
+    self.frame = frame_rgb
+
+  def shell(self, cmdargs, encoding="utf-8", rstrip=True, **kwargs):
+    if cmdargs != "screencap":
+      raise ValueError(f"Unsupported command: {cmdargs}")
+    # the adb transport hands us a fresh bytes object every time
+    return bytes(memoryview(self.raw))
+
+  def screenshot(self, error_ok=True):
+    buffer = io.BytesIO()
+    Image.fromarray(self.frame).save(buffer, format="PNG")
+    buffer.seek(0)
+    return Image.open(buffer).convert("RGB")
+
+def bench(function, iterations):
+  timings = []
+  for _ in range(iterations):
+    start = time.perf_counter()
+    function()
+    timings.append(time.perf_counter() - start)
+  timings.sort()
+  return timings[len(timings) // 2] * 1000, sum(timings) / len(timings) * 1000
+
+def main():
+  frame_path = sys.argv[1] if len(sys.argv) > 1 else "screenshot.png"
+  iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+  frame = np.array(Image.open(frame_path).convert("RGB"))
+  adb_actions.device = FakeDevice(frame)
+
+  raw_frame = adb_actions.screenshot_raw()
+  png_frame = adb_actions.screenshot_png()
+  if not np.array_equal(raw_frame, png_frame):
+    print("[WARNING] Raw and PNG backends returned different frames.")
+
+  print(f"Frame: {frame_path} {frame.shape[1]}x{frame.shape[0]}, {iterations} iterations")
+  for name, function in (("raw", adb_actions.screenshot_raw), ("png", adb_actions.screenshot_png)):
+    median, mean = bench(function, iterations)
+    print(f"{name:>4}: median {median:8.2f} ms, mean {mean:8.2f} ms")
+
+if __name__ == "__main__":
+  main()
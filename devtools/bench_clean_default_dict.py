@@ -0,0 +1,120 @@
+# Times CleanDefaultDict with the cached zero-ness against the class before the cache, which walks the subtree
+# on every check. The baseline class is read from git, by default from the commit before the cache was added.
+# The tree is a training_results dict built the way get_support_card_data counts supports, inside a state dict,
+# plus the score entries the training functions hand to the strategy.
+# Run from the repository root: py devtools/bench_clean_default_dict.py [--iterations N] [--baseline REV]
+import os
+import random
+import subprocess
+import sys
+import time
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from utils.shared import CleanDefaultDict
+import utils.constants as constants
+
+STATS = ["spd", "sta", "pwr", "guts", "wit", "sp"]
+HINT_VALUES = {"gray": 0.612, "blue": 0.606, "green": 0.6, "max": 0.1, "yellow": 0.1}
+
+def baseline_revision():
+  added = subprocess.run(["git", "log", "-S", "_compute_numeric_zero", "--format=%H", "--", "utils/shared.py"], capture_output=True, text=True).stdout.split()
+  return f"{added[-1]}~1" if added else "HEAD"
+
+def load_baseline(revision):
+  source = subprocess.run(["git", "show", f"{revision}:utils/shared.py"], capture_output=True, text=True, check=True).stdout
+  module = types.ModuleType("baseline_shared")
+  exec(compile(source, f"{revision}:utils/shared.py", "exec"), module.__dict__)
+  return module.CleanDefaultDict
+
+def build_state(cls, rng):
+  state = cls()
+  state["year"] = "Classic Year Early Jun"
+  state["turn"] = 7
+  state["current_stats"] = {stat: rng.randint(100, 1100) for stat in STATS}
+  state["aptitudes"] = {key: rng.choice("ABCDEFG") for key in ["surface_turf", "surface_dirt", "distance_sprint", "distance_mile", "distance_medium", "distance_long", "style_front", "style_pace", "style_late", "style_end"]}
+  for name in constants.TRAINING_BUTTON_POSITIONS:
+    training = state["training_results"][name]
+    training["failure"] = rng.choice([0, 2, 5, 12])
+    training["stat_gains"] = {stat: rng.randint(1, 30) for stat in rng.sample(STATS, 3)}
+    for _ in range(rng.randint(0, 5)):
+      support_type = rng.choice(list(constants.SUPPORT_ICONS))
+      level = rng.choice(list(constants.SUPPORT_FRIEND_LEVELS))
+      training[support_type]["supports"] += 1
+      training["total_supports"] += 1
+      training[support_type]["friendship_levels"][level] += 1
+      training["total_friendship_levels"][level] += 1
+      if rng.random() < 0.3:
+        training[support_type]["hints"] += 1
+        training["total_hints"] += 1
+        training["hints_per_friend_level"][level] += 1
+  return state
+
+def score_loops(cls, state):
+  # the dict reads and comparisons the training scores do, and the score entries built from them
+  entries = cls()
+  for name, training in state["training_results"].items():
+    levels = training["total_friendship_levels"]
+    score = levels["green"] + levels["blue"] * 1.05 + levels["gray"] * 1.1 + levels["max"] * 0.2 + levels["yellow"] * 0.2
+    if training["total_hints"] > 0:
+      for level, bonus in HINT_VALUES.items():
+        if training["hints_per_friend_level"][level] > 0:
+          score += bonus
+          break
+    rainbow_friends = training[name]["friendship_levels"]["yellow"] + training[name]["friendship_levels"]["max"]
+    score += rainbow_friends + training["total_supports"] * 0.2
+    for support_type in constants.SUPPORT_ICONS:
+      if training[support_type]["hints"] > 0:
+        score += 0.5
+        break
+    score += training["unity_gauge_fills"] + training["unity_spirit_explosions"]
+    entries[name] = {"score_tuple": (score, 0), "failure": training["failure"], "total_supports": training["total_supports"], "stat_gains": training["stat_gains"], "friendship_levels": training["total_friendship_levels"]}
+  return entries
+
+def bench(function, inputs, repeats=5):
+  # best ms per call over the repeats, every call gets its own input
+  best = float("inf")
+  for _ in range(repeats):
+    batch = inputs()
+    start = time.perf_counter()
+    for item in batch:
+      result = function(item)
+    best = min(best, (time.perf_counter() - start) / len(batch) * 1000)
+  return best, result
+
+def main():
+  arguments = sys.argv[1:]
+  options = {"--iterations": "500", "--baseline": None}
+  for name in options:
+    if name in arguments:
+      index = arguments.index(name)
+      options[name] = arguments[index + 1]
+      del arguments[index:index + 2]
+  iterations = int(options["--iterations"])
+  revision = options["--baseline"] or baseline_revision()
+
+  results = {}
+  for label, cls in [("uncached", load_baseline(revision)), ("cached", CleanDefaultDict)]:
+    def states():
+      return [build_state(cls, random.Random(i)) for i in range(iterations)]
+    state = build_state(cls, random.Random(0))
+    entries = score_loops(cls, build_state(cls, random.Random(0)))
+    results[label] = {
+      "build": bench(lambda rng: build_state(cls, rng), lambda: [random.Random(i) for i in range(iterations)]),
+      "repr state": bench(repr, lambda: [state] * iterations),
+      "score loops": bench(lambda tree: score_loops(cls, tree), states),
+      "repr entries": bench(repr, lambda: [entries] * iterations),
+    }
+
+  print(f"baseline class from {revision}")
+  for name in results["cached"]:
+    uncached_ms, uncached_result = results["uncached"][name]
+    cached_ms, cached_result = results["cached"][name]
+    same = repr(uncached_result) == repr(cached_result)
+    print(f"{name:<13} uncached {uncached_ms:7.4f} ms | cached {cached_ms:7.4f} ms | {uncached_ms / max(cached_ms, 1e-9):5.2f}x | same output {same}")
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,42 @@
+# Per-iteration cost of the career lobby template pass: one sequential matchTemplate per template
+# against the thread-parallel MultiTemplateDetector, on the game window of a recorded frame.
+# Run from the repository root: py devtools/bench_lobby_detector.py [frame.png] [iterations]
+import os
+import sys
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.constants as constants
+import utils.multi_template_detector as multi_template_detector
+from core.skeleton import lobby_detector, templates, unity_templates
+
+def sequential(frame, names, offset):
+  return {name: lobby_detector._match(name, frame, offset) for name in names}
+
+def bench(function, iterations):
+  start = time.perf_counter()
+  for _ in range(iterations):
+    output = function()
+  return (time.perf_counter() - start) / iterations * 1000, output
+
+def main():
+  frame_path = sys.argv[1] if len(sys.argv) > 1 else "screenshot.png"
+  iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+  left, top, right, bottom = constants.GAME_WINDOW_BBOX
+  frame = cv2.cvtColor(cv2.imread(frame_path), cv2.COLOR_BGR2RGB)[top:bottom, left:right]
+  names = [*templates, "clock_icon", *unity_templates]
+  offset = (left, top)
+
+  sequential_ms, sequential_result = bench(lambda: sequential(frame, names, offset), iterations)
+  detector_ms, detector_result = bench(lambda: lobby_detector.detect(frame, offset=offset, names=names), iterations)
+  if sequential_result != detector_result:
+    print("[WARNING] Sequential and detector results differ.")
+  print(f"Frame: {frame_path}, {len(names)} templates, {multi_template_detector.MAX_WORKERS} workers, {iterations} iterations")
+  print(f"sequential: {sequential_ms:8.2f} ms")
+  print(f"  detector: {detector_ms:8.2f} ms ({sequential_ms / max(detector_ms, 1e-6):.1f}x)")
+
+if __name__ == "__main__":
+  main()
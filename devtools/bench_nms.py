@@ -0,0 +1,64 @@
+# Micro-benchmark for utils/nms against the old pure-Python deduplicate_boxes loop on synthetic dense score maps.
+# Run from the repository root: py devtools/bench_nms.py [iterations]
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.nms as nms
+
+def legacy_deduplicate_boxes(boxes_xywh, min_dist=5):
+  filtered = []
+  for x, y, w, h in boxes_xywh:
+    cx, cy = x + w // 2, y + h // 2
+    if all(abs(cx - (fx + fw // 2)) > min_dist or abs(cy - (fy + fh // 2)) > min_dist
+        for fx, fy, fw, fh in filtered):
+      filtered.append((x, y, w, h))
+  return filtered
+
+def legacy_match_boxes(result, threshold, w, h):
+  loc = np.where(result >= threshold)
+  boxes = [(x, y, w, h) for (x, y) in zip(*loc[::-1])]
+  return legacy_deduplicate_boxes(boxes)
+
+def synthetic_score_map(shape, peaks, peak_radius, noise, seed=0):
+  # smooth blobs on top of noise, like a low threshold match of a small icon over a full frame
+  rng = np.random.default_rng(seed)
+  result = rng.normal(0.0, noise, shape).astype(np.float32)
+  yy, xx = np.mgrid[-peak_radius:peak_radius + 1, -peak_radius:peak_radius + 1]
+  blob = np.exp(-(xx ** 2 + yy ** 2) / (2 * (peak_radius / 2) ** 2)).astype(np.float32)
+  for _ in range(peaks):
+    y = rng.integers(peak_radius, shape[0] - peak_radius)
+    x = rng.integers(peak_radius, shape[1] - peak_radius)
+    height = rng.uniform(0.8, 1.0)
+    result[y - peak_radius:y + peak_radius + 1, x - peak_radius:x + peak_radius + 1] += blob * height
+  return np.clip(result, -1, 1)
+
+def bench(function, iterations):
+  start = time.perf_counter()
+  for _ in range(iterations):
+    output = function()
+  return (time.perf_counter() - start) / iterations * 1000, output
+
+def main():
+  iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+  # 800x1080 game window minus a ~40px template
+  shape = (1040, 760)
+  cases = [
+    ("sparse", 10, 6, 0.05, 0.8),
+    ("dense", 60, 10, 0.05, 0.6),
+    ("very dense", 150, 12, 0.10, 0.5),
+  ]
+  for name, peaks, radius, noise, threshold in cases:
+    result = synthetic_score_map(shape, peaks, radius, noise)
+    raw_hits = int(np.count_nonzero(result >= threshold))
+    legacy_ms, legacy_boxes = bench(lambda: legacy_match_boxes(result, threshold, 40, 40), iterations)
+    new_ms, (new_boxes, _) = bench(lambda: nms.match_boxes(result, threshold, 40, 40), iterations)
+    print(f"{name:>10}: {raw_hits:6d} raw hits | legacy {legacy_ms:9.2f} ms, {len(legacy_boxes):4d} boxes | nms {new_ms:7.2f} ms, {len(new_boxes):4d} boxes | {legacy_ms / max(new_ms, 1e-6):6.1f}x")
+
+if __name__ == "__main__":
+  main()
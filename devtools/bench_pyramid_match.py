@@ -0,0 +1,58 @@
+# Compares full resolution and coarse-to-fine pyramid template matching for every asset template
+# on the recorded frames, checks that both find exactly the same boxes and reports the speedup per template.
+# Run from the repository root: py devtools/bench_pyramid_match.py [factor] [threshold] [iterations]
+import glob
+import os
+import sys
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.nms as nms
+import utils.pyramid_match as pyramid_match
+import utils.template_registry as template_registry
+
+FRAMES = ["screenshot.png"] + sorted(glob.glob("references/*.png"))
+
+def full_match(frame, template, threshold):
+  result = cv2.matchTemplate(frame, template, cv2.TM_CCOEFF_NORMED)
+  h, w = template.shape[:2]
+  return nms.match_boxes(result, threshold, w, h)
+
+def bench(function, iterations):
+  start = time.perf_counter()
+  for _ in range(iterations):
+    output = function()
+  return (time.perf_counter() - start) / iterations * 1000, output
+
+def main():
+  factor = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+  threshold = float(sys.argv[2]) if len(sys.argv) > 2 else 0.8
+  iterations = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+  template_paths = sorted(glob.glob("assets/**/*.png", recursive=True))
+
+  mismatches = 0
+  for frame_path in FRAMES:
+    frame = cv2.cvtColor(cv2.imread(frame_path), cv2.COLOR_BGR2RGB)
+    print(f"Frame: {frame_path} {frame.shape[1]}x{frame.shape[0]}, factor {factor}, threshold {threshold}")
+    total_full = total_pyramid = 0
+    for path in template_paths:
+      template = template_registry.get_template(path)
+      if template.shape[0] > frame.shape[0] or template.shape[1] > frame.shape[1]:
+        continue
+      full_ms, (full_boxes, _) = bench(lambda: full_match(frame, template, threshold), iterations)
+      pyramid_ms, (pyramid_boxes, _) = bench(lambda: pyramid_match.match_boxes(frame, template, threshold, factor), iterations)
+      total_full += full_ms
+      total_pyramid += pyramid_ms
+      same = full_boxes == pyramid_boxes
+      if not same:
+        mismatches += 1
+      used_factor = pyramid_match.usable_factor(template, factor)
+      print(f"  {path:<60} x{used_factor} full {full_ms:8.2f} ms | pyramid {pyramid_ms:8.2f} ms | {full_ms / max(pyramid_ms, 1e-6):5.1f}x | {len(full_boxes):3d} boxes{'' if same else ' MISMATCH ' + str(pyramid_boxes)}")
+    print(f"  total: full {total_full:.1f} ms, pyramid {total_pyramid:.1f} ms, {total_full / max(total_pyramid, 1e-6):.1f}x")
+  print(f"{mismatches} mismatches")
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,107 @@
+# Compares the color_foreground fast path with custom_grabcut on stat gain crops: time per crop and how much
+# the per stat OCR inputs that get_stat_gains builds from both differ.
+# Crops are cut from screenshot.png, extra RGB crops of a stat gain region (e.g. saved with debug_window) can be passed.
+# Run from the repository root: py devtools/bench_stat_gain_segmentation.py [crop.png ...] [--iterations N]
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.constants as constants
+from utils.screenshot import custom_grabcut, color_foreground, binarize_between_colors, crop_after_plus_component, clean_noise
+
+UPPER_YELLOW = [255, 245, 170]
+# name: (region, lower yellow, grabcut mask area, secondary stat gains), same as get_stat_gains
+REGIONS = {
+  "ura": (constants.URA_STAT_GAINS_REGION, [220, 100, 60], 2, False),
+  "unity": (constants.UNITY_STAT_GAINS_REGION, [220, 100, 60], 2, False),
+  "unity_2": (constants.UNITY_STAT_GAINS_2_REGION, [220, 100, 45], 1, True),
+}
+BOXES = {
+  "spd":  (0.000, 0.00, 0.166, 1),
+  "sta":  (0.167, 0.00, 0.166, 1),
+  "pwr":  (0.334, 0.00, 0.166, 1),
+  "guts": (0.500, 0.00, 0.166, 1),
+  "wit":  (0.667, 0.00, 0.166, 1),
+  "sp":   (0.834, 0.00, 0.166, 1),
+}
+
+def ocr_inputs(segmented, lower_yellow, secondary):
+  # the per stat crops get_stat_gains reads, None for stats without a gain
+  binary = np.invert(binarize_between_colors(segmented, lower_yellow, UPPER_YELLOW))
+  h, w = binary.shape
+  crops = {}
+  for key, (xr, yr, wr, hr) in BOXES.items():
+    x, y, ww, hh = int(xr*w), int(yr*h), int(wr*w), int(hr*h)
+    cropped = np.array(binary[y:y+hh, x:x+ww])
+    if secondary:
+      cropped = crop_after_plus_component(cropped, plus_length=12, bar_width=0)
+    else:
+      cropped = crop_after_plus_component(cropped)
+    crops[key] = None if np.all(cropped == 0) else clean_noise(cropped)
+  return binary, crops
+
+def bench(function, iterations):
+  # ms per call and the output of every call
+  start = time.perf_counter()
+  outputs = [function() for _ in range(iterations)]
+  return (time.perf_counter() - start) / iterations * 1000, outputs
+
+def load_crops(paths):
+  crops = []
+  frame = cv2.cvtColor(cv2.imread("screenshot.png"), cv2.COLOR_BGR2RGB)
+  for name, (region, lower_yellow, mask_area, secondary) in REGIONS.items():
+    x, y, w, h = region
+    crops.append((f"screenshot.png {name}", frame[y:y+h, x:x+w].copy(), lower_yellow, mask_area, secondary))
+  # the recorded frame only has gains in the URA position, shifted crops stand in for small layout differences
+  x, y, w, h = constants.URA_STAT_GAINS_REGION
+  for dx, dy in [(0, -3), (0, 3), (-4, 0), (4, 0), (3, -2)]:
+    crops.append((f"screenshot.png ura shifted {dx},{dy}", frame[y+dy:y+dy+h, x+dx:x+dx+w].copy(), [220, 100, 60], 2, False))
+  for path in paths:
+    crop = cv2.cvtColor(cv2.imread(path), cv2.COLOR_BGR2RGB)
+    secondary = "unity_2" in os.path.basename(path) or "secondary" in os.path.basename(path)
+    lower_yellow = [220, 100, 45] if secondary else [220, 100, 60]
+    crops.append((path, crop, lower_yellow, 1 if secondary else 2, secondary))
+  return crops
+
+def main():
+  arguments = sys.argv[1:]
+  iterations = 20
+  if "--iterations" in arguments:
+    index = arguments.index("--iterations")
+    iterations = int(arguments[index + 1])
+    del arguments[index:index + 2]
+
+  total_grabcut = total_fast = 0
+  same_stats = total_stats = 0
+  for name, crop, lower_yellow, mask_area, secondary in load_crops(arguments):
+    grabcut_ms, grabcut_outputs = bench(lambda: custom_grabcut(crop, mask_area=mask_area), iterations)
+    fast_ms, fast_outputs = bench(lambda: color_foreground(crop, lower_yellow, UPPER_YELLOW), iterations)
+    # grabcut seeds its color models with k-means, the same crop doesn't always give the same result
+    grabcut_variants = len({output.tobytes() for output in grabcut_outputs})
+    grabcut = grabcut_outputs[0]
+    fast, valid = fast_outputs[0]
+    total_grabcut += grabcut_ms
+    total_fast += fast_ms
+    grabcut_binary, grabcut_crops = ocr_inputs(grabcut, lower_yellow, secondary)
+    fast_binary, fast_crops = ocr_inputs(fast, lower_yellow, secondary)
+    foreground = (grabcut_binary > 0) | (fast_binary > 0)
+    iou = np.count_nonzero((grabcut_binary > 0) & (fast_binary > 0)) / max(1, np.count_nonzero(foreground))
+    differing = []
+    for key in BOXES:
+      a, b = grabcut_crops[key], fast_crops[key]
+      same = (a is None and b is None) or (a is not None and b is not None and a.shape == b.shape and np.array_equal(a, b))
+      total_stats += 1
+      same_stats += same
+      if not same:
+        differing.append(key)
+    print(f"{name:<40} grabcut {grabcut_ms:7.2f} ms | fast {fast_ms:6.2f} ms | {grabcut_ms / max(fast_ms, 1e-6):5.1f}x | valid {valid!s:<5} | grabcut variants {grabcut_variants} | text IoU {iou:.3f} | differing stats {differing}")
+  print(f"total: grabcut {total_grabcut:.1f} ms, fast {total_fast:.1f} ms, {total_grabcut / max(total_fast, 1e-6):.1f}x")
+  print(f"{same_stats}/{total_stats} per stat OCR inputs identical")
+
+if __name__ == "__main__":
+  main()
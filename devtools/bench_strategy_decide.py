@@ -0,0 +1,162 @@
+# Times a full Strategy.decide call on synthetic turns, with the training scoring from before the TurnState change
+# on the old nested CleanDefaultDict state and the current scoring on TurnState / TrainingObservation.
+# Both get the same turns and the chosen actions are compared.
+# The baseline scoring is read from git, by default from the commit before core/turn_state.py was added.
+# Run from the repository root: py devtools/bench_strategy_decide.py [--turns N] [--iterations N] [--baseline REV]
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import time
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import core
+import core.config as config
+import core.trainings
+import utils.constants as constants
+from core.actions import Action
+from core.strategies import Strategy
+from core.turn_state import TurnState, TrainingObservation, SUPPORT_TYPES, FRIEND_LEVELS
+from utils.shared import CleanDefaultDict
+
+# templates of config.template.json, one per training function
+TRAINING_TEMPLATES = ["max_out_friendships", "rainbow_training", "do_most_cards", "most_stat_gain", "meta_training"]
+# the training stats each training gives, the same as state.valid_training_dict
+TRAINING_STATS = {
+  "spd": ["spd", "pwr", "sp"],
+  "sta": ["sta", "guts", "sp"],
+  "pwr": ["sta", "pwr", "sp"],
+  "guts": ["spd", "pwr", "guts", "sp"],
+  "wit": ["spd", "wit", "sp"],
+}
+
+def load_config():
+  with open("config.template.json", "r", encoding="utf-8") as file:
+    template = json.load(file)
+  config.load_config = lambda: template
+  config.reload_config(print_config=False)
+  config.HINT_HUNTING_ENABLED = True
+  # the infirmary check reads the screen
+  for template in config.TRAINING_STRATEGY["templates"].values():
+    template["action_sequence_set"] = [name for name in template["action_sequence_set"] if name != "infirmary"]
+
+def baseline_revision():
+  added = subprocess.run(["git", "log", "--diff-filter=A", "--format=%H", "--", "core/turn_state.py"], capture_output=True, text=True).stdout.split()
+  return f"{added[-1]}~1" if added else "HEAD"
+
+def load_baseline(revision):
+  source = subprocess.run(["git", "show", f"{revision}:core/trainings.py"], capture_output=True, text=True, check=True).stdout
+  module = types.ModuleType("baseline_trainings")
+  exec(compile(source, f"{revision}:core/trainings.py", "exec"), module.__dict__)
+  return module
+
+def random_training(rng, name):
+  # the merged get_training_data and get_support_card_data dicts
+  data = CleanDefaultDict()
+  data["failure"] = rng.choice([0, 0, 0, 2, 5, 8, 15, 30])
+  data["stat_gains"] = {stat: rng.randint(1, 40) for stat in TRAINING_STATS[name]}
+  if constants.SCENARIO_NAME == "unity":
+    # counters are only set once something was matched
+    for counter, most in [("unity_trainings", 3), ("unity_gauge_fills", 2), ("unity_spirit_explosions", 1)]:
+      count = rng.randint(0, most)
+      if count:
+        data[counter] += count
+  for _ in range(rng.randint(0, 5)):
+    support_type = rng.choice(SUPPORT_TYPES)
+    level = rng.choice(FRIEND_LEVELS)
+    data[support_type]["supports"] += 1
+    data["total_supports"] += 1
+    data[support_type]["friendship_levels"][level] += 1
+    data["total_friendship_levels"][level] += 1
+    if rng.random() < 0.2:
+      data[support_type]["hints"] += 1
+      data["total_hints"] += 1
+      data["hints_per_friend_level"][level] += 1
+  return data
+
+def random_turn(rng):
+  # the same turn as the old state dict and as a TurnState
+  year = rng.choice(constants.TIMELINE[1:])
+  mood = rng.choice(constants.MOOD_LIST[:5])
+  fields = {
+    "current_mood": mood,
+    "mood_difference": constants.MOOD_LIST.index(mood) - constants.MOOD_LIST.index(config.MINIMUM_MOOD),
+    "mood_difference_junior_year": constants.MOOD_LIST.index(mood) - constants.MOOD_LIST.index(config.MINIMUM_MOOD_JUNIOR_YEAR),
+    "turn": rng.randint(1, 12),
+    "year": year,
+    "current_stats": {stat: rng.randint(100, 1200) for stat in ["spd", "sta", "pwr", "guts", "wit"]} | {"sp": rng.randint(0, 900)},
+    "criteria": "Achieved",
+    "energy_level": rng.randint(0, 100),
+    "max_energy": 100,
+    "date_event_available": rng.random() < 0.3,
+  }
+  trainings = {name: random_training(rng, name) for name in constants.TRAINING_BUTTON_POSITIONS}
+  old_state = CleanDefaultDict(fields)
+  old_state["training_results"] = CleanDefaultDict({name: CleanDefaultDict(data) for name, data in trainings.items()})
+  new_state = TurnState(fields)
+  new_state["training_results"] = CleanDefaultDict({name: TrainingObservation.from_dict(data) for name, data in trainings.items()})
+  return old_state, new_state
+
+def decide(states, template_name):
+  # every state is decided once by a fresh strategy, the scoring writes into the states
+  actions = []
+  for state in states:
+    config.TRAINING_STRATEGY["timeline"] = {state["year"]: template_name}
+    strategy = Strategy()
+    actions.append(strategy.decide(state, Action()))
+  return actions
+
+def summary(action):
+  trainings = action.get("available_trainings") or {}
+  return (action.func, action.get("training_name"), {name: entry["score_tuple"] for name, entry in trainings.items()})
+
+def bench(side, count, template_name, iterations, seed):
+  # ms per decide call and the actions of the last iteration, side 0 is the old state and 1 the TurnState
+  total = 0.0
+  for _ in range(iterations):
+    states = [random_turn(random.Random(seed * 1000 + n))[side] for n in range(count)]
+    start = time.perf_counter()
+    actions = decide(states, template_name)
+    total += time.perf_counter() - start
+  return total / iterations / count * 1000, actions
+
+def main():
+  arguments = sys.argv[1:]
+  options = {"--turns": "200", "--iterations": "5", "--baseline": None}
+  for name in options:
+    if name in arguments:
+      index = arguments.index(name)
+      options[name] = arguments[index + 1]
+      del arguments[index:index + 2]
+  count = int(options["--turns"])
+  iterations = int(options["--iterations"])
+  revision = options["--baseline"] or baseline_revision()
+
+  load_config()
+  # the bot logs at INFO, the messages are formatted either way
+  logging.getLogger().setLevel(logging.INFO)
+  logging.getLogger().addHandler(logging.NullHandler())
+  baseline = load_baseline(revision)
+  current = core.trainings
+
+  print(f"baseline scoring from {revision}, {count} turns x {iterations} iterations")
+  for scenario in ["", "unity"]:
+    constants.SCENARIO_NAME = scenario
+    for seed, template_name in enumerate(TRAINING_TEMPLATES):
+      core.trainings = baseline
+      try:
+        old_ms, old_actions = bench(0, count, template_name, iterations, seed)
+      finally:
+        core.trainings = current
+      new_ms, new_actions = bench(1, count, template_name, iterations, seed)
+      different = sum(summary(a) != summary(b) for a, b in zip(old_actions, new_actions))
+      print(f"{scenario or 'ura':<6} {template_name:<20} old {old_ms:6.3f} ms | new {new_ms:6.3f} ms | {old_ms / max(new_ms, 1e-9):4.2f}x | different decisions {different}/{count}")
+
+if __name__ == "__main__":
+  main()
@@ -1,5 +1,8 @@
 import sys
 import subprocess
+import time
+
+startup_time = time.time()
 
 MIN = (3, 10)
 MAX = (3, 14)
@@ -52,6 +55,7 @@ import utils.constants as constants
 from utils.log import info, warning, error, debug, args, init_logging
 
 from core.skeleton import career_lobby
+import core.ocr as ocr
 import core.config as config
 import core.bot as bot
 from server.main import app
@@ -163,6 +167,9 @@ def start_server():
   server_config = uvicorn.Config(app, host=host, port=port, workers=1, log_level="warning")
   server = uvicorn.Server(server_config)
   init_logging()
+  if not args.no_ocr_warm_up:
+    ocr.start_warm_up()
+  info(f"Startup took {time.time() - startup_time:.2f} seconds.")
   info(f"Press '{bot.hotkey}' to start/stop the bot.")
   info(f"[SERVER] Open http://{host}:{port} to configure the bot.")
   server.run()
@@ -1,7 +1,9 @@
 from adbutils import adb
 import numpy as np
+from time import time
+import struct
 import core.bot as bot
-from utils.log import info, debug, error, debug_window, args
+from utils.log import info, debug, warning, error, debug_window, args
 from utils.constants import name_of_variable
 
 device = None
@@ -53,9 +55,63 @@ def disable_cursor_display():
   except Exception:
     return False
 
+# screencap pixel formats we can wrap without converting, values from android.graphics.PixelFormat
+RGBA_8888 = 1
+RGBX_8888 = 2
+BGRA_8888 = 5
+RAW_HEADER_SIZES = (12, 16) # width, height, format + colorspace on Android 9 and up
+
+# "raw" reads the uncompressed framebuffer from screencap, "png" goes through device.screenshot()
+capture_backend = "raw"
+
+def parse_raw_screencap(data : bytes) -> np.ndarray:
+  width, height, pixel_format = struct.unpack_from("<III", data, 0)
+  payload_size = width * height * 4
+  header_size = len(data) - payload_size
+  if header_size not in RAW_HEADER_SIZES:
+    raise ValueError(f"Unexpected screencap size: {len(data)} bytes for {width}x{height}")
+  # zero-copy view over the payload
+  frame = np.frombuffer(data, dtype=np.uint8, count=payload_size, offset=header_size).reshape(height, width, 4)
+  if pixel_format in (RGBA_8888, RGBX_8888):
+    return frame[:, :, :3]
+  if pixel_format == BGRA_8888:
+    return frame[:, :, 2::-1]
+  raise ValueError(f"Unsupported screencap pixel format: {pixel_format}")
+
+def screenshot_raw():
+  data = device.shell("screencap", encoding=None, rstrip=False)
+  return parse_raw_screencap(data)
+
+def screenshot_png():
+  try:
+    return np.array(device.screenshot(error_ok=False))
+  except:
+    return np.array(device.screenshot())
+
+def grab_frame():
+  global capture_backend
+  if capture_backend == "raw":
+    try:
+      return screenshot_raw()
+    except Exception as e:
+      warning(f"Raw framebuffer capture failed, falling back to PNG screenshots: {e}")
+      capture_backend = "png"
+  return screenshot_png()
+
+def crop_frame(screenshot, region_xywh: tuple[int, int, int, int] = None):
+  if screenshot.shape[0] == 800 and screenshot.shape[1] == 1080:
+    # change region from portrait to landscape
+    region_xywh = (0, 0, 1080, 800)
+  if region_xywh:
+    x, y, w, h = region_xywh
+    screenshot = screenshot[y:y+h, x:x+w]
+  return screenshot
+
 cached_screenshot = []
+# when the cached screenshot was captured
+cached_screenshot_time = 0.0
 def screenshot(region_xywh: tuple[int, int, int, int] = None):
-  global cached_screenshot
+  global cached_screenshot, cached_screenshot_time
   if device is None:
     error(f"ADB device is None, this should not happen, check ADB connection and device ID, if problem persists, please report this error.")
     raise Exception("ADB device is None")
@@ -69,21 +125,13 @@ def screenshot(region_xywh: tuple[int, int, int, int] = None):
   else:
     if args.device_debug:
       debug(f"Taking new screenshot")
-    try:
-      screenshot = np.array(device.screenshot(error_ok=False))
-    except:
-      screenshot = np.array(device.screenshot())
+    cached_screenshot_time = time()
+    screenshot = grab_frame()
     cached_screenshot = screenshot
   if args.device_debug:
     debug(f"Screenshot shape: {screenshot.shape}")
-  if screenshot.shape[0] == 800 and screenshot.shape[1] == 1080:
-    # change region from portrait to landscape
-    region_xywh = (0, 0, 1080, 800)
-  if region_xywh:
-    x, y, w, h = region_xywh
-    screenshot = screenshot[y:y+h, x:x+w]
+  screenshot = crop_frame(screenshot, region_xywh)
   if args.device_debug:
     debug(f"Screenshot shape: {screenshot.shape}")
-    variable_name = name_of_variable(region_xywh)
     debug_window(screenshot, save_name="adb_screenshot")
   return screenshot
@@ -4,6 +4,11 @@ import core.bot as bot
 import utils.pyautogui_actions as pyautogui_actions
 import utils.adb_actions as adb_actions
 import utils.constants as constants
+import utils.template_registry as template_registry
+from utils.frame_grabber import FrameGrabber
+import utils.nms as nms
+import utils.pyramid_match as pyramid_match
+import utils.location_priors as location_priors
 from utils.log import error, info, warning, debug, debug_window, args
 
 from time import sleep, time
@@ -21,6 +26,10 @@ def stop_bot():
 Pos = tuple[int, int]                     # (x, y)
 Box = tuple[int, int, int, int]           # (x, y, w, h)
 
+# downscale factor of the coarse pass for the call sites that opt in to pyramid matching,
+# only ones whose templates were checked to give the same boxes as a full resolution match
+PYRAMID_FACTOR = 2
+
 def click(target: Pos | Box, clicks: int = 1, interval: float = 0.1, duration: float = 0.225, text: str = ""):
   if text:
     debug(text)
@@ -53,7 +62,7 @@ def click(target: Pos | Box, clicks: int = 1, interval: float = 0.1, duration: f
   if args.device_debug:
     debug(f"We clicked on {target}, screen might change, flushing screenshot cache.")
   flush_screenshot_cache()
-  sleep(0.35)
+  wait_for_settle(timeout=0.35)
   return True
 
 def swipe(start_x_y : tuple[int, int], end_x_y : tuple[int, int], duration=0.3, text: str = ""):
@@ -108,10 +117,8 @@ def match_cached_templates(cached_templates, region_ltrb=None, threshold=0.85, t
     if args.save_images:
       debug_window(template, save_name=f"{name}_template")
     result = cv2.matchTemplate(_screenshot, template, cv2.TM_CCOEFF_NORMED)
-    loc = np.where(result >= threshold)
     h, w = template.shape[:2]
-    boxes = [(x+region_ltrb[0], y+region_ltrb[1], w, h) for (x, y) in zip(*loc[::-1])]
-    results[name] = deduplicate_boxes(boxes)
+    results[name], _ = nms.match_boxes(result, threshold, w, h, offset=(region_ltrb[0], region_ltrb[1]))
     if stop_after_first_match and len(results[name]) > 0:
       debug(f"Stopping after first match: {name}")
       break
@@ -119,56 +126,51 @@ def match_cached_templates(cached_templates, region_ltrb=None, threshold=0.85, t
   print(f"Results: {results}")
   return results
 
-def multi_match_templates(templates, screenshot: np.ndarray, threshold=0.85, text: str = "", template_scaling=1.0, stop_after_first_match=False):
+def multi_match_templates(templates, screenshot: np.ndarray, threshold=0.85, text: str = "", template_scaling=1.0, stop_after_first_match=False, pyramid_factor=1):
   results = {}
   for name, path in templates.items():
     if text and args.device_debug:
       text = f"[{name}] {text}"
-    results[name] = match_template(path, screenshot, threshold, text, template_scaling=template_scaling)
+    results[name] = match_template(path, screenshot, threshold, text, template_scaling=template_scaling, pyramid_factor=pyramid_factor)
     if stop_after_first_match and len(results[name]) > 0:
       debug(f"Template found: {name}")
       break
   return results
 
-def match_template(template_path : str, screenshot : np.ndarray, threshold=0.85, text: str = "", grayscale=False, template_scaling=1.0):
+def match_template(template_path : str, screenshot : np.ndarray, threshold=0.85, text: str = "", grayscale=False, template_scaling=1.0, return_scores=False, pyramid_factor=1):
+  # boxes are in raster order (top to bottom, left to right). return_scores also returns the score of every box.
+  # pyramid_factor > 1 finds candidates on a frame downscaled by that factor and only scores those at full resolution.
   if text and args.device_debug:
     debug(text)
+  template = template_registry.get_template(template_path, grayscale=grayscale, scaling=template_scaling)
   if grayscale:
-    template = cv2.imread(template_path, cv2.IMREAD_GRAYSCALE)
     screenshot = cv2.cvtColor(screenshot, cv2.COLOR_RGB2GRAY)
-  else:
-    template = cv2.imread(template_path, cv2.IMREAD_COLOR)  # safe default
-    if template.shape[2] == 4:
-      template = cv2.cvtColor(template, cv2.COLOR_BGRA2BGR)
-    template = cv2.cvtColor(template, cv2.COLOR_RGB2BGR)
-  if template_scaling != 1.0:
-    template = cv2.resize(template, (int(template.shape[1] * template_scaling), int(template.shape[0] * template_scaling)))
   if args.save_images:
     template_name = template_path.split("/")[-1].split(".")[0]
     debug_window(template, save_name=f"{template_name}_template")
     debug_window(screenshot, save_name=f"{template_name}_screenshot")
-  result = cv2.matchTemplate(screenshot, template, cv2.TM_CCOEFF_NORMED)
-  loc = np.where(result >= threshold)
+  if pyramid_factor > 1:
+    result = pyramid_match.match_scores(screenshot, template, threshold, factor=pyramid_factor)
+  else:
+    result = cv2.matchTemplate(screenshot, template, cv2.TM_CCOEFF_NORMED)
 
   h, w = template.shape[:2]
-  boxes = [(x, y, w, h) for (x, y) in zip(*loc[::-1])]
+  boxes, scores = nms.match_boxes(result, threshold, w, h)
+  if return_scores:
+    return boxes, scores
+  return boxes
 
-  return deduplicate_boxes(boxes)
-
-def deduplicate_boxes(boxes_xywh : list[tuple[int, int, int, int]], min_dist=5):
+def deduplicate_boxes(boxes_xywh : list[tuple[int, int, int, int]], min_dist=5, scores=None):
   # boxes_xywh = (x, y, width, height)
-  filtered = []
-  for x, y, w, h in boxes_xywh:
-    cx, cy = x + w // 2, y + h // 2
-    if all(abs(cx - (fx + fw // 2)) > min_dist or abs(cy - (fy + fh // 2)) > min_dist
-        for fx, fy, fw, fh in filtered):
-      filtered.append((x, y, w, h))
-  return filtered
-
-def screenshot(region_xywh : tuple[int, int, int, int] = None, region_ltrb : tuple[int, int, int, int] = None):
+  return nms.deduplicate_boxes(boxes_xywh, min_dist=min_dist, scores=scores)
+
+def screenshot(region_xywh : tuple[int, int, int, int] = None, region_ltrb : tuple[int, int, int, int] = None, snapshot=None):
+  # with a FrameSnapshot the region is a view into its frame instead of a copy of the current screen
   if not bot.is_bot_running:
     stop_bot()
 
+  if snapshot is not None:
+    return snapshot.region(region_xywh=region_xywh, region_ltrb=region_ltrb)
   screenshot = None
   if region_xywh:
     if args.device_debug:
@@ -182,17 +184,74 @@ def screenshot(region_xywh : tuple[int, int, int, int] = None, region_ltrb : tup
     if args.device_debug:
       debug(f"Screenshot: {constants.GAME_WINDOW_REGION}")
 
-  if bot.use_adb:
-    if args.device_debug:
-      debug(f"Using ADB screenshot")
-    screenshot = adb_actions.screenshot(region_xywh=region_xywh)
-  else:
-    if args.device_debug:
-      debug(f"Using PyAutoGUI screenshot")
-    screenshot = pyautogui_actions.screenshot(region_xywh=region_xywh)
+  if frame_grabber is not None:
+    frame = frame_grabber.frame_after(last_input_time)
+    if frame is not None:
+      if args.device_debug:
+        debug(f"Using grabbed frame {frame.frame_id}")
+      screenshot = crop_frame(frame.image, region_xywh)
+  if screenshot is None:
+    if bot.use_adb:
+      if args.device_debug:
+        debug(f"Using ADB screenshot")
+      screenshot = adb_actions.screenshot(region_xywh=region_xywh)
+    else:
+      if args.device_debug:
+        debug(f"Using PyAutoGUI screenshot")
+      screenshot = pyautogui_actions.screenshot(region_xywh=region_xywh)
   debug_window(screenshot, save_name="device_screenshot")
   return np.array(screenshot)
 
+def crop_frame(frame : np.ndarray, region_xywh : tuple[int, int, int, int] = None):
+  if bot.use_adb:
+    return adb_actions.crop_frame(frame, region_xywh)
+  return pyautogui_actions.crop_frame(frame, region_xywh)
+
+def _grab_full_frame():
+  # whole frame the regions are cut from, and when it was captured
+  if frame_grabber is not None:
+    frame = frame_grabber.frame_after(last_input_time)
+    if frame is not None:
+      return frame.image, frame.timestamp
+  actions = adb_actions if bot.use_adb else pyautogui_actions
+  if len(actions.cached_screenshot) == 0:
+    actions.cached_screenshot_time = time()
+    actions.cached_screenshot = actions.grab_frame()
+  return actions.cached_screenshot, actions.cached_screenshot_time
+
+class FrameSnapshot:
+  """
+  One frame shared by several readers, so every field read from it comes from the same moment.
+  timestamp is when the frame was captured, not when it was handed out, also for cached screenshots.
+  Regions are copies like screenshot() returns, readers can modify them.
+  """
+  def __init__(self):
+    if not bot.is_bot_running:
+      stop_bot()
+    self.image, self.timestamp = _grab_full_frame()
+
+  def refresh(self):
+    # for readers that know the screen changed since the frame was captured
+    flush_screenshot_cache()
+    self.image, self.timestamp = _grab_full_frame()
+
+  def region(self, region_xywh : tuple[int, int, int, int] = None, region_ltrb : tuple[int, int, int, int] = None):
+    if region_ltrb:
+      left, top, right, bottom = region_ltrb
+      region_xywh = (left, top, right - left, bottom - top)
+    return np.array(crop_frame(self.image, region_xywh))
+
+def screenshot_after(timestamp : float, region_xywh : tuple[int, int, int, int] = None, timeout=1.0):
+  # screenshot captured after timestamp, needs the frame grabber, otherwise takes a new screenshot
+  if not bot.is_bot_running:
+    stop_bot()
+  if frame_grabber is not None:
+    frame = frame_grabber.frame_after(timestamp, timeout=timeout)
+    if frame is not None:
+      return np.array(crop_frame(frame.image, region_xywh))
+  flush_screenshot_cache()
+  return screenshot(region_xywh=region_xywh)
+
 def screenshot_match(match, region : tuple[int, int, int, int]):
   screenshot_region=(
     match[0] + region[0],
@@ -202,44 +261,62 @@ def screenshot_match(match, region : tuple[int, int, int, int]):
   )
   return screenshot(region_xywh=screenshot_region)
 
-def locate(img_path : str, confidence=0.8, min_search_time=0, region_ltrb : tuple[int, int, int, int] = None, text: str = "", template_scaling=1.0):
+def _locate_once(img_path : str, confidence, region_ltrb : tuple[int, int, int, int], template_scaling=1.0, pyramid_factor=1, snapshot=None):
+  # absolute center of the first match, tries the learned position of a template that is only ever in one spot
+  # before the whole region
+  template_h, template_w = template_registry.get_template(img_path, scaling=template_scaling).shape[:2]
+  full_area = (region_ltrb[2] - region_ltrb[0]) * (region_ltrb[3] - region_ltrb[1])
+  roi = location_priors.get_roi(img_path, (template_w, template_h), region_ltrb, template_scaling)
+  if roi is not None:
+    _screenshot = screenshot(region_ltrb=roi, snapshot=snapshot)
+    # the landscape ADB frame ignores regions, the offsets would be wrong
+    if _screenshot.shape[:2] == (roi[3] - roi[1], roi[2] - roi[0]):
+      boxes = match_template(img_path, _screenshot, confidence, template_scaling=template_scaling)
+      roi_area = (roi[2] - roi[0]) * (roi[3] - roi[1])
+      location_priors.record_lookup(img_path, len(boxes) > 0, roi_area, full_area)
+      if len(boxes) > 0:
+        x, y, w, h = boxes[0]
+        center = (x + w // 2 + roi[0], y + h // 2 + roi[1])
+        location_priors.record(img_path, center, template_scaling)
+        return center
+  _screenshot = screenshot(region_ltrb=region_ltrb, snapshot=snapshot)
+  boxes = match_template(img_path, _screenshot, confidence, template_scaling=template_scaling, pyramid_factor=pyramid_factor)
+  if len(boxes) < 1:
+    return None
+  x, y, w, h = boxes[0]
+  center = (x + w // 2 + region_ltrb[0], y + h // 2 + region_ltrb[1])
+  if _screenshot.shape[:2] == (region_ltrb[3] - region_ltrb[1], region_ltrb[2] - region_ltrb[0]):
+    location_priors.record(img_path, center, template_scaling)
+  return center
+
+def locate(img_path : str, confidence=0.8, min_search_time=0, region_ltrb : tuple[int, int, int, int] = None, text: str = "", template_scaling=1.0, pyramid_factor=1, snapshot=None):
   if text and args.device_debug:
     debug(text)
   if region_ltrb is None:
     region_ltrb = constants.GAME_WINDOW_BBOX
   time_start = time()
-  _screenshot = screenshot(region_ltrb=region_ltrb)
-  boxes = match_template(img_path, _screenshot, confidence, template_scaling=template_scaling)
+  coordinates = _locate_once(img_path, confidence, region_ltrb, template_scaling, pyramid_factor, snapshot)
   tries = 1
   elapsed_time = time() - time_start
 
-  while len(boxes) < 1 and elapsed_time < min_search_time:
+  # a snapshot won't change, searching it again is pointless
+  while coordinates is None and elapsed_time < min_search_time and snapshot is None:
     tries += 1
     flush_screenshot_cache()
-    _screenshot = screenshot(region_ltrb=region_ltrb)
-    boxes = match_template(img_path, _screenshot, confidence, template_scaling=template_scaling)
+    coordinates = _locate_once(img_path, confidence, region_ltrb, template_scaling, pyramid_factor)
     sleep(0.5)
     elapsed_time = time() - time_start
 
-  if len(boxes) < 1:
+  if coordinates is None:
     if min_search_time > 0:
       info(f"{img_path} not found after {elapsed_time:.2f} seconds, tried {tries} times")
     return None
   if args.device_debug:
     debug(f"{img_path} found after {elapsed_time:.2f} seconds, tried {tries} times")
-  x, y, w, h = boxes[0]
-  offset_x = region_ltrb[0]
-  offset_y = region_ltrb[1]
-
-  x_center = x + w // 2 + offset_x
-  y_center = y + h // 2 + offset_y
-
-  if args.device_debug:
-    debug(f"locate: {x_center}, {y_center}")
-  coordinates = (x_center, y_center)
+    debug(f"locate: {coordinates[0]}, {coordinates[1]}")
   return coordinates
 
-def locate_and_click(img_path : str, confidence=0.8, min_search_time=0.5, region_ltrb : tuple[int, int, int, int] = None, duration=0.225, text: str = "", template_scaling=1.0):
+def locate_and_click(img_path : str, confidence=0.8, min_search_time=0.5, region_ltrb : tuple[int, int, int, int] = None, duration=0.225, text: str = "", template_scaling=1.0, pyramid_factor=1):
   if img_path is None or img_path == "":
     error(f"img_path is empty")
     raise ValueError(f"img_path is empty")
@@ -249,7 +326,7 @@ def locate_and_click(img_path : str, confidence=0.8, min_search_time=0.5, region
     region_ltrb = constants.GAME_WINDOW_BBOX
   if args.device_debug:
     debug(f"locate_and_click: {img_path}, {region_ltrb}")
-  coordinates = locate(img_path, confidence, min_search_time, region_ltrb=region_ltrb, template_scaling=template_scaling)
+  coordinates = locate(img_path, confidence, min_search_time, region_ltrb=region_ltrb, template_scaling=template_scaling, pyramid_factor=pyramid_factor)
   if args.device_debug:
     debug(f"locate_and_click: {coordinates}")
 
@@ -258,7 +335,142 @@ def locate_and_click(img_path : str, confidence=0.8, min_search_time=0.5, region
     return True
   return False
 
+def _poll_region(region_ltrb, after, timeout=1.0):
+  # fresh frame of the region captured after the given time, returns (image, capture time)
+  region_xywh = None
+  if region_ltrb is not None:
+    left, top, right, bottom = region_ltrb
+    region_xywh = (left, top, right - left, bottom - top)
+  if not bot.is_bot_running:
+    stop_bot()
+  if frame_grabber is not None:
+    frame = frame_grabber.frame_after(after, timeout=timeout)
+    if frame is not None:
+      return np.array(crop_frame(frame.image, region_xywh)), frame.timestamp
+  _clear_cached_screenshot()
+  timestamp = time()
+  if bot.use_adb:
+    image = adb_actions.screenshot(region_xywh=region_xywh)
+  else:
+    image = pyautogui_actions.screenshot(region_xywh=region_xywh)
+  return np.array(image), timestamp
+
+# pause between direct captures while waiting on the screen, the frame grabber paces its own captures
+POLL_INTERVAL = 0.03
+
+def _poll_interval():
+  return POLL_INTERVAL if frame_grabber is None else 0.0
+
+def _has_time_for_poll(time_start, timeout, poll_duration):
+  # slow captures (adb) could push the wait past its timeout, don't start a poll that wouldn't finish in time
+  return time() - time_start + poll_duration < timeout
+
+def _region_signature(image, scale=0.25):
+  # downscaled grayscale copy, enough to notice UI changes without paying for full resolution diffs
+  small = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+  if small.ndim == 3:
+    small = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY)
+  return small
+
+def _region_diff(signature_a, signature_b):
+  return float(np.mean(cv2.absdiff(signature_a, signature_b)))
+
+def wait_for_change(region_ltrb : tuple[int, int, int, int] = None, timeout=2.0, diff_threshold=1.5, text: str = ""):
+  # returns True as soon as the region differs from how it looked when called, False on timeout
+  if text and args.device_debug:
+    debug(text)
+  time_start = time()
+  image, timestamp = _poll_region(region_ltrb, last_input_time, timeout=timeout)
+  reference = _region_signature(image)
+  poll_duration = time() - time_start
+  while _has_time_for_poll(time_start, timeout, poll_duration + _poll_interval()):
+    sleep(_poll_interval())
+    poll_start = time()
+    image, timestamp = _poll_region(region_ltrb, timestamp, timeout=timeout - (poll_start - time_start))
+    poll_duration = time() - poll_start
+    diff = _region_diff(reference, _region_signature(image))
+    if diff > diff_threshold:
+      if args.device_debug:
+        debug(f"wait_for_change: changed after {time() - time_start:.2f} seconds, diff: {diff:.2f}")
+      return True
+  if args.device_debug:
+    debug(f"wait_for_change: no change after {timeout:.2f} seconds")
+  return False
+
+def wait_until_stable(region_ltrb : tuple[int, int, int, int] = None, quiet_ms=150, timeout=2.0, diff_threshold=1.5, text: str = ""):
+  # returns True once the region stayed the same for quiet_ms, False if it was still changing at timeout
+  if text and args.device_debug:
+    debug(text)
+  time_start = time()
+  image, timestamp = _poll_region(region_ltrb, last_input_time, timeout=timeout)
+  previous = _region_signature(image)
+  quiet_since = timestamp
+  poll_duration = time() - time_start
+  while _has_time_for_poll(time_start, timeout, poll_duration + _poll_interval()):
+    sleep(_poll_interval())
+    poll_start = time()
+    image, timestamp = _poll_region(region_ltrb, timestamp, timeout=timeout - (poll_start - time_start))
+    poll_duration = time() - poll_start
+    current = _region_signature(image)
+    if _region_diff(previous, current) > diff_threshold:
+      quiet_since = timestamp
+    elif (timestamp - quiet_since) * 1000 >= quiet_ms:
+      if args.device_debug:
+        debug(f"wait_until_stable: stable after {time() - time_start:.2f} seconds")
+      return True
+    previous = current
+  if args.device_debug:
+    debug(f"wait_until_stable: not stable after {timeout:.2f} seconds")
+  return False
+
+# (input time, region) of the last input wait_for_settle saw the screen react to
+_reacted_input = None
+
+def wait_for_settle(region_ltrb : tuple[int, int, int, int] = None, timeout=0.35, quiet_ms=100):
+  # replacement for a fixed sleep after input: waits for the screen to react first, so a frame taken right
+  # after the input (before the transition started) doesn't count as settled, then for it to settle again.
+  # If an earlier wait already saw this input react, for example the one in click(), only the settling is waited for.
+  # Never waits longer than timeout, the old sleep. If the screen didn't react or settle it sleeps the rest of it.
+  global _reacted_input
+  time_start = time()
+  input_key = (last_input_time, region_ltrb)
+  settled = False
+  if _reacted_input == input_key or wait_for_change(region_ltrb, timeout=timeout):
+    _reacted_input = input_key
+    remaining = timeout - (time() - time_start)
+    if remaining > 0:
+      settled = wait_until_stable(region_ltrb, quiet_ms=quiet_ms, timeout=remaining)
+  if not settled:
+    remaining = timeout - (time() - time_start)
+    if remaining > 0:
+      sleep(remaining)
+  return settled
+
+frame_grabber = None
+# time of the last input event, grabbed frames older than this are stale
+last_input_time = 0.0
+
+def start_frame_grabber(buffer_size=4):
+  global frame_grabber
+  if frame_grabber is not None:
+    return frame_grabber
+  grab_function = adb_actions.grab_frame if bot.use_adb else pyautogui_actions.grab_frame
+  frame_grabber = FrameGrabber(grab_function, buffer_size=buffer_size)
+  frame_grabber.start()
+  return frame_grabber
+
+def stop_frame_grabber():
+  global frame_grabber
+  if frame_grabber is not None:
+    frame_grabber.stop()
+    frame_grabber = None
+
 def flush_screenshot_cache():
+  global last_input_time
+  last_input_time = time()
+  _clear_cached_screenshot()
+
+def _clear_cached_screenshot():
   if bot.use_adb:
     if args.device_debug:
       debug(f"Flushing ADB screenshot cache")
@@ -0,0 +1,97 @@
+# background capture thread that keeps the newest frames in a small ring buffer,
+# so screenshot() doesn't have to wait for a fresh capture after every input.
+import threading
+from collections import deque
+from time import time, sleep
+
+from utils.log import debug, warning
+
+class Frame:
+  __slots__ = ("frame_id", "timestamp", "image")
+
+  def __init__(self, frame_id, timestamp, image):
+    self.frame_id = frame_id
+    # time the capture started, anything on screen before this is in the frame
+    self.timestamp = timestamp
+    self.image = image
+
+  def __repr__(self):
+    return f"Frame<{self.frame_id}, {self.timestamp:.3f}, {self.image.shape}>"
+
+class FrameGrabber:
+  # min_interval keeps the loop from running captures back to back, adb screencap is a process per frame
+  def __init__(self, grab_function, buffer_size=4, min_interval=0.05):
+    self.grab_function = grab_function
+    self.min_interval = min_interval
+    self.frames = deque(maxlen=buffer_size)
+    self.condition = threading.Condition()
+    self.next_frame_id = 0
+    self.thread = None
+    self.running = False
+    self.last_error = None
+
+  def start(self):
+    if self.running:
+      return
+    self.running = True
+    self.thread = threading.Thread(target=self._run, name="frame_grabber", daemon=True)
+    self.thread.start()
+    debug(f"Frame grabber started.")
+
+  def stop(self):
+    self.running = False
+    with self.condition:
+      self.condition.notify_all()
+    if self.thread and self.thread is not threading.current_thread():
+      self.thread.join(timeout=2)
+    self.thread = None
+    self.frames.clear()
+    debug(f"Frame grabber stopped.")
+
+  def _run(self):
+    while self.running:
+      timestamp = time()
+      try:
+        image = self.grab_function()
+      except Exception as e:
+        if self.last_error is None:
+          warning(f"Frame grabber capture failed: {e}")
+        with self.condition:
+          self.last_error = e
+          # waiting readers fall back to a direct capture instead of waiting out their timeout
+          self.condition.notify_all()
+        # don't spin on a broken device
+        sleep(0.5)
+        continue
+      self.last_error = None
+      with self.condition:
+        self.frames.append(Frame(self.next_frame_id, timestamp, image))
+        self.next_frame_id += 1
+        self.condition.notify_all()
+      elapsed = time() - timestamp
+      if elapsed < self.min_interval:
+        sleep(self.min_interval - elapsed)
+
+  def latest(self):
+    with self.condition:
+      if self.frames:
+        return self.frames[-1]
+    return None
+
+  def frame_after(self, timestamp, timeout=1.0):
+    """
+    Returns the newest frame whose capture started after timestamp, waiting for one if needed.
+    Returns None if no such frame shows up within timeout, the last capture failed or the grabber is stopped.
+    """
+    deadline = time() + timeout
+    with self.condition:
+      while self.running:
+        if self.frames and self.frames[-1].timestamp > timestamp:
+          return self.frames[-1]
+        if self.last_error is not None:
+          break
+        remaining = deadline - time()
+        if remaining <= 0:
+          break
+        self.condition.wait(remaining)
+    return None
@@ -0,0 +1,121 @@
+# remembers where each template was found, so locate() can search a small area around
+# the known position first and only fall back to the full region on a miss.
+import json
+import os
+import threading
+
+import core.bot as bot
+import utils.log as log
+from utils.log import debug, warning
+
+FILE_NAME = "location_priors.json"
+# extra pixels searched around a learned position
+ROI_MARGIN = 12
+# positions closer than this are considered the same spot
+MERGE_DISTANCE = 6
+MAX_POSITIONS_PER_TEMPLATE = 8
+SAVE_EVERY = 20
+
+_lock = threading.Lock()
+_priors = None
+_stats = {}
+_unsaved_changes = 0
+
+def _key(img_path : str, template_scaling=1.0):
+  # positions are absolute screen coordinates, which differ between ADB and window capture
+  device = "adb" if bot.use_adb else "window"
+  return f"{device}|{img_path}|{template_scaling}"
+
+def load():
+  global _priors
+  _priors = {}
+  path = log.data_path(FILE_NAME)
+  if not os.path.exists(path):
+    return
+  try:
+    with open(path, "r", encoding="utf-8") as f:
+      _priors = json.load(f)
+    debug(f"Loaded location priors for {len(_priors)} templates from {path}")
+  except Exception as e:
+    warning(f"Couldn't load location priors from {path}: {e}")
+    _priors = {}
+
+def save():
+  global _unsaved_changes
+  if _priors is None:
+    return
+  path = log.data_path(FILE_NAME)
+  try:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _lock:
+      data = json.dumps(_priors)
+      _unsaved_changes = 0
+    with open(path, "w", encoding="utf-8") as f:
+      f.write(data)
+  except Exception as e:
+    warning(f"Couldn't save location priors to {path}: {e}")
+
+def _get_priors():
+  if _priors is None:
+    load()
+  return _priors
+
+def get_roi(img_path : str, template_size : tuple[int, int], region_ltrb : tuple[int, int, int, int], template_scaling=1.0):
+  """
+  Returns the (left, top, right, bottom) area around the learned position of the template, clipped to region_ltrb,
+  or None if it isn't inside the region. Templates that were found in more than one spot get None too: the screen
+  can show several of them and the match a full search picks may not be the one inside the area.
+  """
+  positions = _get_priors().get(_key(img_path, template_scaling))
+  if not positions or len(positions) != 1:
+    return None
+  w, h = template_size
+  left, top, right, bottom = region_ltrb
+  x, y, _ = positions[0]
+  if not (left <= x < right and top <= y < bottom):
+    return None
+  roi = (
+    max(left, x - w // 2 - ROI_MARGIN),
+    max(top, y - h // 2 - ROI_MARGIN),
+    min(right, x + (w - w // 2) + ROI_MARGIN),
+    min(bottom, y + (h - h // 2) + ROI_MARGIN),
+  )
+  if roi[2] - roi[0] < w or roi[3] - roi[1] < h:
+    return None
+  return roi
+
+def record(img_path : str, center : tuple[int, int], template_scaling=1.0):
+  global _unsaved_changes
+  priors = _get_priors()
+  key = _key(img_path, template_scaling)
+  x, y = int(center[0]), int(center[1])
+  with _lock:
+    positions = priors.setdefault(key, [])
+    for position in positions:
+      if abs(position[0] - x) <= MERGE_DISTANCE and abs(position[1] - y) <= MERGE_DISTANCE:
+        position[2] += 1
+        break
+    else:
+      positions.append([x, y, 1])
+    positions.sort(key=lambda position: position[2], reverse=True)
+    del positions[MAX_POSITIONS_PER_TEMPLATE:]
+    _unsaved_changes += 1
+    should_save = _unsaved_changes >= SAVE_EVERY
+  if should_save:
+    save()
+
+def record_lookup(img_path : str, prior_hit : bool, searched_area : int, full_area : int):
+  entry = _stats.setdefault(img_path, {"hits": 0, "misses": 0, "area_saved": 0})
+  if prior_hit:
+    entry["hits"] += 1
+    entry["area_saved"] += full_area - searched_area
+  else:
+    entry["misses"] += 1
+
+def stats():
+  # per template prior hit rate and how many matchTemplate pixels the priors saved
+  result = {}
+  for img_path, entry in _stats.items():
+    lookups = entry["hits"] + entry["misses"]
+    result[img_path] = dict(entry, hit_rate=entry["hits"] / lookups if lookups else 0.0)
+  return result
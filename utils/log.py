@@ -32,6 +32,11 @@ parser.add_argument('--limit-turns', type=int, help='Limit the number of turns t
 parser.add_argument('--dry-run-turn', action='store_true', help='Dry run a single turn')
 parser.add_argument('--device-debug', action='store_true', help='Enable device debug logging')
 parser.add_argument('--use-adb', type=str, help='Specify ADB device string')
+parser.add_argument('--no-ocr-warm-up', action='store_true', help="Don't load the OCR model in the background at startup")
+parser.add_argument('--persist-ocr-cache', action='store_true', help='Keep OCR results on disk between runs')
+parser.add_argument('--ocr-workers', type=int, default=0, help='Run OCR in this many worker processes')
+parser.add_argument('--ocr-torch-threads', type=int, default=1, help='Torch threads per OCR worker process')
+parser.add_argument('--frame-grabber', action='store_true', help='Capture frames on a background thread instead of after every input')
 parser.add_argument('--cm', action='store_true', help='Auto CM races. Use with: py auto_misc.py --cm')
 parser.add_argument('--lr', action='store_true', help='Auto Legend Races. Use with: py auto_misc.py --lr')
 parser.add_argument('--tt', nargs="?", const="hard", type=str, help='Auto team trials. Defaults to hard if used only as --tt. Use with: py auto_misc.py --tt hard/medium/easy')
@@ -266,6 +271,10 @@ def record_turn(state, last_state, action):
   rotate_log(os.path.join(log_dir, "actions_taken.txt"))
   rotate_log(os.path.join(log_dir, "year_changes.txt"))
 
+def data_path(file_name):
+  # files the bot keeps between runs live next to the logs, in logs/ if logging isn't set up yet
+  return os.path.join(log_dir if log_dir else "logs", file_name)
+
 def init_logging():
   global log_level, log_dir
   logging.basicConfig(
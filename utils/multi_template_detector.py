@@ -0,0 +1,61 @@
+# matches a fixed set of templates against one frame in a single pass.
+# cv2.matchTemplate releases the GIL, so the templates are matched on a shared thread pool.
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+import utils.nms as nms
+import utils.template_registry as template_registry
+from utils.log import debug_window, args
+
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+_executor = None
+
+def _get_executor():
+  global _executor
+  if _executor is None:
+    _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="template_match")
+  return _executor
+
+class MultiTemplateDetector:
+  def __init__(self, templates : dict[str, str], threshold=0.85, thresholds : dict[str, float] = None, template_scaling=1.0):
+    # templates = {name: path}, thresholds overrides the threshold per template name
+    self.templates = {}
+    self.thresholds = {}
+    for name, path in templates.items():
+      template = template_registry.get_template(path, scaling=template_scaling)
+      if template is None:
+        # the registry already warned about the missing file
+        continue
+      self.templates[name] = template
+      self.thresholds[name] = thresholds.get(name, threshold) if thresholds else threshold
+
+  def _match(self, name, frame, offset):
+    template = self.templates[name]
+    if template.shape[0] > frame.shape[0] or template.shape[1] > frame.shape[1]:
+      return []
+    result = cv2.matchTemplate(frame, template, cv2.TM_CCOEFF_NORMED)
+    h, w = template.shape[:2]
+    boxes, _ = nms.match_boxes(result, self.thresholds[name], w, h, offset=offset)
+    return boxes
+
+  def detect(self, frame : np.ndarray, offset=(0, 0), names=None) -> dict[str, list[tuple[int, int, int, int]]]:
+    """
+    Returns {name: boxes} for every template (or only the given names), boxes in raster order.
+    offset is added to the boxes, pass the frame's top left corner to get screen coordinates.
+    """
+    if names is None:
+      names = list(self.templates)
+    else:
+      names = [name for name in names if name in self.templates]
+    if args.save_images:
+      debug_window(frame, save_name=f"multi_template_frame")
+    frame = np.ascontiguousarray(frame)
+    offset = (int(offset[0]), int(offset[1]))
+    if len(names) <= 1 or MAX_WORKERS <= 1:
+      return {name: self._match(name, frame, offset) for name in names}
+    futures = {name: _get_executor().submit(self._match, name, frame, offset) for name in names}
+    return {name: future.result() for name, future in futures.items()}
@@ -0,0 +1,71 @@
+# non-maximum suppression for template matching results, shared by every matcher.
+import cv2
+import numpy as np
+
+Box = tuple[int, int, int, int]           # (x, y, w, h)
+
+# below this many raw hits, checking each hit's neighbourhood is cheaper than filtering the whole score map
+LOCAL_MAX_FILTER_MIN_HITS = 256
+
+def _suppress(xs : np.ndarray, ys : np.ndarray, min_dist : int) -> np.ndarray:
+  # xs, ys are sorted best first. Greedily keeps a point unless a kept one is within min_dist on both axes.
+  keep = np.ones(len(xs), dtype=bool)
+  for i in range(len(xs)):
+    if not keep[i]:
+      continue
+    close = (np.abs(xs[i+1:] - xs[i]) <= min_dist) & (np.abs(ys[i+1:] - ys[i]) <= min_dist)
+    keep[i+1:] &= ~close
+  return keep
+
+def score_map_peaks(result : np.ndarray, threshold : float, min_dist=5):
+  """
+  Finds the peaks of a cv2.matchTemplate score map that clear threshold.
+  A local maximum filter drops everything that isn't the best score in its neighbourhood,
+  the suppression pass then removes plateau duplicates, keeping the best scoring point of each.
+  Returns (xs, ys, scores) in raster order (top to bottom, left to right), the order np.where gave
+  the matchers before, so callers that take the first match or click them in order keep doing the same.
+  """
+  mask = result >= threshold
+  if not mask.any():
+    empty = np.empty(0, dtype=np.int64)
+    return empty, empty, np.empty(0, dtype=result.dtype)
+  ys, xs = np.nonzero(mask)
+  scores = result[ys, xs]
+  if len(xs) > LOCAL_MAX_FILTER_MIN_HITS:
+    kernel = np.ones((2 * min_dist + 1, 2 * min_dist + 1), np.uint8)
+    peaks = mask & (result >= cv2.dilate(result, kernel))
+    ys, xs = np.nonzero(peaks)
+    scores = result[ys, xs]
+  else:
+    is_peak = np.array([
+      result[max(0, y - min_dist):y + min_dist + 1, max(0, x - min_dist):x + min_dist + 1].max() <= score
+      for x, y, score in zip(xs, ys, scores)
+    ], dtype=bool)
+    xs, ys, scores = xs[is_peak], ys[is_peak], scores[is_peak]
+  order = np.argsort(-scores, kind="stable")
+  xs, ys, scores = xs[order], ys[order], scores[order]
+  keep = _suppress(xs, ys, min_dist)
+  xs, ys, scores = xs[keep], ys[keep], scores[keep]
+  raster = np.lexsort((xs, ys))
+  return xs[raster], ys[raster], scores[raster]
+
+def match_boxes(result : np.ndarray, threshold : float, width : int, height : int, min_dist=5, offset=(0, 0)):
+  # boxes of the template matches in result, in raster order, together with their confidence
+  xs, ys, scores = score_map_peaks(result, threshold, min_dist)
+  boxes = [(int(x) + offset[0], int(y) + offset[1], width, height) for x, y in zip(xs, ys)]
+  return boxes, [float(score) for score in scores]
+
+def deduplicate_boxes(boxes_xywh : list[Box], min_dist=5, scores=None) -> list[Box]:
+  # drops boxes whose center is within min_dist of a better (or earlier, without scores) box,
+  # the kept ones stay in their input order
+  if len(boxes_xywh) == 0:
+    return []
+  boxes = np.asarray(boxes_xywh, dtype=np.int64).reshape(-1, 4)
+  centers_x = boxes[:, 0] + boxes[:, 2] // 2
+  centers_y = boxes[:, 1] + boxes[:, 3] // 2
+  if scores is not None:
+    order = np.argsort(-np.asarray(scores), kind="stable")
+  else:
+    order = np.arange(len(boxes))
+  keep = _suppress(centers_x[order], centers_y[order], min_dist)
+  return [tuple(int(v) for v in boxes[i]) for i in np.sort(order[keep])]
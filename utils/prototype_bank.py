@@ -0,0 +1,116 @@
+# labelled prototype vectors per kind of crop, kept in an npz file next to the logs between runs.
+# The nearest neighbour readers (glyph atlas, date bank, icon bank) each configure one with their own
+# thresholds and feature function, and only do the scoring themselves.
+import os
+import threading
+
+import numpy as np
+
+import utils.log as log
+from utils.log import debug, warning
+
+class PrototypeBank:
+  """
+  {kind: {label: [unit length vectors]}} with the stacked (prototypes, labels) matrix of every kind cached
+  for classification. learn() only keeps vectors that differ from the ones the label already has, and saves
+  every save_every new prototypes. valid_label drops stored labels that aren't known anymore when loading.
+  """
+  def __init__(self, file_name, description, novelty_score, max_prototypes_per_label, save_every, valid_label=None):
+    self.file_name = file_name
+    self.description = description
+    self.novelty_score = novelty_score
+    self.max_prototypes_per_label = max_prototypes_per_label
+    self.save_every = save_every
+    self.valid_label = valid_label
+    self.lock = threading.Lock()
+    self.bank = None
+    self.matrices = {}
+    self.unsaved_changes = 0
+    # OCR worker processes turn this off, only the main process writes the file
+    self.save_enabled = True
+    self.reads = 0
+    self.hits = 0
+
+  def load(self):
+    self.bank = {}
+    self.matrices.clear()
+    path = log.data_path(self.file_name)
+    if not os.path.exists(path):
+      return
+    try:
+      with np.load(path) as data:
+        for key in data.files:
+          kind, label = key.split("|", 1)
+          if self.valid_label is None or self.valid_label(label):
+            self.bank.setdefault(kind, {})[label] = list(data[key])
+      debug(f"Loaded {self.description} for {len(self.bank)} kinds from {path}")
+    except Exception as e:
+      warning(f"Couldn't load {self.description} from {path}: {e}")
+      self.bank = {}
+
+  def save(self):
+    if self.bank is None or not self.save_enabled:
+      return
+    path = log.data_path(self.file_name)
+    try:
+      os.makedirs(os.path.dirname(path), exist_ok=True)
+      with self.lock:
+        arrays = {f"{kind}|{label}": np.stack(prototypes) for kind, labels in self.bank.items() for label, prototypes in labels.items() if prototypes}
+        self.unsaved_changes = 0
+      np.savez_compressed(path, **arrays)
+    except Exception as e:
+      warning(f"Couldn't save {self.description} to {path}: {e}")
+
+  def _get_bank(self):
+    if self.bank is None:
+      self.load()
+    return self.bank
+
+  def matrix(self, kind):
+    # (prototypes, labels) of the kind stacked for one matrix product, None if nothing was learned yet
+    self._get_bank()
+    with self.lock:
+      matrix = self.matrices.get(kind)
+      if matrix is None:
+        labels = []
+        prototypes = []
+        for label, vectors in self.bank.get(kind, {}).items():
+          labels += [label] * len(vectors)
+          prototypes += vectors
+        if not prototypes:
+          return None
+        matrix = (np.stack(prototypes), np.array(labels))
+        self.matrices[kind] = matrix
+    return matrix
+
+  def learn(self, kind, items):
+    # stores the (label, vector) pairs that are new enough, returns how many were added
+    bank = self._get_bank()
+    added = 0
+    with self.lock:
+      labels = bank.setdefault(kind, {})
+      for label, vector in items:
+        if vector is None:
+          continue
+        prototypes = labels.setdefault(label, [])
+        if prototypes and max(float(prototype @ vector) for prototype in prototypes) >= self.novelty_score:
+          continue
+        if len(prototypes) >= self.max_prototypes_per_label:
+          prototypes.pop(0)
+        prototypes.append(vector)
+        added += 1
+      if added:
+        self.matrices.pop(kind, None)
+        self.unsaved_changes += added
+      should_save = self.unsaved_changes >= self.save_every
+    if should_save:
+      self.save()
+    return added
+
+  def stats(self):
+    return {
+      "reads": self.reads,
+      "hits": self.hits,
+      "hit_rate": self.hits / self.reads if self.reads else 0.0,
+      "labels": {kind: sorted(labels) for kind, labels in (self.bank or {}).items()},
+    }
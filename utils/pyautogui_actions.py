@@ -4,6 +4,7 @@ from utils.constants import GAME_WINDOW_REGION
 from utils.log import debug, warning, error, info, debug_window, args
 import core.bot as bot
 import numpy as np
+from time import time
 import cv2
 
 def click(x_y : tuple[int, int], clicks: int = 1, interval: float = 0.1, duration: float = 0.225):
@@ -52,12 +53,38 @@ def resize_screenshot_as_1080p(screenshot):
   return screenshot
 
 expected_window_size = (1080, 1920)
+
+def grab_frame():
+  # full game window resized to 1080p
+  if bot.windows_window:
+    window_x, window_y = bot.windows_window.left, bot.windows_window.top
+    window_width, window_height = bot.windows_window.width, bot.windows_window.height
+  else:
+    raise Exception("Couldn't find the windows_window somehow, please report this error.")
+  window_region = {
+    "left": window_x,
+    "top": window_y,
+    "width": window_width,
+    "height": window_height
+  }
+  with mss.mss() as sct:
+    # take screenshot as BGRA
+    screenshot = np.array(sct.grab(window_region))
+    screenshot = cv2.cvtColor(screenshot, cv2.COLOR_BGRA2RGB)
+  return resize_screenshot_as_1080p(screenshot)
+
+def crop_frame(screenshot, region_xywh : tuple[int, int, int, int] = None):
+  if not region_xywh:
+    region_xywh = GAME_WINDOW_REGION
+  x, y, w, h = region_xywh
+  return screenshot[y:y+h, x:x+w]
+
 cached_screenshot = []
+# when the cached screenshot was captured
+cached_screenshot_time = 0.0
 def screenshot(region_xywh : tuple[int, int, int, int] = None):
-  global cached_screenshot
+  global cached_screenshot, cached_screenshot_time
   screenshot = None
-  if not region_xywh:
-    region_xywh = GAME_WINDOW_REGION
   if args.device_debug:
     debug(f"Screenshot region: {region_xywh}")
   if len(cached_screenshot) > 0:
@@ -65,31 +92,11 @@ def screenshot(region_xywh : tuple[int, int, int, int] = None):
       debug(f"Using cached screenshot")
     screenshot = cached_screenshot
   else:
-    if bot.windows_window:
-      window_x, window_y = bot.windows_window.left, bot.windows_window.top
-      window_width, window_height = bot.windows_window.width, bot.windows_window.height
-    else:
-      raise Exception("Couldn't find the windows_window somehow, please report this error.")
-    window_region = {
-      "left": window_x,
-      "top": window_y,
-      "width": window_width,
-      "height": window_height
-    }
-    with mss.mss() as sct:
-      if args.device_debug:
-        debug(f"Taking new screenshot")
-      # take screenshot as BGRA
-      screenshot = np.array(sct.grab(window_region))
-      screenshot = cv2.cvtColor(screenshot, cv2.COLOR_BGRA2RGB)
-
-  screenshot = resize_screenshot_as_1080p(screenshot)
-  cached_screenshot = screenshot
+    if args.device_debug:
+      debug(f"Taking new screenshot")
+    cached_screenshot_time = time()
+    screenshot = grab_frame()
+    cached_screenshot = screenshot
 
-  # crop screenshot to region_xywh
-  if region_xywh:
-    x, y, w, h = region_xywh
-    screenshot = screenshot[y:y+h, x:x+w]
   #debug_window(screenshot, save_name=f"pyautogui_screenshot_{x}_{y}_{w}_{h}")
-  return screenshot
-    
+  return crop_frame(screenshot, region_xywh)
@@ -0,0 +1,62 @@
+# coarse-to-fine template matching: match a downscaled frame first, then only score the
+# areas around the coarse candidates at full resolution.
+import cv2
+import numpy as np
+
+import utils.nms as nms
+
+# coarse scores are blurrier than full resolution ones, candidates this far below the threshold are still refined
+COARSE_SCORE_MARGIN = 0.2
+# templates smaller than this (in coarse pixels) lose too much detail to be matched coarsely. On the recorded
+# frames, templates with a side under 32px lost up to 0.19 of their score at half resolution, close to the margin
+MIN_COARSE_TEMPLATE_SIZE = 16
+# above this share of the coarse map being candidates, a plain full resolution match is cheaper
+MAX_CANDIDATE_RATIO = 0.25
+
+def usable_factor(template : np.ndarray, factor : int) -> int:
+  # largest factor <= the requested one that keeps the template big enough, 1 means no pyramid
+  h, w = template.shape[:2]
+  while factor > 1 and min(h, w) // factor < MIN_COARSE_TEMPLATE_SIZE:
+    factor //= 2
+  return max(factor, 1)
+
+def _downscale(image : np.ndarray, factor : int) -> np.ndarray:
+  h, w = image.shape[:2]
+  return cv2.resize(image, (w // factor, h // factor), interpolation=cv2.INTER_AREA)
+
+def match_scores(image : np.ndarray, template : np.ndarray, threshold : float, factor=2, min_dist=5) -> np.ndarray:
+  """
+  Returns a cv2.matchTemplate(TM_CCOEFF_NORMED) score map of the same shape as the full resolution one,
+  where every position that could be a match is scored exactly and everything else is -1.
+  """
+  h, w = template.shape[:2]
+  result_shape = (image.shape[0] - h + 1, image.shape[1] - w + 1)
+  factor = usable_factor(template, factor)
+  if factor == 1 or result_shape[0] < factor or result_shape[1] < factor:
+    return cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
+
+  coarse = cv2.matchTemplate(_downscale(image, factor), _downscale(template, factor), cv2.TM_CCOEFF_NORMED)
+  candidates = (coarse >= threshold - COARSE_SCORE_MARGIN).astype(np.uint8)
+  if not candidates.any():
+    return np.full(result_shape, -1, dtype=np.float32)
+  if np.count_nonzero(candidates) > coarse.size * MAX_CANDIDATE_RATIO:
+    return cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
+
+  # cover the rounding of the coarse grid and the neighbourhood the peak check looks at
+  pad = factor + min_dist
+  result = np.full(result_shape, -1, dtype=np.float32)
+  count, _, components, _ = cv2.connectedComponentsWithStats(candidates, connectivity=8)
+  for x, y, cw, ch, _ in components[1:count]:
+    left = max(0, x * factor - pad)
+    top = max(0, y * factor - pad)
+    right = min(result_shape[1], (x + cw) * factor + pad)
+    bottom = min(result_shape[0], (y + ch) * factor + pad)
+    patch = image[top:bottom + h - 1, left:right + w - 1]
+    result[top:bottom, left:right] = cv2.matchTemplate(patch, template, cv2.TM_CCOEFF_NORMED)
+  return result
+
+def match_boxes(image : np.ndarray, template : np.ndarray, threshold : float, factor=2, min_dist=5, offset=(0, 0)):
+  # same as nms.match_boxes over a full resolution cv2.matchTemplate, ordered by score
+  result = match_scores(image, template, threshold, factor, min_dist)
+  h, w = template.shape[:2]
+  return nms.match_boxes(result, threshold, w, h, min_dist=min_dist, offset=offset)
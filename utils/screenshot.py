@@ -7,10 +7,10 @@ import core.bot as bot
 from utils.log import debug_window, debug, args
 
 
-def enhanced_screenshot(region=(0, 0, 1920, 1080), debug_flag=False) -> Image.Image:
+def enhanced_screenshot(region=(0, 0, 1920, 1080), debug_flag=False, snapshot=None) -> Image.Image:
   if args.device_debug:
     debug_flag = True
-  pil_img = device_actions.screenshot(region_xywh=region)
+  pil_img = device_actions.screenshot(region_xywh=region, snapshot=snapshot)
   if debug_flag:
     debug_window(pil_img, save_name="enhanced_screenshot")
   pil_img = Image.fromarray(pil_img)
@@ -265,6 +265,63 @@ def custom_grabcut(image, mask_area=2, enable_debug=False):
   return image_segmented
 
 
+# the stat gain text is orange to yellow, anything greener than this hue (OpenCV 0-180 scale) is background
+TEXT_MAX_HUE = 32
+TEXT_MIN_WRAPPED_HUE = 170
+# components at least this share of the crop height are glyphs, smaller ones only count inside a glyph's box
+GLYPH_MIN_HEIGHT_RATIO = 0.35
+GLYPH_MIN_AREA = 20
+# a plus sign and at least one digit
+MIN_GLYPHS = 2
+MAX_FOREGROUND_RATIO = 0.35
+# more dropped color matches than this share of the kept ones means a busy background, grabcut decides then
+MAX_DROPPED_RATIO = 0.5
+
+def color_foreground(image, min_color, max_color, enable_debug=False):
+  """
+  Fast replacement for custom_grabcut on colored text: keeps the pixels between the colors that belong
+  to glyph sized connected components. Returns (segmented image, valid), segmented like custom_grabcut
+  with the background set to 0. valid is False when the result doesn't look like text and grabcut should run.
+  """
+  if args.device_debug:
+    enable_debug = True
+  image = np.asarray(image)
+  in_range = cv2.inRange(image, np.array(min_color), np.array(max_color))
+  hue = cv2.cvtColor(image, cv2.COLOR_RGB2HSV)[:, :, 0]
+  in_range[(hue > TEXT_MAX_HUE) & (hue < TEXT_MIN_WRAPPED_HUE)] = 0
+  matched = cv2.countNonZero(in_range)
+  if matched < GLYPH_MIN_AREA:
+    # grabcut only removes pixels, it can't find text here either
+    return np.zeros_like(image), True
+
+  count, labels, stats, _ = cv2.connectedComponentsWithStats(in_range, connectivity=8)
+  heights = stats[:, cv2.CC_STAT_HEIGHT]
+  glyphs = np.flatnonzero((heights >= image.shape[0] * GLYPH_MIN_HEIGHT_RATIO) & (stats[:, cv2.CC_STAT_AREA] >= GLYPH_MIN_AREA))
+  glyphs = glyphs[glyphs != 0]
+  keep = np.zeros(count, dtype=bool)
+  keep[glyphs] = True
+  # fragments of a glyph, like the inside of an 8, are kept when their center is inside a glyph's box
+  if len(glyphs) > 0:
+    lefts, tops = stats[glyphs, cv2.CC_STAT_LEFT], stats[glyphs, cv2.CC_STAT_TOP]
+    rights, bottoms = lefts + stats[glyphs, cv2.CC_STAT_WIDTH], tops + heights[glyphs]
+    centers_x = stats[1:, cv2.CC_STAT_LEFT] + stats[1:, cv2.CC_STAT_WIDTH] / 2
+    centers_y = stats[1:, cv2.CC_STAT_TOP] + heights[1:] / 2
+    inside = (centers_x[:, None] >= lefts) & (centers_x[:, None] < rights) & (centers_y[:, None] >= tops) & (centers_y[:, None] < bottoms)
+    keep[1:] |= inside.any(axis=1)
+  mask = keep[labels].astype(np.uint8)
+  segmented = image * mask[:, :, np.newaxis]
+
+  kept = int(np.count_nonzero(mask))
+  valid = (
+    len(glyphs) >= MIN_GLYPHS
+    and kept <= mask.size * MAX_FOREGROUND_RATIO
+    and matched - kept <= kept * MAX_DROPPED_RATIO
+  )
+  if enable_debug:
+    debug(f"color_foreground: {len(glyphs)} glyphs, kept {kept} of {matched} pixels, valid: {valid}")
+    debug_window(segmented, save_name="color_foreground_segmented")
+  return segmented, valid
+
 def foreground_centroid(img):
   # img: BGR or grayscale
 
@@ -20,9 +20,18 @@ class CleanDefaultDict(dict):
   NOTE: The __repr__ method is customized to return "0" when conceptually empty
   to fix cosmetic issues in debug logging (e.g., f'base={base}' displays 'base=0'
   instead of 'base={}'.)
+
+  The zero-ness is cached on every instance. Setting or removing a key clears the
+  cache of the instance and of the dicts it is stored in, so comparisons and
+  repr don't walk the whole subtree every time.
   """
+  # _zero: cached result of is_numeric_zero, None when it has to be computed again
+  # _parents: the CleanDefaultDict this one is stored in, a list if it is stored in several
+  __slots__ = ("_zero", "_parents")
+
   def __init__(self, *args, **kwargs):
-    super().__init__()
+    self._zero = None
+    self._parents = None
     if args:
       # convert mapping or iterable of pairs
       self.update(args[0])
@@ -41,6 +50,31 @@ class CleanDefaultDict(dict):
     for k, v in kwargs.items():
       self.__setitem__(k, v)
 
+  def _add_parent(self, parent):
+    parents = self._parents
+    if parents is None:
+      self._parents = parent
+    elif parents is parent:
+      return
+    elif type(parents) is list:
+      if not any(p is parent for p in parents):
+        parents.append(parent)
+    else:
+      self._parents = [parents, parent]
+
+  def _invalidate(self):
+    # clears the cached zero-ness here and in the dicts above. A dict without a cached value stops,
+    # no cached result above it depends on it.
+    if self._zero is None:
+      return
+    self._zero = None
+    parents = self._parents
+    if type(parents) is list:
+      for parent in parents:
+        parent._invalidate()
+    elif parents is not None:
+      parents._invalidate()
+
   def setdefault(self, key, default=None):
     if key in self:
       return self[key]
@@ -56,13 +90,46 @@ class CleanDefaultDict(dict):
       return dict.__getitem__(self, key)
     except KeyError:
       node = self.__class__()
+      # an empty child doesn't change whether this dict is zero
+      node._zero = True
+      node._parents = self
       dict.__setitem__(self, key, node) # Key is created here for chaining
       return node
 
   def __setitem__(self, key, value):
-    if isinstance(value, dict) and not isinstance(value, CleanDefaultDict):
-      value = CleanDefaultDict(value)
+    if isinstance(value, dict):
+      if not isinstance(value, CleanDefaultDict):
+        value = CleanDefaultDict(value)
+      value._add_parent(self)
     dict.__setitem__(self, key, value)
+    if self._zero is not None:
+      self._invalidate()
+
+  def __delitem__(self, key):
+    dict.__delitem__(self, key)
+    self._invalidate()
+
+  def pop(self, *args):
+    value = dict.pop(self, *args)
+    self._invalidate()
+    return value
+
+  def popitem(self):
+    item = dict.popitem(self)
+    self._invalidate()
+    return item
+
+  def clear(self):
+    dict.clear(self)
+    self._invalidate()
+
+  def __ior__(self, other):
+    self.update(other)
+    return self
+
+  def __reduce__(self):
+    # pickle and copy restore dict items before the slots, rebuild through __init__ so the cache and parents are set first
+    return (self.__class__, (dict(self),))
 
   def __repr__(self):
     """
@@ -79,7 +146,14 @@ class CleanDefaultDict(dict):
     Recursively checks if the current instance is 'conceptually empty' (acts as 0).
     A dict is conceptually zero if it is physically empty OR if all its
     values are also CleanDefaultDict instances that are conceptually zero.
+    The result is cached until a key of this dict or of a dict below it changes.
     """
+    if self._zero is not None:
+      return self._zero
+    self._zero = self._compute_numeric_zero()
+    return self._zero
+
+  def _compute_numeric_zero(self):
     # 1. Physically empty dict is conceptually zero.
     if not self:
         return True
@@ -0,0 +1,98 @@
+# process-wide registry of decoded template images.
+# Every template variant (color, grayscale, scaled) is decoded from disk once and served from memory afterwards.
+import os
+import threading
+import cv2
+
+from utils.log import debug, warning
+
+ASSETS_DIR = "assets"
+
+_lock = threading.RLock()
+# (path, grayscale, scaling) -> decoded image
+_templates = {}
+
+hits = 0
+misses = 0
+disk_reads = 0
+
+def normalize_path(path : str) -> str:
+  return os.path.normpath(path).replace("\\", "/")
+
+def _read_template(path : str, grayscale : bool):
+  global disk_reads
+  disk_reads += 1
+  if grayscale:
+    return cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+  template = cv2.imread(path, cv2.IMREAD_COLOR)  # safe default
+  if template is None:
+    return None
+  if template.shape[2] == 4:
+    template = cv2.cvtColor(template, cv2.COLOR_BGRA2BGR)
+  # screenshots are RGB, so we keep the templates in RGB too
+  return cv2.cvtColor(template, cv2.COLOR_RGB2BGR)
+
+def get_template(path : str, grayscale=False, scaling=1.0):
+  """
+  Returns the decoded template for path, decoding and caching it on first use.
+  Scaled variants are derived from the cached unscaled image, never from disk.
+  Returns None if the image doesn't exist.
+  """
+  global hits, misses
+  key = (normalize_path(path), grayscale, scaling)
+  template = _templates.get(key)
+  if template is not None:
+    hits += 1
+    return template
+
+  with _lock:
+    template = _templates.get(key)
+    if template is not None:
+      hits += 1
+      return template
+    misses += 1
+    if scaling != 1.0:
+      template = get_template(path, grayscale=grayscale)
+      if template is not None:
+        template = cv2.resize(template, (int(template.shape[1] * scaling), int(template.shape[0] * scaling)))
+    else:
+      template = _read_template(key[0], grayscale)
+    if template is None:
+      warning(f"Image doesn't exist: {path}")
+      return None
+    _templates[key] = template
+  return template
+
+def preload(root=ASSETS_DIR, grayscale=False):
+  # decode every png under root so later lookups never touch the disk
+  loaded = 0
+  for dir_path, _, file_names in os.walk(root):
+    for file_name in file_names:
+      if file_name.lower().endswith(".png"):
+        if get_template(os.path.join(dir_path, file_name), grayscale=grayscale) is not None:
+          loaded += 1
+  debug(f"Template registry preloaded {loaded} templates from {root}. {stats()}")
+  return loaded
+
+def resident_bytes():
+  return sum(template.nbytes for template in list(_templates.values()))
+
+def stats():
+  return {
+    "entries": len(_templates),
+    "hits": hits,
+    "misses": misses,
+    "disk_reads": disk_reads,
+    "resident_bytes": resident_bytes(),
+  }
+
+def reset_counters():
+  global hits, misses, disk_reads
+  hits = 0
+  misses = 0
+  disk_reads = 0
+
+def clear():
+  with _lock:
+    _templates.clear()
+  reset_counters()